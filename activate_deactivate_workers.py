@@ -1,6 +1,7 @@
 import requests
 import json
-import slack
+from runpod_client import get_client
+from slack_notifier import get_alert_dispatcher
 import os
 from dotenv import load_dotenv
 import logging
@@ -21,12 +22,12 @@ api_key = os.environ.get("API_KEY")
 slack_channel = "runpod_mia_alerts"
 slack_runpod_alert_token = os.environ.get("SLACK_RUNPOD_ALERT_TOKEN")
 
-client = slack.WebClient(slack_runpod_alert_token)
-url = f"https://api.runpod.io/graphql?api_key={api_key}"
-headers = {"content-type": "application/json"}
+send_slack_notification = get_alert_dispatcher(slack_runpod_alert_token, slack_channel).notify
+runpod = get_client(api_key)
 
-# Read the variable as a JSON string
-target_endpoints_str = os.getenv("TARGET_ENDPOINTS")
+# Read the variable as a JSON string. Only the command line needs it, the
+# autoscaler imports update_workers with its own endpoints.
+target_endpoints_str = os.getenv("TARGET_ENDPOINTS") or "[]"
 
 # Parse JSON into a Python list
 try:
@@ -40,176 +41,186 @@ except (json.JSONDecodeError, TypeError) as e:
     raise
 
 
-get_endpoint_query = {
-    "query": """
-    query Endpoints {
-        myself {
-            endpoints {
-                gpuIds
-                gpuCount
-                allowedCudaVersions
-                id
-                idleTimeout
-                locations
-                name
-                networkVolumeId
-                scalerType
-                scalerValue
-                templateId
-                workersMax
-                workersMin
-                executionTimeoutMs
-            }
-        }
-    }
-    """
-}
+def send_post_request_to_runpod(query):
 
+    result = {"data": None, "error_message": ""}
 
-def send_slack_notification(message):
+    # The client retries connection errors, timeouts and 429/5xx answers.
     try:
-        client.chat_postMessage(channel=slack_channel, text=message)
-    except slack.errors.SlackApiError as e:
-        if e.response["error"] == "not_in_channel":
-            # Attempt to join the channel first
-            try:
-                client.conversations_join(channel=slack_channel)
-                client.chat_postMessage(channel=slack_channel, text=message)
-            except slack.errors.SlackApiError as join_error:
-                print(
-                    f"Failed to join and send message: {join_error.response['error']}"
-                )
-        else:
-            print(f"Slack API Error: {e.response['error']}")
+        result["data"] = runpod.post(query)
+
+    except requests.exceptions.RequestException as e:
+        logging.critical(f"Runpod request failed: {str(e)}")
+        result["error_message"] = str(e)
 
+    return result
+
+
+# Fields returned by saveEndpoint, also used to keep the client cache current.
+saved_endpoint_fields = (
+    "gpuIds",
+    "id",
+    "idleTimeout",
+    "locations",
+    "name",
+    "networkVolumeId",
+    "scalerType",
+    "scalerValue",
+    "templateId",
+    "workersMax",
+    "workersMin",
+    "gpuCount",
+)
 
-def send_post_request_to_runpod(query):
-    result = {"data": None, "error_message": ""}
 
+# Endpoint metadata, cached by the client unless max_age is 0.
+def get_data(max_age=None):
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(query))
-        response.raise_for_status()
+        return runpod.endpoints(max_age)
 
-        if response.status_code == 200:
-            result["data"] = response.json()
+    except requests.exceptions.RequestException as e:
+        error_message = (
+            "Error during getting endpoints data for activating the endpoints: "
+            + str(e)
+        )
+        send_slack_notification(error_message)
+        logging.critical(error_message)
+        print(error_message)
 
-        return result
 
-    except requests.exceptions.HTTPError as e:
-        logging.critical(f"HTTP Error happend: {str(e)}")
-        result["error_message"] = str(e)
-        return result
+# The current workersMin of every endpoint by name, read from Runpod and not
+# from the cache, or None if it cannot be read.
+def get_workers_min():
+    try:
+        endpoints = runpod.query_endpoints(("id", "name", "workersMin"))
+        return {endpoint["name"]: endpoint.get("workersMin") for endpoint in endpoints}
 
-    except requests.exceptions.ConnectionError as e:
-        logging.critical(f"HTTP Connection error happend: {str(e)}")
-        result["error_message"] = str(e)
-        return result
+    except requests.exceptions.RequestException as e:
+        error_message = f"Error during reading the active workers of the endpoints: {str(e)}"
+        send_slack_notification(error_message)
+        logging.critical(error_message)
+        print(error_message)
 
-    except requests.exceptions.Timeout as e:
-        logging.critical(f"Timeout error happend: {str(e)}")
-        result["error_message"] = str(e)
-        return result
 
-    except requests.exceptions.RequestException as e:
-        logging.critical(f"Timeout error happend: {str(e)}")
-        result["error_message"] = str(e)
-        return result
+def endpoint_input(endpoint, workersMin):
+    return {
+        "gpuIds": endpoint.get("gpuIds"),
+        "gpuCount": endpoint.get("gpuCount"),
+        "allowedCudaVersions": endpoint.get("allowedCudaVersions"),
+        "id": endpoint.get("id"),
+        "idleTimeout": endpoint.get("idleTimeout"),
+        "locations": endpoint.get("locations"),
+        "name": endpoint.get("name"),
+        "networkVolumeId": endpoint.get("networkVolumeId"),
+        "scalerType": endpoint.get("scalerType"),
+        "scalerValue": endpoint.get("scalerValue"),
+        "workersMax": endpoint.get("workersMax"),
+        "workersMin": workersMin,
+        "executionTimeoutMs": endpoint.get("executionTimeoutMs"),
+    }
+
 
+# One saveEndpoint per {alias: input}, aliased into a single mutation so all
+# the endpoints are updated in one request.
+def save_endpoints_query(inputs):
+    definitions = ", ".join(f"${alias}: EndpointInput!" for alias in inputs)
+    fields = " ".join(saved_endpoint_fields)
+    mutations = "\n".join(
+        f"{alias}: saveEndpoint(input: ${alias}) {{ {fields} }}" for alias in inputs
+    )
+    return {
+        "operationName": "saveEndpoints",
+        "variables": inputs,
+        "query": f"mutation saveEndpoints({definitions}) {{\n{mutations}\n}}",
+    }
 
-def get_data():
-    result = send_post_request_to_runpod(get_endpoint_query)
-    # print(result)
 
-    if result["data"]:
-        endpoints = result["data"]["data"]["myself"]["endpoints"]
-        return endpoints
+# Errors of an aliased mutation by alias.
+def alias_errors(body):
+    errors = {}
+    for error in body.get("errors") or []:
+        path = error.get("path") or [None]
+        errors.setdefault(path[0], []).append(error.get("message", ""))
+    return {alias: "; ".join(messages) for alias, messages in errors.items()}
+
+
+# Sets workersMin of the target endpoints, `workersMin` is one value for all of
+# them or {name: value}. Endpoints already at the wanted value are skipped, the
+# others are saved in one request and their final value is read back.
+# Returns {name: {"status": "unchanged"|"updated"|"failed"|"missing",
+# "workersMin", "error"}}, or None if the endpoints could not be read.
+def update_workers(action, workersMin, endpoint_names=None):
+    if isinstance(workersMin, dict):
+        wanted = workersMin
     else:
-        error_message = result["error_message"]
-        error_message = (
-            "Error during getting endpoints data for activating the endpoints: "
-            + error_message
-        )
-        send_slack_notification(error_message)
-        logging.critical(error_message)
-        print(error_message)
+        wanted = {name: workersMin for name in endpoint_names or target_endpoints}
+
+    # saveEndpoint overwrites every setting of the endpoint, so the input is
+    # built from a fresh read. A cached one would revert console changes.
+    endpoints = get_data(0)
+    if endpoints is None:
+        return None
+    metadata = {endpoint["name"]: endpoint for endpoint in endpoints}
+    current = {name: endpoint.get("workersMin") for name, endpoint in metadata.items()}
+
+    results = {}
+    changes = {}
+    for name, value in wanted.items():
+        if name not in current:
+            results[name] = {"status": "missing", "workersMin": None, "error": ""}
+            error_message = f"*{action}*: Endpoint `{name}` not found"
+            send_slack_notification(error_message)
+            logging.critical(error_message)
+        elif current[name] == value:
+            results[name] = {"status": "unchanged", "workersMin": value, "error": ""}
+            logging.info(f"*{action}*: Active worker already `{value}` for the endpoint: `{name}`")
+        else:
+            changes[name] = value
 
+    if not changes:
+        return results
 
-def update_workers(action, workersMin):
-    endpoints = get_data()
-
-    for endpoint in endpoints:
-        endpoint_name = endpoint.get("name", "")
-        if endpoint_name in target_endpoints:
-            endpoint_gpuids = endpoint.get("gpuIds")
-            endpoint_gpucount = endpoint.get("gpuCount")
-            endpoint_allowedcudaversions = endpoint.get("allowedCudaVersions")
-            endpoint_id = endpoint.get("id")
-            endpoint_idletimeout = endpoint.get("idleTimeout")
-            endpoint_locations = endpoint.get("locations")
-            endpoint_networkvolumeid = endpoint.get("networkVolumeId")
-            endpoint_scalertype = endpoint.get("scalerType")
-            endpoint_scalervalue = endpoint.get("scalerValue")
-            endpoint_templateid = endpoint.get("templateId")
-            endpoint_workersmax = endpoint.get("workersMax")
-            endpoint_executiontimeoutms = endpoint.get("executionTimeoutMs")
-
-            update_query = {
-                "operationName": "saveEndpoint",
-                "variables": {
-                    "input": {
-                        "gpuIds": endpoint_gpuids,
-                        "gpuCount": endpoint_gpucount,
-                        "allowedCudaVersions": endpoint_allowedcudaversions,
-                        "id": endpoint_id,
-                        "idleTimeout": endpoint_idletimeout,
-                        "locations": endpoint_locations,
-                        "name": endpoint_name,
-                        "networkVolumeId": endpoint_networkvolumeid,
-                        "scalerType": endpoint_scalertype,
-                        "scalerValue": endpoint_scalervalue,
-                        "workersMax": endpoint_workersmax,
-                        "workersMin": workersMin,
-                        "executionTimeoutMs": endpoint_executiontimeoutms,
-                    }
-                },
-                "query": """
-                    mutation saveEndpoint($input: EndpointInput!) {
-                        saveEndpoint(input: $input) {
-                            gpuIds
-                            id
-                            idleTimeout
-                            locations
-                            name
-                            networkVolumeId
-                            scalerType
-                            scalerValue
-                            templateId
-                            userId
-                            workersMax
-                            workersMin
-                            gpuCount
-                            __typename
-                        }
-                    }
-                """,
-            }
-
-            result = send_post_request_to_runpod(update_query)
-            print(result)
-
-            if result["data"]:
-                message = f"*{action}*: Active worker set to `{workersMin}` for the endpoint: `{endpoint_name}`"
-                send_slack_notification(message)
-                logging.info(message)
+    aliases = {f"endpoint{i}": name for i, name in enumerate(changes)}
+    inputs = {
+        alias: endpoint_input(metadata[name], changes[name]) for alias, name in aliases.items()
+    }
 
+    errors = {}
+    result = send_post_request_to_runpod(save_endpoints_query(inputs))
+    if result["data"]:
+        errors.update(alias_errors(result["data"]))
+        saved = result["data"].get("data") or {}
+        for alias in inputs:
+            if saved.get(alias):
+                runpod.update_endpoint(saved[alias])
             else:
-                error_message = result["error_message"]
-                error_message = (
-                    f"*{action}*: Failed during the setting active worker to `{workersMin}` for `{endpoint_name}`: "
-                    + error_message
-                )
-                send_slack_notification(error_message)
-                logging.critical(error_message)
+                errors.setdefault(alias, "not saved")
+    else:
+        errors.update({alias: result["error_message"] for alias in inputs})
+
+    # Read back, the value the mutation returned is not taken for granted.
+    final = get_workers_min() or {}
+    for alias, name in aliases.items():
+        value = changes[name]
+        error = errors.get(alias, "")
+        if not error and final.get(name) != value:
+            error = f"read back `{final.get(name)}`"
+
+        if error:
+            results[name] = {"status": "failed", "workersMin": final.get(name), "error": error}
+            error_message = (
+                f"*{action}*: Failed during the setting active worker to `{value}` for `{name}`: "
+                + error
+            )
+            send_slack_notification(error_message)
+            logging.critical(error_message)
+        else:
+            results[name] = {"status": "updated", "workersMin": value, "error": ""}
+            message = f"*{action}*: Active worker set to `{value}` for the endpoint: `{name}`"
+            send_slack_notification(message)
+            logging.info(message)
+
+    return results
 
 
 if __name__ == "__main__":
@@ -236,7 +247,11 @@ if __name__ == "__main__":
         else:
             raise RuntimeError(f"Unknown action: {args.action}")
 
-        update_workers(args.action, workersMin)
+        if not target_endpoints:
+            raise RuntimeError("TARGET_ENDPOINTS is not set")
+
+        results = update_workers(args.action, workersMin)
+        print(results)
 
     except Exception as e:
         message = f"An unexpected error occurred during: {e}"
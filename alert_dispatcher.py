@@ -0,0 +1,252 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+# A repeated alert is only re-posted as a "still failing" update every
+# ALERT_REPEAT_INTERVAL seconds. An alert not seen for that long is forgotten.
+alert_repeat_interval = int(os.environ.get("ALERT_REPEAT_INTERVAL", 1800))
+max_retry_delay = 300
+
+
+# Raised by `send` when the alerts can never be sent as they are, e.g. to a
+# channel that does not exist. Retrying them would block every later alert.
+class PermanentAlertError(Exception):
+    pass
+
+
+# Sends the alerts of one channel from a background thread, so the monitoring
+# loops never wait on Slack. Alerts with the same key are deduplicated and their
+# repeats coalesced into periodic updates. Alerts raised within `batch_window`
+# seconds of each other are handed to `send` as one list.
+# With an `outbox` every alert is written to it by `notify` itself, before it is
+# queued, and only deleted once `send` returned. A crash while the alert waits
+# in the queue or the batch window does not lose it. A failed send is retried
+# with an exponential backoff and whatever is left from a previous run is
+# replayed on start. Alerts failing with a PermanentAlertError are moved to the
+# outbox's dead letters instead.
+class AlertDispatcher:
+    def __init__(
+        self,
+        send,
+        name="alerts",
+        repeat_interval=None,
+        batch_window=1.0,
+        outbox=None,
+        batch_size=50,
+    ):
+        self.send = send
+        self.repeat_interval = repeat_interval or alert_repeat_interval
+        self.batch_window = batch_window
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.retry_delay = 0
+        self.retry_at = None
+        self.queue = queue.Queue()
+        # key -> {"count", "last_seen", "last_sent"}, times of when the alerts
+        # were raised, not of when the dispatcher got to them.
+        self.alerts = {}
+        # Alerts raised by a previous run but never handed to the dispatcher.
+        # Read before the thread starts, so they are not mixed up with the
+        # alerts raised from now on.
+        self.leftover = []
+        if self.outbox is not None:
+            try:
+                self.leftover = self.outbox.raised()
+            except sqlite3.Error as e:
+                logging.critical(f"Failed to read the alert outbox: {str(e)}")
+
+        self.thread = threading.Thread(
+            target=self.run, name=f"alerts-{name}", daemon=True
+        )
+        self.thread.start()
+        # Short-lived scripts exit right after queueing their alerts.
+        atexit.register(self.close)
+
+    def notify(self, message, key=None):
+        key = key or message
+        raised_id = None
+        if self.outbox is not None:
+            try:
+                raised_id = self.outbox.raise_alert(key, message)
+            except sqlite3.Error as e:
+                # The alert is still sent, it only does not survive a crash.
+                logging.critical(f"Failed to store an alert: {str(e)}")
+        self.queue.put((key, message, time.monotonic(), raised_id))
+
+    def close(self, timeout=30):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def next_batch(self):
+        # Wake up for the next retry of the outbox even if no alert comes in.
+        timeout = None
+        if self.retry_at is not None:
+            timeout = max(0, self.retry_at - time.monotonic())
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.batch_window
+
+        while batch[-1] is not None:
+            try:
+                batch.append(
+                    self.queue.get(timeout=max(0, deadline - time.monotonic()))
+                )
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        if self.outbox is not None:
+            self.store(self.leftover_batch())
+            self.drain()
+
+        while True:
+            batch = self.next_batch()
+            if self.outbox is None:
+                self.send_now([message for message, _ in self.dispatch_batch(batch)])
+            else:
+                self.store(batch)
+                if self.retry_at is None or time.monotonic() >= self.retry_at:
+                    self.drain()
+
+            if batch and batch[-1] is None:
+                if self.outbox is not None:
+                    self.outbox.close()
+                return
+
+    # Queue items of the raised rows left by a previous run, with their raise
+    # times moved to this run's monotonic clock.
+    def leftover_batch(self):
+        offset = time.monotonic() - time.time()
+        batch = [
+            (key, message, raised_at + offset, row_id)
+            for row_id, key, message, raised_at in self.leftover
+        ]
+        self.leftover = []
+        return batch
+
+    # Returns the (message, created_at) rows to send for the batch.
+    def dispatch_batch(self, batch):
+        offset = time.time() - time.monotonic()
+        rows = []
+        for item in batch:
+            if item is not None:
+                key, message, raised_at, _ = item
+                message = self.dispatch(key, message, raised_at)
+                if message:
+                    rows.append((message, raised_at + offset))
+        return rows
+
+    def send_now(self, messages):
+        if not messages:
+            return
+        try:
+            self.send(messages)
+        except Exception as e:
+            logging.critical(f"Failed to send {len(messages)} alerts: {str(e)}")
+            print(f"Failed to send {len(messages)} alerts: {str(e)}")
+
+    # Moves the raised alerts of the batch to the outbox once deduplicated.
+    def store(self, batch):
+        rows = self.dispatch_batch(batch)
+        raised_ids = [
+            item[3] for item in batch if item is not None and item[3] is not None
+        ]
+        if not rows and not raised_ids:
+            return
+        try:
+            self.outbox.add(rows, raised_ids)
+        except sqlite3.Error as e:
+            # Better an alert that does not survive a restart than no alert.
+            logging.critical(f"Failed to store {len(rows)} alerts: {str(e)}")
+            self.send_now([message for message, _ in rows])
+
+    def drain(self):
+        while True:
+            try:
+                rows = self.outbox.pending(self.batch_size)
+            except sqlite3.Error as e:
+                logging.critical(f"Failed to read the alert outbox: {str(e)}")
+                return
+
+            if not rows:
+                self.retry_delay = 0
+                self.retry_at = None
+                return
+
+            try:
+                self.send_rows(rows)
+            except sqlite3.Error as e:
+                logging.critical(f"Failed to update the alert outbox: {str(e)}")
+                return
+            except Exception as e:
+                self.retry_delay = min(max_retry_delay, max(1, self.retry_delay * 2))
+                self.retry_at = time.monotonic() + self.retry_delay
+                logging.critical(
+                    f"Failed to send {len(rows)} alerts, retrying in {self.retry_delay}s: {str(e)}"
+                )
+                print(f"Failed to send {len(rows)} alerts: {str(e)}")
+                return
+
+    # Sends and deletes the rows. A permanent error may come from a single
+    # alert of the batch, so the rows are then sent one by one and only the
+    # ones failing on their own are moved to the dead letters.
+    def send_rows(self, rows):
+        try:
+            self.send([replay_message(*row[1:]) for row in rows])
+        except PermanentAlertError as e:
+            if len(rows) > 1:
+                for row in rows:
+                    self.send_rows([row])
+                return
+
+            self.outbox.dead_letter([rows[0][0]], str(e))
+            logging.critical(f"Dropped an alert that cannot be sent ({str(e)}): {rows[0][1]}")
+            print(f"Dropped an alert that cannot be sent ({str(e)}): {rows[0][1]}")
+            return
+
+        self.outbox.delete([row[0] for row in rows])
+
+    # Returns the message to send for the alert, or None if it is coalesced.
+    def dispatch(self, key, message, raised_at):
+        self.alerts = {
+            k: alert
+            for k, alert in self.alerts.items()
+            if raised_at - alert["last_seen"] <= self.repeat_interval
+        }
+
+        alert = self.alerts.get(key)
+        if alert is None:
+            self.alerts[key] = {
+                "count": 1,
+                "last_seen": raised_at,
+                "last_sent": raised_at,
+            }
+            return message
+
+        alert["count"] += 1
+        alert["last_seen"] = raised_at
+        if raised_at - alert["last_sent"] >= self.repeat_interval:
+            alert["last_sent"] = raised_at
+            return f"{message} (still failing, {alert['count']} times)"
+
+        logging.info(f"Coalesced alert {key}: seen {alert['count']} times")
+        return None
+
+
+# Alerts sent late, after an outage or a restart, say when they were raised.
+def replay_message(message, created_at, delay=60):
+    if time.time() - created_at < delay:
+        return message
+
+    raised_at = datetime.fromtimestamp(created_at, timezone.utc)
+    return f"{message} (delayed, raised at {raised_at:%Y-%m-%d %H:%M} UTC)"
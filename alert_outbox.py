@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Alerts are written here before they are sent and deleted once Slack accepted
+# them, so they survive a Slack outage, an expired token or a restart.
+alert_outbox_path = os.environ.get("ALERT_OUTBOX_PATH", "alert_outbox.db")
+
+
+# SQLite write-ahead outbox of the alerts of one sender. Alerts are written to
+# `raised` by the thread raising them and moved to `outbox` by the dispatcher
+# thread, so each thread opens its own connection.
+class AlertOutbox:
+    def __init__(self, sender, path=None):
+        self.sender = sender
+        self.path = path or alert_outbox_path
+        self.local = threading.local()
+
+    def connect(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Alerts raised but not yet deduplicated by the dispatcher.
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS raised (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sender TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    raised_at REAL NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS raised_sender ON raised (sender, id)"
+            )
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sender TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS outbox_sender ON outbox (sender, id)"
+            )
+            # Alerts the sender rejected for good, kept for a look by hand.
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS dead_letter (
+                    id INTEGER PRIMARY KEY,
+                    sender TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    error TEXT NOT NULL,
+                    failed_at REAL NOT NULL
+                )
+                """
+            )
+            self.local.connection = connection
+        return connection
+
+    # Returns the id of the raised row.
+    def raise_alert(self, key, message):
+        connection = self.connect()
+        with connection:
+            return connection.execute(
+                "INSERT INTO raised (sender, key, message, raised_at) VALUES (?, ?, ?, ?)",
+                (self.sender, key, message, time.time()),
+            ).lastrowid
+
+    # Oldest first, as (id, key, message, raised_at) rows.
+    def raised(self):
+        return (
+            self.connect()
+            .execute(
+                "SELECT id, key, message, raised_at FROM raised WHERE sender = ? ORDER BY id",
+                (self.sender,),
+            )
+            .fetchall()
+        )
+
+    # Stores the (message, created_at) rows to send and deletes the raised rows
+    # they came from, including the ones coalesced into no message, in one
+    # transaction.
+    def add(self, rows, raised_ids=()):
+        connection = self.connect()
+        with connection:
+            connection.executemany(
+                "INSERT INTO outbox (sender, message, created_at) VALUES (?, ?, ?)",
+                [(self.sender, message, created_at) for message, created_at in rows],
+            )
+            connection.executemany(
+                "DELETE FROM raised WHERE id = ?", [(row_id,) for row_id in raised_ids]
+            )
+
+    # Oldest first, as (id, message, created_at) rows.
+    def pending(self, limit):
+        return (
+            self.connect()
+            .execute(
+                "SELECT id, message, created_at FROM outbox WHERE sender = ? ORDER BY id LIMIT ?",
+                (self.sender, limit),
+            )
+            .fetchall()
+        )
+
+    def delete(self, ids):
+        connection = self.connect()
+        with connection:
+            connection.executemany(
+                "DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id in ids]
+            )
+
+    def dead_letter(self, ids, error):
+        connection = self.connect()
+        now = time.time()
+        with connection:
+            connection.executemany(
+                """
+                INSERT INTO dead_letter (id, sender, message, created_at, error, failed_at)
+                SELECT id, sender, message, created_at, ?, ? FROM outbox WHERE id = ?
+                """,
+                [(error, now, row_id) for row_id in ids],
+            )
+            connection.executemany(
+                "DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id in ids]
+            )
+
+    # Closes the connection of the calling thread.
+    def close(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import time
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    filename="runpod_autoscaler.log",
+    filemode="a",
+)
+
+from activate_deactivate_workers import get_workers_min, runpod, update_workers
+from autoscaler import WorkersAutoscaler
+from endpoint_health import fetch_endpoints_health
+
+api_key = os.environ.get("API_KEY")
+# Endpoints scaled and their workersMin bounds, e.g. {"mia-jupiter-1": [0, 3]}.
+autoscale_endpoints = json.loads(os.environ.get("AUTOSCALE_ENDPOINTS") or "{}")
+autoscale_interval = int(os.environ.get("AUTOSCALE_INTERVAL", 60))
+autoscale_target_utilization = float(os.environ.get("AUTOSCALE_TARGET_UTILIZATION", 0.7))
+autoscale_scale_down_delay = int(os.environ.get("AUTOSCALE_SCALE_DOWN_DELAY", 900))
+# Seconds over which the request rate is measured as the mean busy workers.
+autoscale_rate_window = int(os.environ.get("AUTOSCALE_RATE_WINDOW", 600))
+# p95 probe latency (seconds) above which one more worker is kept warm, none if
+# not set. The latency is read from the snapshot monitoring_tool.py writes, and
+# only the probes started AUTOSCALE_LATENCY_SETTLE seconds after the last change
+# of the endpoint count.
+autoscale_latency_target = os.environ.get("AUTOSCALE_LATENCY_TARGET")
+autoscale_latency_settle = int(os.environ.get("AUTOSCALE_LATENCY_SETTLE", 300))
+autoscale_latency_min_samples = int(os.environ.get("AUTOSCALE_LATENCY_MIN_SAMPLES", 3))
+# Share by which a worker added for the latency must bring the p95 down before
+# another one is added.
+autoscale_latency_min_improvement = float(os.environ.get("AUTOSCALE_LATENCY_MIN_IMPROVEMENT", 0.1))
+probe_latency_path = os.environ.get("PROBE_LATENCY_PATH", "probe_latency.json")
+probe_latency_max_age = int(os.environ.get("PROBE_LATENCY_MAX_AGE", 900))
+# A probe takes at most 120 seconds, an older in-flight count is left over from a
+# monitoring_tool.py that stopped.
+probe_in_flight_max_age = 180
+
+
+# {name: {"samples", "in_flight"}} of the recent probes of the Runpod endpoints.
+def read_probe_activity(now):
+    try:
+        with open(probe_latency_path) as f:
+            snapshot = json.load(f).get("runpod", {})
+    except (OSError, ValueError):
+        return {}
+
+    return {
+        name: {
+            "samples": [
+                sample for sample in activity["samples"] if now - sample[0] <= probe_latency_max_age
+            ],
+            "in_flight": (
+                activity["in_flight"]
+                if now - (activity["timestamp"] or 0) <= probe_in_flight_max_age
+                else 0
+            ),
+        }
+        for name, activity in snapshot.items()
+    }
+
+
+def scale(autoscaler):
+    current = get_workers_min()
+    if current is None:
+        return
+
+    endpoints = {}
+    for name in autoscale_endpoints:
+        try:
+            endpoint = runpod.endpoint(name)
+        except requests.exceptions.RequestException as e:
+            logging.critical(f"Failed to read the endpoints metadata: {str(e)}")
+            return
+        if endpoint is None or name not in current:
+            logging.critical(f"Autoscaled endpoint {name} not found")
+            continue
+        endpoints[endpoint["id"]] = name
+
+    health = fetch_endpoints_health(endpoints, api_key)
+    now = time.time()
+    probes = read_probe_activity(now)
+
+    desired = {}
+    for endpoint_id, endpoint_health in health.items():
+        name = endpoints[endpoint_id]
+        autoscaler.add(name, now, endpoint_health, probes.get(name))
+        workers_min = autoscaler.desired(name, current[name])
+        logging.info(
+            f"Endpoint {name} workersMin {current[name]} -> {workers_min}: {json.dumps(autoscaler.stats(name))}"
+        )
+        if workers_min != current[name]:
+            desired[name] = workers_min
+
+    # Only the endpoints to change are sent, in one request.
+    if desired:
+        update_workers("autoscale", desired)
+
+
+def start_monitoring(sleep):
+    autoscaler = WorkersAutoscaler(
+        {name: tuple(bounds) for name, bounds in autoscale_endpoints.items()},
+        target_utilization=autoscale_target_utilization,
+        scale_down_delay=autoscale_scale_down_delay,
+        latency_target=float(autoscale_latency_target) if autoscale_latency_target else None,
+        latency_settle=autoscale_latency_settle,
+        latency_min_samples=autoscale_latency_min_samples,
+        latency_min_improvement=autoscale_latency_min_improvement,
+        rate_window=autoscale_rate_window,
+    )
+
+    next_run = time.monotonic()
+    while True:
+        scale(autoscaler)
+
+        next_run += sleep
+        time.sleep(max(0, next_run - time.monotonic()))
+
+
+if __name__ == "__main__":
+    start_monitoring(autoscale_interval)
@@ -0,0 +1,142 @@
+import math
+from collections import deque
+
+
+# Picks the workersMin of each endpoint from its observed demand, within the
+# endpoint's (min, max) bounds. The workers busy with a job stay warm, and the
+# queued jobs ask for as many more workers as serve them at
+# `target_utilization`. The probe jobs of monitoring_tool.py are not demand.
+#
+# The request rate is measured as the mean number of busy workers over the last
+# `rate_window` seconds, the arrival rate times the job duration, and keeps
+# that many workers warm, rounded up. Sparse requests that a single health read
+# misses still keep a worker warm.
+#
+# Hysteresis: scaling up is immediate, scaling down only once the demand stayed
+# lower for `scale_down_delay` seconds, and then one worker at a time, so a
+# short lull does not drop the warm workers of a busy endpoint.
+class WorkersAutoscaler:
+    def __init__(
+        self,
+        bounds,
+        target_utilization=0.7,
+        scale_down_delay=900,
+        latency_target=None,
+        latency_settle=300,
+        latency_min_samples=3,
+        latency_min_improvement=0.1,
+        rate_window=600,
+    ):
+        # name -> (min, max)
+        self.bounds = bounds
+        self.target_utilization = target_utilization
+        self.scale_down_delay = scale_down_delay
+        # Probe p95 latency in seconds above which one more worker is kept warm.
+        # Only the probes started `latency_settle` seconds after the last change
+        # count, so a change is judged by probes that ran against it.
+        self.latency_target = latency_target
+        self.latency_settle = latency_settle
+        self.latency_min_samples = latency_min_samples
+        # A worker added for the latency must bring the p95 down by this share
+        # before another one is added. Otherwise the latency does not come from
+        # a lack of workers, and no more are added until it is under target.
+        self.latency_min_improvement = latency_min_improvement
+        self.latency_steps = {}
+        self.rate_window = rate_window
+        self.busy_history = {}
+        self.samples = {}
+        self.low_since = {}
+        self.changed_at = {}
+
+    # `probes` is {"samples": [[started, latency], ...], "in_flight"} of the
+    # recent probes of the endpoint, or None.
+    def add(self, name, timestamp, health, probes=None):
+        jobs = health.get("jobs", {})
+        probes = probes or {}
+        in_progress = jobs.get("inProgress", 0)
+        in_queue = jobs.get("inQueue", 0)
+
+        # The probes in flight are taken out of the jobs in progress first,
+        # then out of the queue.
+        probes_running = min(probes.get("in_flight", 0), in_progress)
+        probes_queued = min(probes.get("in_flight", 0) - probes_running, in_queue)
+
+        history = self.busy_history.setdefault(name, deque())
+        history.append((timestamp, in_progress - probes_running))
+        while history[0][0] <= timestamp - self.rate_window:
+            history.popleft()
+
+        self.samples[name] = {
+            "timestamp": timestamp,
+            "busy": in_progress - probes_running,
+            "load": sum(busy for _, busy in history) / len(history),
+            "queued": in_queue - probes_queued,
+            "probe_samples": probes.get("samples", []),
+        }
+
+    def has_traffic(self, name):
+        sample = self.samples[name]
+        return sample["busy"] + sample["queued"] + sample["load"] > 0
+
+    # p95 of the probes started after the last change settled, None if too few.
+    def probe_latency(self, name):
+        since = self.changed_at[name] + self.latency_settle if name in self.changed_at else 0
+        latencies = sorted(
+            latency for started, latency in self.samples[name]["probe_samples"] if started >= since
+        )
+        if len(latencies) < self.latency_min_samples:
+            return None
+        return latencies[math.ceil(0.95 * len(latencies)) - 1]
+
+    # The workersMin the endpoint should have now, given its current value.
+    def desired(self, name, current):
+        low, high = self.bounds[name]
+        sample = self.samples[name]
+        now = sample["timestamp"]
+
+        target = max(
+            sample["busy"] + math.ceil(sample["queued"] / self.target_utilization),
+            math.ceil(sample["load"]),
+        )
+        latency_step = None
+        if self.latency_target and self.has_traffic(name):
+            latency = self.probe_latency(name)
+            if latency is not None and latency <= self.latency_target:
+                self.latency_steps.pop(name, None)
+            elif latency is not None:
+                last_step = self.latency_steps.get(name)
+                if last_step is None or latency < last_step * (1 - self.latency_min_improvement):
+                    latency_step = latency
+                    target = max(target, current + 1)
+
+        target = min(max(target, low), high)
+        if latency_step is not None and target > current:
+            self.latency_steps[name] = latency_step
+
+        if target > current or current > high:
+            self.low_since.pop(name, None)
+            self.changed_at[name] = now
+            return target
+
+        if target == current:
+            self.low_since.pop(name, None)
+            return current
+
+        since = self.low_since.setdefault(name, now)
+        if now - since < self.scale_down_delay:
+            return current
+
+        # The delay starts again for the next step down.
+        self.low_since[name] = now
+        self.changed_at[name] = now
+        return current - 1
+
+    def stats(self, name):
+        sample = self.samples[name]
+        return {
+            "busy": sample["busy"],
+            "queued": sample["queued"],
+            "load": round(sample["load"], 2),
+            "latency_p95": self.probe_latency(name),
+            "low_since": self.low_since.get(name),
+        }
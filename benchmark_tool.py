@@ -0,0 +1,221 @@
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+from datetime import datetime, timezone
+
+from probe_targets import probe_targets
+from probe_http import create_client
+from latency_stats import LatencyHistogram
+from monitoring_tool import send_probe_request, group_targets, use_http2
+
+quantiles = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+
+def new_task_stats():
+    return {
+        "sent": 0,
+        "succeeded": 0,
+        "failed": 0,
+        "latency": LatencyHistogram(),
+        # (started, seconds) of the jobs that succeeded.
+        "served": [],
+    }
+
+
+# Jobs per second served over the step. A backend keeping up serves the jobs of
+# the step in as long as they were offered, however long each one takes. One
+# falling behind takes longer by how much the latency of the last jobs grew
+# over the first ones (the median of the first and last tenth by start time),
+# so the spread of the latencies and the drain of the last requests do not
+# count, only the latency growth does.
+def step_throughput(served, duration):
+    if not served:
+        return 0.0
+    served = sorted(served)
+    k = max(1, len(served) // 10)
+    growth = statistics.median(s for _, s in served[-k:]) - statistics.median(
+        s for _, s in served[:k]
+    )
+    return round(len(served) / (duration + max(0.0, growth)), 3)
+
+
+def step_report(rate, offered_jobs_rps, duration, elapsed, stats):
+    tasks = {}
+    for (provider, task), task_stats in stats.items():
+        sent = task_stats["sent"]
+        tasks[f"{provider}/{task}"] = {
+            "sent": sent,
+            "succeeded": task_stats["succeeded"],
+            "error_rate": round(task_stats["failed"] / sent, 4) if sent else 0.0,
+            "throughput_rps": step_throughput(task_stats["served"], duration),
+            **{
+                name: task_stats["latency"].quantile(q)
+                for name, q in quantiles.items()
+            },
+        }
+
+    sent = sum(s["sent"] for s in stats.values())
+    succeeded = sum(s["succeeded"] for s in stats.values())
+    all_latency = LatencyHistogram()
+    served = []
+    for task_stats in stats.values():
+        all_latency.merge(task_stats["latency"])
+        served.extend(task_stats["served"])
+
+    return {
+        "offered_rps": rate,
+        "offered_jobs_rps": round(offered_jobs_rps, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "sent": sent,
+        "succeeded": succeeded,
+        "error_rate": round((sent - succeeded) / sent, 4) if sent else 0.0,
+        "throughput_rps": step_throughput(served, duration),
+        **{name: all_latency.quantile(q) for name, q in quantiles.items()},
+        "tasks": tasks,
+    }
+
+
+async def run_step(client, groups, rate, duration, request_timeout):
+    loop = asyncio.get_running_loop()
+    stats = {}
+    requests_in_flight = []
+
+    async def fire(group):
+        started = loop.time()
+        results = await send_probe_request(
+            client, group, request_timeout, log_response=False
+        )
+        for target, result in zip(group, results):
+            task_stats = stats.setdefault(
+                (target["provider"], target["task"]), new_task_stats()
+            )
+            task_stats["sent"] += 1
+            if result["is_success"]:
+                task_stats["succeeded"] += 1
+                task_stats["latency"].add(result["timings"]["total"])
+                task_stats["served"].append((started, loop.time() - started))
+            else:
+                task_stats["failed"] += 1
+
+    # Open loop: requests start on schedule whether or not the previous ones
+    # completed, so a saturated backend shows up as latency and errors instead
+    # of silently lowering the offered rate.
+    start = loop.time()
+    jobs_offered = 0
+    for index in range(int(rate * duration)):
+        await asyncio.sleep(max(0, start + index / rate - loop.time()))
+        group = groups[index % len(groups)]
+        jobs_offered += len(group)
+        requests_in_flight.append(asyncio.create_task(fire(group)))
+
+    await asyncio.gather(*requests_in_flight)
+    return step_report(
+        rate, jobs_offered / duration, duration, loop.time() - start, stats
+    )
+
+
+# A step is saturated when too many jobs fail or the backend completes clearly
+# less jobs per second than were offered.
+def is_saturated(report, max_error_rate, min_throughput_ratio):
+    return (
+        report["error_rate"] > max_error_rate
+        or report["throughput_rps"] < report["offered_jobs_rps"] * min_throughput_ratio
+    )
+
+
+async def run_benchmark(targets, args):
+    started_at = datetime.now(timezone.utc).isoformat()
+    groups = group_targets(targets, args.batch)
+    client = create_client(args.max_connections, use_http2)
+
+    if args.ramp_to:
+        rates = []
+        rate = args.rps
+        while rate <= args.ramp_to:
+            rates.append(rate)
+            rate += args.ramp_step
+    else:
+        rates = [args.rps]
+
+    steps = []
+    saturation_rps = None
+    async with client:
+        for rate in rates:
+            print(f"Running {rate} requests/s for {args.duration} seconds")
+            report = await run_step(client, groups, rate, args.duration, args.timeout)
+            report["saturated"] = is_saturated(
+                report, args.max_error_rate, args.min_throughput_ratio
+            )
+            steps.append(report)
+            logging.info(f"Benchmark step: {json.dumps(report)}")
+
+            if report["saturated"]:
+                saturation_rps = rate
+                break
+
+    sustained = [step["offered_rps"] for step in steps if not step["saturated"]]
+    return {
+        "started_at": started_at,
+        "targets": [f"{t['provider']}/{t['task']}" for t in targets],
+        "batch": args.batch,
+        "duration_per_step": args.duration,
+        "max_sustained_rps": max(sustained) if sustained else None,
+        "saturation_rps": saturation_rps,
+        "steps": steps,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Open-loop load test of the MIA tasks using the probe payloads."
+    )
+    parser.add_argument("--provider", action="append", help="Only these providers.")
+    parser.add_argument("--task", action="append", help="Only these tasks.")
+    parser.add_argument(
+        "--rps", type=float, default=1.0, help="Requests per second (ramp start)."
+    )
+    parser.add_argument("--ramp-to", type=float, help="Ramp the rate up to this value.")
+    parser.add_argument("--ramp-step", type=float, default=1.0)
+    parser.add_argument(
+        "--duration", type=float, default=60, help="Seconds per rate step."
+    )
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument(
+        "--batch", action="store_true", help="One request per provider/endpoint."
+    )
+    parser.add_argument(
+        "--max-error-rate",
+        type=float,
+        default=0.05,
+        help="A step with more errors than this is saturated.",
+    )
+    parser.add_argument(
+        "--min-throughput-ratio",
+        type=float,
+        default=0.9,
+        help="A step completing less than this share of the offered rate is saturated.",
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    args = parser.parse_args()
+
+    targets = [
+        t
+        for t in probe_targets
+        if (not args.provider or t["provider"] in args.provider)
+        and (not args.task or t["task"] in args.task)
+    ]
+    if not targets:
+        parser.error("No probe target matches --provider/--task.")
+
+    report = asyncio.run(run_benchmark(targets, args))
+    output = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Report written to {args.output}")
+    else:
+        print(output)
@@ -0,0 +1,179 @@
+import importlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    filename="billing_daemon.log",
+    filemode="a",
+)
+
+from billing_store import BillingStore
+from budget import Budget
+from kill_switch import prepare_kill_switches
+
+# Provider plugins: provider -> (name, module). A plugin module provides
+# soft_threshold, hard_threshold, kill_switch_targets, billing_timezone,
+# send_slack_notification and get_todays_spend(), which returns
+# {"total", "amounts", "partial", "breakdown"} or None.
+billing_plugins = {
+    "runpod": ("Runpod", "runpod_billing_alert"),
+    "cerebrium": ("Cerebrium", "cerebrium-billing-alert"),
+}
+
+billing_providers = [
+    provider.strip()
+    for provider in os.environ.get("BILLING_PROVIDERS", ",".join(billing_plugins)).split(",")
+    if provider.strip()
+]
+billing_poll_interval = int(os.environ.get("BILLING_POLL_INTERVAL", 60))
+# Seconds a round may wait for the providers. A provider that did not answer by
+# then is left out of the combined total of the round.
+billing_round_deadline = float(os.environ.get("BILLING_ROUND_DEADLINE", 20))
+# Budget of the total spend of all the providers, none if not set.
+combined_soft_threshold = os.environ.get("COMBINED_SOFT_THRESHOLD")
+combined_hard_threshold = os.environ.get("COMBINED_HARD_THRESHOLD")
+
+
+def load_plugins(providers):
+    plugins = {}
+    for provider in providers:
+        if provider not in billing_plugins:
+            raise ValueError(f"Unknown billing provider: {provider}")
+        name, module = billing_plugins[provider]
+        plugins[provider] = (name, importlib.import_module(module))
+    return plugins
+
+
+def provider_budget(name, module):
+    return Budget(
+        name,
+        module.soft_threshold,
+        module.hard_threshold,
+        module.kill_switch_targets,
+        module.send_slack_notification,
+        tz=module.billing_timezone,
+    )
+
+
+# Current UTC offset of a billing timezone, None being the local time.
+def utc_offset(tz):
+    now = datetime.now(tz)
+    return (now if tz else now.astimezone()).utcoffset()
+
+
+# Reaching the combined budget activates the kill switches of every provider
+# and is posted to every provider's channel. The totals are only summed when
+# every provider's day starts at the same time, e.g. Runpod's UTC day and the
+# Cerebrium local date on a host running in UTC.
+def combined_budget(plugins):
+    if not combined_hard_threshold:
+        return None
+
+    offsets = {name: utc_offset(module.billing_timezone) for name, module in plugins.values()}
+    if len(set(offsets.values())) > 1:
+        raise ValueError(
+            "The combined budget needs one billing day for all the providers, got UTC offsets "
+            + ", ".join(f"{name} {offset}" for name, offset in offsets.items())
+            + ". Run the billing daemon with TZ=UTC."
+        )
+    tz = next(iter(plugins.values()))[1].billing_timezone
+
+    def notify(message, key=None):
+        for _, module in plugins.values():
+            module.send_slack_notification(message, key)
+
+    kill_switch_targets = {
+        f"{name} {target}": kill_switch
+        for name, module in plugins.values()
+        for target, kill_switch in module.kill_switch_targets.items()
+    }
+    return Budget(
+        "Combined",
+        float(combined_soft_threshold or combined_hard_threshold),
+        float(combined_hard_threshold),
+        kill_switch_targets,
+        notify,
+        tz=tz,
+    )
+
+
+def start_monitoring(sleep):
+    plugins = load_plugins(billing_providers)
+    budgets = {
+        provider: provider_budget(name, module)
+        for provider, (name, module) in plugins.items()
+    }
+    combined = combined_budget(plugins)
+    billing_store = BillingStore("billing")
+    for _, module in plugins.values():
+        prepare_kill_switches(module.kill_switch_targets)
+
+    # All the providers are polled at the same time. A poll still running from
+    # the previous round is waited on again instead of being started twice.
+    executor = ThreadPoolExecutor(max_workers=len(plugins), thread_name_prefix="billing")
+    in_flight = {}
+
+    next_run = time.monotonic()
+    while True:
+        for provider, (_, module) in plugins.items():
+            if provider not in in_flight or in_flight[provider].done():
+                in_flight[provider] = executor.submit(module.get_todays_spend)
+        done, _ = wait(in_flight.values(), timeout=billing_round_deadline)
+
+        now = time.time()
+        totals = {}
+        missing = []
+        for provider, future in in_flight.items():
+            name, module = plugins[provider]
+            spend = None
+            if future not in done:
+                reason = f"no answer within {billing_round_deadline:g}s"
+            elif future.exception() is not None:
+                reason = str(future.exception())
+            else:
+                spend = future.result()
+                reason = "no billing data"
+
+            if spend is None:
+                missing.append(name)
+                error_message = f"{name} billing data missing: {reason}"
+                module.send_slack_notification(error_message, "billing_missing")
+                logging.critical(error_message)
+                continue
+
+            billing_store.add(now, provider, spend["amounts"])
+            budgets[provider].check(
+                spend["total"],
+                sleep,
+                partial=spend["partial"],
+                breakdown=spend["breakdown"],
+            )
+            totals[name] = spend["total"]
+            if spend["partial"]:
+                missing.append(f"part of {name}")
+
+        if combined is not None:
+            partial = f" (partial, missing: {', '.join(missing)})" if missing else ""
+            breakdown = " By provider: " + ", ".join(
+                f"{name} (${total})" for name, total in totals.items()
+            ) + "."
+            combined.check(
+                round(sum(totals.values()), 2), sleep, partial=partial, breakdown=breakdown
+            )
+
+        next_run += sleep
+        time.sleep(max(0, next_run - time.monotonic()))
+
+
+if __name__ == "__main__":
+    start_monitoring(billing_poll_interval)
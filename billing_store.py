@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Billing samples are appended to `<BILLING_STORE_DIR>/<name>.bin`, one store per
+# billing script so two processes never append to the same file.
+billing_store_dir = os.environ.get("BILLING_STORE_DIR", "billing_samples")
+
+# timestamp (epoch seconds), provider id, app id, amount (dollars spent today)
+record = struct.Struct("<dHHd")
+
+
+# Append-only store of (timestamp, provider, app, amount) samples in fixed-width
+# records. The file is loaded into column arrays, so a time range is found with
+# a binary search and rolled up without any parsing. Provider and app names are
+# stored once in a names file next to it.
+class BillingStore:
+    def __init__(self, name, directory=None):
+        directory = directory or billing_store_dir
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{name}.bin")
+        self.names_path = os.path.join(directory, f"{name}.names.json")
+
+        self.names = []
+        self.ids = {}
+        self.timestamps = array("d")
+        self.providers = array("H")
+        self.apps = array("H")
+        self.amounts = array("d")
+        self.series = set()
+        self.offset = 0
+
+        self.load_names()
+        self.refresh()
+
+    def load_names(self):
+        try:
+            with open(self.names_path) as f:
+                self.names = json.load(f)
+        except FileNotFoundError:
+            self.names = []
+        self.ids = {name: i for i, name in enumerate(self.names)}
+
+    def name_id(self, name):
+        if name not in self.ids:
+            self.names.append(name)
+            self.ids[name] = len(self.names) - 1
+            tmp_path = f"{self.names_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.names, f)
+            os.replace(tmp_path, self.names_path)
+        return self.ids[name]
+
+    # Loads the records appended since the last call.
+    def refresh(self):
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        # A record still being written is read on the next refresh.
+        data = data[: len(data) - len(data) % record.size]
+        for timestamp, provider, app, amount in record.iter_unpack(data):
+            self.timestamps.append(timestamp)
+            self.providers.append(provider)
+            self.apps.append(app)
+            self.amounts.append(amount)
+            self.series.add((provider, app))
+        self.offset += len(data)
+
+        # Names added by another process since the names were loaded.
+        if data and max(max(series) for series in self.series) >= len(self.names):
+            self.load_names()
+
+    def append(self, timestamp, provider, app, amount):
+        if self.timestamps and timestamp < self.timestamps[-1]:
+            # Range queries rely on the records being in time order.
+            logging.warning(f"Dropping out of order billing sample {provider}/{app}")
+            return
+
+        provider_id = self.name_id(provider)
+        app_id = self.name_id(app)
+        with open(self.path, "ab") as f:
+            f.write(record.pack(timestamp, provider_id, app_id, amount))
+
+        self.timestamps.append(timestamp)
+        self.providers.append(provider_id)
+        self.apps.append(app_id)
+        self.amounts.append(amount)
+        self.series.add((provider_id, app_id))
+        self.offset += record.size
+
+    # Records the {app: amount} of one check. A failed write is logged, it must
+    # not stop the billing check.
+    def add(self, timestamp, provider, amounts):
+        try:
+            for app, amount in amounts.items():
+                self.append(timestamp, provider, app, amount)
+        except OSError as e:
+            logging.critical(f"Failed to store the {provider} billing samples: {str(e)}")
+
+    def range(self, start, end):
+        self.refresh()
+        return bisect_left(self.timestamps, start), bisect_right(self.timestamps, end)
+
+    # (timestamp, provider, app, amount) samples between start and end.
+    def samples(self, start, end):
+        first, last = self.range(start, end)
+        for i in range(first, last):
+            yield (
+                self.timestamps[i],
+                self.names[self.providers[i]],
+                self.names[self.apps[i]],
+                self.amounts[i],
+            )
+
+    # Spent between start and end per (provider, app), or per
+    # (bucket start, provider, app) with `bucket` seconds. The amounts are
+    # running daily totals, a drop means a new billing day started from zero.
+    def spend(self, start, end, bucket=None, lookback=86400):
+        first, last = self.range(start, end)
+
+        # The last sample of each series before the range is the baseline of
+        # its first increment.
+        previous = {}
+        i = first - 1
+        while (
+            i >= 0
+            and len(previous) < len(self.series)
+            and self.timestamps[i] >= start - lookback
+        ):
+            previous.setdefault((self.providers[i], self.apps[i]), self.amounts[i])
+            i -= 1
+
+        spend = {}
+        for i in range(first, last):
+            series = (self.providers[i], self.apps[i])
+            amount = self.amounts[i]
+            if series in previous:
+                increment = amount - previous[series]
+                if increment < 0:
+                    increment = amount
+                key = (self.names[series[0]], self.names[series[1]])
+                if bucket:
+                    key = (self.timestamps[i] - self.timestamps[i] % bucket,) + key
+                spend[key] = spend.get(key, 0.0) + increment
+            previous[series] = amount
+
+        return {key: round(amount, 2) for key, amount in spend.items()}
@@ -0,0 +1,103 @@
+import logging
+import os
+import time
+
+from burn_rate import BurnRateForecaster
+from kill_switch import activate_kill_switches
+
+# Activate the kill switch as soon as the spend is projected to cross the hard
+# threshold before the next check, instead of after it was crossed.
+preemptive_kill_switch = os.environ.get("PREEMPTIVE_KILL_SWITCH", "true").lower() == "true"
+
+
+# Daily spend budget of one provider, or of several together. Checks each new
+# total against the soft and hard thresholds and the burn-rate forecast, and
+# activates the kill switches once the hard threshold is reached or predicted.
+class Budget:
+    def __init__(
+        self, name, soft_threshold, hard_threshold, kill_switch_targets, notify, tz=None
+    ):
+        self.name = name
+        self.soft_threshold = soft_threshold
+        self.hard_threshold = hard_threshold
+        self.kill_switch_targets = kill_switch_targets
+        self.notify = notify
+        self.burn_rate = BurnRateForecaster(tz=tz)
+        self.is_kill_switch_activated = False
+
+    def alert(self, message, key=None):
+        self.notify(message, f"{self.name}/{key}" if key else None)
+        logging.critical(message)
+
+    # `partial` describes what is missing from the total, a partial total would
+    # read as a drop and then a spike of the spend and is kept out of the
+    # forecast. Returns "hard", "predicted", "soft" or None.
+    def check(self, total, interval, partial="", breakdown="", now=None):
+        if not partial:
+            self.burn_rate.add(now or time.time(), total)
+        forecast = self.burn_rate.forecast(interval)
+        # Both the last and the smoothed rate must project past the hard
+        # threshold. A single late and chunked billing update is a spike of the
+        # last interval only, and only warns.
+        spike = (
+            forecast is not None
+            and total <= self.hard_threshold
+            and forecast["next_interval"] > self.hard_threshold
+        )
+        predicted = spike and forecast["next_interval_smoothed"] > self.hard_threshold
+
+        if spike and not predicted and not self.is_kill_switch_activated:
+            self.alert(
+                f"`WARNING`: {self.name} Hard Threshold for a single day spent projected before the next check from the last interval only. Amount spent: {total}{partial}, projected: {forecast['next_interval']}, at the smoothed rate: {forecast['next_interval_smoothed']}. Hard Threshold limit is: {self.hard_threshold}.{breakdown}",
+                "hard_threshold_spike",
+            )
+
+        status = None
+        if total > self.hard_threshold or (predicted and preemptive_kill_switch):
+            if predicted:
+                status = "predicted"
+                self.alert(
+                    f"`URGENT: CODE RED` {self.name} Hard Threshold for a single day spent predicted before the next check. Amount spent: {total}{partial}, burn rate: ${forecast['rate_per_hour']}/h, projected: {forecast['next_interval']}. Hard Threshod limit is: {self.hard_threshold}.{breakdown}",
+                    "hard_threshold_forecast",
+                )
+            else:
+                status = "hard"
+                self.alert(
+                    f"`URGENT: CODE RED` {self.name} Hard Threshold for a single day spent reached. Amount spent: {total}{partial}. Hard Threshod limit is: {self.hard_threshold}.{breakdown}",
+                    "hard_threshold",
+                )
+
+            if not self.is_kill_switch_activated:
+                self.activate_kill_switches()
+
+        elif total > self.soft_threshold:
+            status = "soft"
+            self.alert(
+                f"`ALERT`: {self.name} Soft threshold reached. Current Amount spent: `${total}`{partial}. Soft threshold is set to: `${self.soft_threshold}`.{breakdown}",
+                "soft_threshold",
+            )
+
+        # Early warning while the spend is still below the hard threshold.
+        if (
+            forecast is not None
+            and not self.is_kill_switch_activated
+            and total <= self.hard_threshold
+            and forecast["end_of_day"] > self.hard_threshold
+        ):
+            self.alert(
+                f"`WARNING`: At the current burn rate of `${forecast['rate_per_hour']}/h` the {self.name} spend is projected to reach `${forecast['end_of_day']}` by the end of the day. Current Amount spent: `${total}`{partial}. Hard threshold is set to: `${self.hard_threshold}`.{breakdown}",
+                "burn_rate",
+            )
+
+        return status
+
+    def activate_kill_switches(self):
+        statuses = activate_kill_switches(self.kill_switch_targets)
+        for name, status in statuses.items():
+            if status["activated"]:
+                self.alert(f"{self.name} {name} kill switch activated in {status['seconds']}s.")
+            else:
+                self.alert(f"{self.name} UNABLE to ACTIVATE {name} kill switch.")
+
+        if all(status["activated"] for status in statuses.values()):
+            self.is_kill_switch_activated = True
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+
+# Estimates how fast the spend of the day grows from successive running totals
+# and projects it forward. The rate of the last interval reacts to a spike right
+# away, the decayed rate is steadier and is used for the end-of-day projection.
+# The next check is projected with both.
+class BurnRateForecaster:
+    def __init__(self, half_life=5, tz=None):
+        # half_life in samples, tz of the billing day (None is local time).
+        self.half_life = half_life
+        self.tz = tz
+        self.last = None
+        self.last_rate = None
+        self.rate = None
+
+    def day(self, timestamp):
+        return datetime.fromtimestamp(timestamp, self.tz).date()
+
+    def add(self, timestamp, amount):
+        if self.last is not None:
+            last_timestamp, last_amount = self.last
+            if amount < last_amount or self.day(timestamp) != self.day(last_timestamp):
+                # A new billing day started.
+                self.last_rate = None
+                self.rate = None
+            elif timestamp > last_timestamp:
+                rate = (amount - last_amount) / (timestamp - last_timestamp)
+                alpha = 1 - 0.5 ** (1 / self.half_life)
+                self.last_rate = rate
+                self.rate = rate if self.rate is None else self.rate + alpha * (rate - self.rate)
+
+        self.last = (timestamp, amount)
+
+    def seconds_left_in_day(self, timestamp):
+        now = datetime.fromtimestamp(timestamp, self.tz)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), now.tzinfo)
+        return (midnight - now).total_seconds()
+
+    # Projected spend at the next check, `interval` seconds from the last
+    # sample, with the last and the smoothed rate, and at the end of the day.
+    # None until two samples of the day.
+    def forecast(self, interval):
+        if self.last is None or self.rate is None:
+            return None
+
+        timestamp, amount = self.last
+        return {
+            "amount": amount,
+            "rate_per_hour": round(self.rate * 3600, 2),
+            "next_interval": round(amount + max(self.last_rate, 0) * interval, 2),
+            "next_interval_smoothed": round(amount + max(self.rate, 0) * interval, 2),
+            "end_of_day": round(
+                amount + max(self.rate, 0) * self.seconds_left_in_day(timestamp), 2
+            ),
+        }
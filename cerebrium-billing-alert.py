@@ -1,4 +1,8 @@
-import slack
+from cost_cache import CostCache
+from billing_store import BillingStore
+from budget import Budget
+from kill_switch import prepare_kill_switches
+from slack_notifier import get_alert_dispatcher
 import os
 from dotenv import load_dotenv
 import json
@@ -6,9 +10,9 @@ import requests
 from requests.auth import HTTPBasicAuth
 import logging
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-import boto3
-import botocore.exceptions
 from datetime import date
 
 load_dotenv()
@@ -26,8 +30,18 @@ token_p87ef9251 = os.environ.get("API_KEY_P87EF9251")
 token_pde09db61 = os.environ.get("API_KEY_PDE09DB61")
 slack_channel = "cerebrium-monitoring"
 slack_runpod_alert_token = os.environ.get("SLACK_ALERT_TOKEN")
-soft_threshold = float(os.environ.get("SOFT_THRESHOLD"))
-hard_threshold = float(os.environ.get("HARD_THRESHOLD"))
+# CEREBRIUM_* lets the billing daemon give each provider its own budget.
+soft_threshold = float(
+    os.environ.get("CEREBRIUM_SOFT_THRESHOLD") or os.environ.get("SOFT_THRESHOLD")
+)
+hard_threshold = float(
+    os.environ.get("CEREBRIUM_HARD_THRESHOLD") or os.environ.get("HARD_THRESHOLD")
+)
+# The Cerebrium costs are per day of the local date.
+billing_timezone = None
+# Seconds a round of cost requests may take. Apps that did not answer by then
+# are reported as missing and the round goes on with the partial total.
+cost_round_deadline = float(os.environ.get("CEREBRIUM_COST_DEADLINE", 10))
 
 
 cerebrium_existing_feat_arn = os.environ.get("CEREBRIUM_EXISTING_FEATURE")
@@ -36,7 +50,13 @@ cerebrium_new_feat_arn = os.environ.get("CEREBRIUM_NEW_FEATURE")
 cerebrium_existing_rule_priority_and_arn = [{"RuleArn": cerebrium_existing_feat_arn, "Priority": 150}]
 cerebrium_new_feat_rule_priority_and_arn = [{"RuleArn": cerebrium_new_feat_arn, "Priority": 160}]
 
-client = slack.WebClient(slack_runpod_alert_token)
+# Kill switches activated together when the hard threshold is reached.
+kill_switch_targets = {
+    "LFMH/ICO existing feature": ("eu-central-1", cerebrium_existing_rule_priority_and_arn),
+    "new feature": ("eu-central-1", cerebrium_new_feat_rule_priority_and_arn),
+}
+
+send_slack_notification = get_alert_dispatcher(slack_runpod_alert_token, slack_channel).notify
 
 url_content_impo = "https://rest.cerebrium.ai/v2/projects/p-83a7fa9e/apps/p-83a7fa9e-content-importance/cost"
 url_cmd_interpreter = "https://rest.cerebrium.ai/v2/projects/p-83a7fa9e/apps/p-83a7fa9e-command-interpreter/cost"
@@ -58,19 +78,53 @@ app_dict = {
     url_summarization: token_p87ef9251,
 }
 
+# All apps are fetched at the same time, each over its own pooled session.
+# The fetch of an app that is still running from the previous round is waited
+# on again instead of being started twice.
+cost_executor = ThreadPoolExecutor(
+    max_workers=len(app_dict), thread_name_prefix="cerebrium-cost"
+)
+sessions_lock = threading.Lock()
+sessions = {}
+in_flight = {}
+cost_cache = CostCache()
 
-def send_post_request_to_cerebrium(url, token):
 
-    headers = {"Authorization": f"Bearer {token}"}
+def get_session(url, token):
+    with sessions_lock:
+        if url not in sessions:
+            session = requests.Session()
+            session.headers["Authorization"] = f"Bearer {token}"
+            sessions[url] = session
+        return sessions[url]
+
+
+def app_name(url):
+    # ".../apps/p-87ef9251-summarization/cost" -> "p-87ef9251-summarization"
+    return url.rstrip("/").split("/")[-2]
+
+
+def send_post_request_to_cerebrium(url, token):
 
     result = {"data": None, "error_message": ""}
+    app = app_name(url)
 
     try:
-        response = requests.get(url, headers=headers)
+        # Only the days still open are requested, and nothing is sent back if
+        # they did not change since the last response.
+        response = get_session(url, token).get(
+            url,
+            params=cost_cache.request_params(app),
+            headers=cost_cache.request_headers(app),
+            timeout=cost_round_deadline,
+        )
         response.raise_for_status()
 
-        if response.status_code == 200:
-            result["data"] = response.json()
+        if response.status_code == 304:
+            result["data"] = cost_cache.costs(app)
+        elif response.status_code == 200:
+            cost_cache.update(app, response.json().get("costs", {}), response.headers)
+            result["data"] = cost_cache.costs(app)
 
         # print(result)
 
@@ -96,6 +150,45 @@ def send_post_request_to_cerebrium(url, token):
         result["error_message"] = str(e)
         return result
 
+    except ValueError as e:
+        logging.critical(f"Invalid cost response from {app_name(url)}: {str(e)}")
+        result["error_message"] = f"invalid response: {str(e)}"
+        return result
+
+
+# Returns today's cost per app in dollars and, for the apps without data this
+# round, why it is missing.
+def fetch_costs(deadline=None):
+    deadline = deadline or cost_round_deadline
+    started = time.monotonic()
+
+    for url, token in app_dict.items():
+        if url not in in_flight or in_flight[url].done():
+            in_flight[url] = cost_executor.submit(
+                send_post_request_to_cerebrium, url, token
+            )
+    done, _ = wait(in_flight.values(), timeout=deadline)
+
+    costs = {}
+    missing = {}
+    for url, future in in_flight.items():
+        app = app_name(url)
+        if future not in done:
+            missing[app] = f"no response within {deadline:g}s"
+            continue
+
+        result = future.result()
+        if result["data"] is None:
+            missing[app] = result["error_message"] or "no data"
+            continue
+        costs[app] = get_today_total_cost_dollars(result["data"])
+
+    cost_cache.save()
+    logging.info(
+        f"Fetched the cost of {len(costs)}/{len(app_dict)} apps in {time.monotonic() - started:.2f}s"
+    )
+    return costs, missing
+
 
 def get_today_total_cost_dollars(data: dict) -> float:
 
@@ -119,125 +212,49 @@ def get_today_total_cost_dollars(data: dict) -> float:
         return 0.0
 
 
-def send_slack_notification(message):
-    try:
-        client.chat_postMessage(channel=slack_channel, text=message)
-    except slack.errors.SlackApiError as e:
-        if e.response["error"] == "not_in_channel":
-            # Attempt to join the channel first
-            try:
-                client.conversations_join(channel=slack_channel)
-                client.chat_postMessage(channel=slack_channel, text=message)
-            except slack.errors.SlackApiError as join_error:
-                print(
-                    f"Failed to join and send message: {join_error.response['error']}"
-                )
-        else:
-            print(f"Slack API Error: {e.response['error']}")
-
-
-def activate_alb_kill_switch(region_name, rule_priority_and_arn):
-    try:
-        # Initialize the ELBv2 client
-        client = boto3.client("elbv2", region_name=region_name)
-
-        response = client.set_rule_priorities(RulePriorities=rule_priority_and_arn)
-
-        print(f"Kill Switch activated!! region_name: {region_name}")
-        return True
-        # print(response)
-
-    except botocore.exceptions.NoCredentialsError:
-        logging.critical(
-            "Error: No AWS credentials found. Please configure them using 'aws configure' or set environment variables."
-        )
-
-    except botocore.exceptions.PartialCredentialsError:
-        logging.critical(
-            "Error: Incomplete AWS credentials detected. Please check your AWS access key and secret key."
-        )
-
-    except botocore.exceptions.ClientError as e:
-        # Handle specific AWS errors
-        error_code = e.response["Error"]["Code"]
-        error_message = e.response["Error"]["Message"]
-        logging.critical(f"AWS ClientError: {error_code} - {error_message}")
+# Today's total over the apps that answered, with the apps missing from it.
+def get_todays_spend():
+    costs, missing = fetch_costs()
 
-    except botocore.exceptions.EndpointConnectionError:
-        logging.critical(
-            "Error: Unable to connect to AWS endpoint. Check your internet connection and region settings."
+    partial = ""
+    if missing:
+        partial = f" (partial, missing: {', '.join(sorted(missing))})"
+        error_message = "Cerebrium cost data missing for: " + ", ".join(
+            f"{app} ({reason})" for app, reason in sorted(missing.items())
         )
+        send_slack_notification(error_message, "cost_missing")
+        logging.critical(error_message)
+        print(error_message)
 
-    except Exception as e:
-        logging.critical(f"An unexpected error occurred: {str(e)}")
-
-    return False
+    return {
+        "total": round(sum(costs.values()), 2),
+        "amounts": costs,
+        "partial": partial,
+        "breakdown": "",
+    }
 
 
 def start_monitoring(sleep):
 
-    is_kill_switch_activated = False
+    billing_store = BillingStore("cerebrium")
+    budget = Budget(
+        "Cerebrium",
+        soft_threshold,
+        hard_threshold,
+        kill_switch_targets,
+        send_slack_notification,
+        tz=billing_timezone,
+    )
+    prepare_kill_switches(kill_switch_targets)
 
     while True:
-        total_cost = 0.0
-        for url, token in app_dict.items():
-            result = send_post_request_to_cerebrium(url, token)
-            # print(result)
-            if result:
-                app_cost = get_today_total_cost_dollars(result["data"])
-                total_cost = total_cost + app_cost
-            # print(f"{total_cost=}")
-            else:
-                error_message = f"Error occured: {result}"
-                send_slack_notification(error_message)
-                logging.critical(error_message)
-                print(error_message)
-
-        if total_cost > hard_threshold:
-            alert_message = f"`URGENT: CODE RED` Hard Threshold for a single day spent reached. Amount spent: {total_cost}. Hard Threshod limit is: {hard_threshold}"
-            # print(f"{alert_message=}")
-            send_slack_notification(alert_message)
-            logging.critical(alert_message)
-
-            if not is_kill_switch_activated:
-                # Activate cerebrium kill switch for Existing feature LFMH/ICO.
-                existing_feat_kill_switch_status = activate_alb_kill_switch(
-                    "eu-central-1", cerebrium_existing_rule_priority_and_arn
-                )
-                if existing_feat_kill_switch_status:
-                    alert_message = f"Cerebrium LFMH/ICO existing feature kill switch activated."
-                    send_slack_notification(alert_message)
-                    logging.critical(alert_message)
-                else:
-                    alert_message = f"Cerebrium UNABLE to ACTIVATE LFMH/ICO existing feature kill switch."
-                    send_slack_notification(alert_message)
-                    logging.critical(alert_message)
-
-                # Activate Cerebrium kill switch for new features.
-                new_feat_kill_switch_status = activate_alb_kill_switch(
-                    "eu-central-1", cerebrium_new_feat_rule_priority_and_arn
-                )
-                if new_feat_kill_switch_status:
-                    alert_message = f"Cerebrium new feature kill switch activated."
-                    send_slack_notification(alert_message)
-                    logging.critical(alert_message)
-                else:
-                    alert_message = f"Cerebrium UNABLE to ACTIVATE new feature kill switch."
-                    send_slack_notification(alert_message)
-                    logging.critical(alert_message)
-
-                if existing_feat_kill_switch_status and new_feat_kill_switch_status:
-                    is_kill_switch_activated = True
-
-        elif total_cost > soft_threshold:
-            alert_message = f"`ALERT`: Soft threshold reached. Current Amount spent: `${total_cost}`. Soft threshold is set to: `${soft_threshold}`"
-            send_slack_notification(alert_message)
-            logging.critical(alert_message)
-        else:
-            pass
+        spend = get_todays_spend()
+        billing_store.add(time.time(), "cerebrium", spend["amounts"])
+        budget.check(spend["total"], sleep, partial=spend["partial"])
 
         # sleep for 1 mins.
         time.sleep(sleep)
 
 
-start_monitoring(60)
+if __name__ == "__main__":
+    start_monitoring(60)
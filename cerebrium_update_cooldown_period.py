@@ -1,5 +1,5 @@
 import requests
-import slack
+from slack_notifier import get_alert_dispatcher
 import os
 from dotenv import load_dotenv
 import logging
@@ -50,7 +50,10 @@ validate_env_vars(
     }
 )
 
-client = slack.WebClient(slack_cerebrium_token)
+send_slack_notification = get_alert_dispatcher(slack_cerebrium_token, slack_channel).notify
+
+timeout = 30
+min_cooldown_period = 30
 
 app_dict = {
     message_improv_url: api_key_PDE09DB61,
@@ -60,7 +63,15 @@ app_dict = {
 }
 
 
+# Returns True once every app has the new cooldown period.
 def update_cooldown_period(cooldown_period):
+    if cooldown_period < min_cooldown_period:
+        err_msg = f"Cooldown period must be at least {min_cooldown_period} seconds (provided: {cooldown_period})."
+        logging.critical(err_msg)
+        print(err_msg)
+        return False
+
+    is_updated = True
     for app_url, api_key in app_dict.items():
         headers = {
             "Authorization": f"Bearer {api_key}",
@@ -68,7 +79,7 @@ def update_cooldown_period(cooldown_period):
         }
         payload = {"cooldownPeriodSeconds": cooldown_period}
         try:
-            response = requests.patch(app_url, json=payload, headers=headers)
+            response = requests.patch(app_url, json=payload, headers=headers, timeout=timeout)
             response.raise_for_status()
             # print(f"Response from {app_url}: {response.status_code} - {response.text}")
 
@@ -83,45 +94,30 @@ def update_cooldown_period(cooldown_period):
             logging.critical(err_msg)
             print(err_msg)
             send_slack_notification(err_msg)
+            is_updated = False
 
         except requests.exceptions.ConnectionError as e:
             err_msg = f"Connection error occurred while updating {app_url}: {e}"
             logging.critical(err_msg)
             print(err_msg)
             send_slack_notification(err_msg)
+            is_updated = False
 
         except requests.exceptions.Timeout as e:
             err_msg = f"Timeout error occurred while updating {app_url}: {e}"
             logging.critical(err_msg)
             print(err_msg)
             send_slack_notification(err_msg)
+            is_updated = False
 
         except requests.exceptions.RequestException as e:
             err_msg = f"An error occurred while updating {app_url}: {e}"
             logging.critical(err_msg)
             print(err_msg)
             send_slack_notification(err_msg)
+            is_updated = False
 
-
-def send_slack_notification(message):
-    try:
-        client.chat_postMessage(channel=slack_channel, text=message)
-    except slack.errors.SlackApiError as e:
-        if e.response["error"] == "not_in_channel":
-            # Attempt to join the channel first
-            try:
-                client.conversations_join(channel=slack_channel)
-                client.chat_postMessage(channel=slack_channel, text=message)
-            except slack.errors.SlackApiError as join_error:
-                print(
-                    f"Failed to join and send message: {join_error.response['error']}"
-                )
-                logging.critical(
-                    f"Failed to join and send message: {join_error.response['error']}"
-                )
-        else:
-            print(f"Slack API Error: {e.response['error']}")
-            logging.critical(f"Slack API Error: {e.response['error']}")
+    return is_updated
 
 
 def positive_int(value):
@@ -129,8 +125,10 @@ def positive_int(value):
         iv = int(value)
     except ValueError:
         raise argparse.ArgumentTypeError(f"Invalid integer value: {value}")
-    if iv < 30:
-        raise argparse.ArgumentTypeError("Cooldown period must be >= 30 seconds.")
+    if iv < min_cooldown_period:
+        raise argparse.ArgumentTypeError(
+            f"Cooldown period must be >= {min_cooldown_period} seconds."
+        )
 
     return iv
 
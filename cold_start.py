@@ -0,0 +1,192 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+import requests
+
+from latency_stats import LatencyHistogram
+from probe_targets import cerebrium_app_url, cerebrium_project
+from runpod_client import get_client
+
+timeout = 30
+
+# Labels every successful probe "cold" or "warm" and keeps the latency of each
+# kind per worker endpoint, so the cost of scale-to-zero can be measured. A
+# probe is only cold with evidence of scale-to-zero: the endpoint is known to
+# keep no worker up and was left idle past its idle timeout. Without scaling
+# settings every probe is warm, so a slowdown is not taken for cold starts.
+class ColdStartTracker:
+    def __init__(self, jump_factor=3):
+        self.jump_factor = jump_factor
+        # endpoint key -> {"min_workers": int, "idle_timeout": seconds}
+        self.settings = {}
+        self.last_probe = {}
+        self.warm = {}
+        self.cold = {}
+        # Consecutive cold probes per endpoint.
+        self.cold_streak = {}
+
+    def classify(self, key, started, latency):
+        settings = self.settings.get(key, {})
+        min_workers = settings.get("min_workers")
+        idle_timeout = settings.get("idle_timeout")
+        idle_gap = started - self.last_probe.get(key, -math.inf)
+
+        warm = self.warm.setdefault(key, LatencyHistogram(half_life=50))
+        cold = self.cold.setdefault(key, LatencyHistogram(half_life=50))
+        warm_p50 = warm.quantile(0.5)
+
+        if min_workers != 0 or idle_timeout is None:
+            # At least one worker is always up, or the settings are unknown.
+            is_cold = False
+        elif idle_gap <= idle_timeout:
+            # The previous probe kept the worker up.
+            is_cold = False
+        elif warm_p50 is None:
+            # No warm latency to compare with yet, a scaled-to-zero endpoint is
+            # cold unless it is clearly faster than the cold starts seen so far.
+            cold_p50 = cold.quantile(0.5)
+            is_cold = cold_p50 is None or latency > cold_p50 / self.jump_factor
+        else:
+            # Other traffic may have kept a worker up.
+            is_cold = latency > warm_p50 * self.jump_factor
+
+        self.last_probe[key] = started + latency
+        self.cold_streak[key] = self.cold_streak.get(key, 0) + 1 if is_cold else 0
+        if is_cold:
+            cold.add(latency)
+            return "cold"
+
+        warm.add(latency)
+        return "warm"
+
+    # Whether a probe started at `now` may hit a cold start. Unlike `classify`
+    # it errs on the cold side: only settings keeping a worker up, or a
+    # previous probe within the idle timeout, rule it out.
+    def may_be_cold(self, key, now):
+        settings = self.settings.get(key, {})
+        if settings.get("min_workers"):
+            return False
+        idle_timeout = settings.get("idle_timeout")
+        return idle_timeout is None or now - self.last_probe.get(key, -math.inf) > idle_timeout
+
+    # Cold start latency quantile of the endpoint, None below `min_samples`
+    # (decayed) cold starts.
+    def cold_quantile(self, key, q, min_samples=5):
+        cold = self.cold.get(key)
+        if cold is None or cold.total < min_samples:
+            return None
+        return cold.quantile(q)
+
+    # Cold and warm p50 latency and the difference between them per endpoint.
+    def summary(self):
+        summary = {}
+        for key, cold in self.cold.items():
+            cold_p50 = cold.quantile(0.5)
+            warm_p50 = self.warm[key].quantile(0.5)
+            summary[key] = {
+                "cold_p50": cold_p50,
+                "warm_p50": warm_p50,
+                "cold_start_cost": (
+                    cold_p50 - warm_p50 if cold_p50 and warm_p50 else None
+                ),
+            }
+        return summary
+
+
+def get_runpod_scaling_settings(api_key):
+    endpoints = get_client(api_key).query_endpoints(("name", "workersMin", "idleTimeout"))
+
+    return {
+        endpoint["name"]: {
+            "min_workers": endpoint.get("workersMin"),
+            "idle_timeout": endpoint.get("idleTimeout"),
+        }
+        for endpoint in endpoints
+    }
+
+
+def get_cerebrium_scaling_settings(app_url, token):
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = requests.get(app_url, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    app = response.json()
+
+    return {
+        "min_workers": app.get("minReplicaCount"),
+        "idle_timeout": app.get("cooldownPeriodSeconds"),
+    }
+
+
+# Reads the current scale-to-zero settings of the (provider, name) worker
+# endpoints. Endpoints that cannot be read are left out.
+def fetch_scaling_settings(endpoints, runpod_api_key, cerebrium_api_keys):
+    settings = {}
+
+    runpod_names = [name for provider, name in endpoints if provider == "runpod"]
+    if runpod_names and runpod_api_key:
+        try:
+            runpod_settings = get_runpod_scaling_settings(runpod_api_key)
+            for name in runpod_names:
+                if name in runpod_settings:
+                    settings[("runpod", name)] = runpod_settings[name]
+        except (requests.exceptions.RequestException, KeyError, TypeError) as e:
+            logging.critical(f"Failed to read the Runpod scaling settings: {str(e)}")
+
+    for provider, app in endpoints:
+        if provider != "cerebrium":
+            continue
+        project = cerebrium_project(app)
+        if not cerebrium_api_keys.get(project):
+            continue
+        try:
+            settings[(provider, app)] = get_cerebrium_scaling_settings(
+                cerebrium_app_url(app), cerebrium_api_keys[project]
+            )
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.critical(
+                f"Failed to read the Cerebrium scaling settings of {app}: {str(e)}"
+            )
+
+    return settings
+
+
+# Measured seconds from raising the workersMin of an endpoint until its workers
+# are up, kept in a JSON file so they outlive a restart. The lead of an endpoint
+# is its slowest recent activation, workers started that much ahead of a peak
+# are warm when it begins.
+class ActivationTimes:
+    def __init__(self, path, samples=5):
+        self.path = path
+        self.samples = samples
+        self.lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.endpoints = json.load(f)
+        except (OSError, ValueError):
+            self.endpoints = {}
+
+    def add(self, name, seconds):
+        with self.lock:
+            endpoint = self.endpoints.setdefault(name, {"seconds": []})
+            endpoint["seconds"] = (endpoint["seconds"] + [seconds])[-self.samples :]
+            endpoint["timestamp"] = time.time()
+
+    def lead(self, name, default):
+        with self.lock:
+            seconds = self.endpoints.get(name, {}).get("seconds")
+            return max(seconds) if seconds else default
+
+    def save(self):
+        with self.lock:
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(self.endpoints, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logging.critical(f"Failed to save the activation times {self.path}: {str(e)}")
@@ -0,0 +1,91 @@
+import json
+import logging
+import os
+import threading
+from datetime import date, timedelta
+
+# Per-app, per-date costs of the Cerebrium apps. A day is closed once a response
+# fetched after its end has been stored, closed days are never fetched again.
+cost_cache_path = os.environ.get("COST_CACHE_PATH", "cerebrium_cost_cache.json")
+
+# Query parameters limiting the /cost response to the days still open.
+window_start_param = "startDate"
+window_end_param = "endDate"
+
+
+class CostCache:
+    def __init__(self, path=None):
+        self.path = path or cost_cache_path
+        self.lock = threading.Lock()
+        self.dirty = False
+        # app -> {"days": {"YYYY-MM-DD": cost entry}, "closed_through": date,
+        # "etag": str, "last_modified": str}
+        self.apps = {}
+
+        try:
+            with open(self.path) as f:
+                self.apps = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.critical(f"Ignoring the unreadable cost cache {self.path}: {str(e)}")
+
+    # First day whose cost can still change.
+    def window_start(self, app, today=None):
+        today = today or date.today()
+        closed_through = self.apps.get(app, {}).get("closed_through")
+        if closed_through is None:
+            return today
+        return min(today, date.fromisoformat(closed_through) + timedelta(days=1))
+
+    def request_params(self, app, today=None):
+        today = today or date.today()
+        return {
+            window_start_param: self.window_start(app, today).isoformat(),
+            window_end_param: today.isoformat(),
+        }
+
+    # Validators of the last response, for a conditional request.
+    def request_headers(self, app):
+        entry = self.apps.get(app, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    # Stores the open days of a /cost response. Days before the window are
+    # ignored, so a response with the whole history is not stored again.
+    def update(self, app, costs, headers=None, today=None):
+        today = today or date.today()
+        start = self.window_start(app, today).isoformat()
+        headers = headers or {}
+
+        with self.lock:
+            entry = self.apps.setdefault(app, {"days": {}})
+            for day, cost in costs.items():
+                if start <= day <= today.isoformat():
+                    entry["days"][day] = cost
+            entry["closed_through"] = (today - timedelta(days=1)).isoformat()
+            entry["etag"] = headers.get("ETag")
+            entry["last_modified"] = headers.get("Last-Modified")
+            self.dirty = True
+
+    # The cached days of an app in the shape of a /cost response.
+    def costs(self, app):
+        with self.lock:
+            return {"costs": dict(self.apps.get(app, {}).get("days", {}))}
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(self.apps, f)
+                os.replace(tmp_path, self.path)
+                self.dirty = False
+            except OSError as e:
+                logging.critical(f"Failed to save the cost cache {self.path}: {str(e)}")
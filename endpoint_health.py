@@ -0,0 +1,115 @@
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from runpod_client import get_client
+
+health_url = "https://api.runpod.ai/v2/{endpoint_id}/health"
+
+
+# Live jobs and workers of a serverless endpoint:
+# {"jobs": {"inQueue", "inProgress", "completed", ...},
+#  "workers": {"idle", "running", "throttled", ...}}
+def get_endpoint_health(endpoint_id, api_key):
+    return get_client(api_key).get(health_url.format(endpoint_id=endpoint_id))
+
+
+# Health of all the endpoints ({id: name}) at the same time, endpoints that
+# could not be read are left out.
+def fetch_endpoints_health(endpoints, api_key):
+    def fetch(endpoint_id):
+        try:
+            return get_endpoint_health(endpoint_id, api_key)
+        except requests.exceptions.RequestException as e:
+            logging.critical(f"Failed to read the health of {endpoints[endpoint_id]}: {str(e)}")
+            return None
+
+    if not endpoints:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(len(endpoints), 16)) as executor:
+        health = dict(zip(endpoints, executor.map(fetch, endpoints)))
+    return {endpoint_id: h for endpoint_id, h in health.items() if h is not None}
+
+
+# Seconds from now until at least `workers` workers of the endpoint are up (idle
+# or running), e.g. right after raising its workersMin. None if they were
+# already up at the first read or did not come up within `timeout`.
+def wait_until_ready(endpoint_id, api_key, workers, timeout=1800, interval=5):
+    started = time.monotonic()
+    waited = False
+
+    while time.monotonic() - started < timeout:
+        try:
+            health = get_endpoint_health(endpoint_id, api_key).get("workers", {})
+            if health.get("idle", 0) + health.get("running", 0) >= workers:
+                return round(time.monotonic() - started, 1) if waited else None
+            waited = True
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"Failed to read the health of {endpoint_id}: {str(e)}")
+        time.sleep(interval)
+
+    return None
+
+
+# Keeps the last `window` health samples of each endpoint. An endpoint has a
+# backlog when its queue grew at every sample of the window and is at least
+# `min_queue` jobs long: jobs arrive faster than the workers drain them.
+class BacklogTracker:
+    def __init__(self, window=4, min_queue=5):
+        self.window = max(window, 2)
+        self.min_queue = min_queue
+        self.samples = {}
+
+    def add(self, key, timestamp, health):
+        jobs = health.get("jobs", {})
+        workers = health.get("workers", {})
+        self.samples.setdefault(key, deque(maxlen=self.window)).append(
+            {
+                "timestamp": timestamp,
+                "in_queue": jobs.get("inQueue", 0),
+                "in_progress": jobs.get("inProgress", 0),
+                # Logged as read. It counts the jobs of a rolling window whose
+                # length is not documented, so no rate is derived from it.
+                "completed": jobs.get("completed", 0),
+                "running": workers.get("running", 0),
+                "idle": workers.get("idle", 0),
+                "throttled": workers.get("throttled", 0),
+            }
+        )
+
+    # Share of the available workers busy with a job.
+    def utilization(self, key):
+        last = self.samples[key][-1]
+        available = last["running"] + last["idle"]
+        return round(last["running"] / available, 2) if available else None
+
+    def stats(self, key):
+        samples = self.samples[key]
+        first, last = samples[0], samples[-1]
+        minutes = (last["timestamp"] - first["timestamp"]) / 60
+
+        return {
+            **last,
+            "utilization": self.utilization(key),
+            "queue_growth_per_minute": (
+                round((last["in_queue"] - first["in_queue"]) / minutes, 2)
+                if minutes
+                else None
+            ),
+        }
+
+    def has_backlog(self, key):
+        samples = self.samples.get(key, ())
+        if len(samples) < self.window:
+            return False
+        queue = [sample["in_queue"] for sample in samples]
+        growing = all(after > before for before, after in zip(queue, queue[1:]))
+        return growing and queue[-1] >= self.min_queue
+
+    def is_drained(self, key):
+        samples = self.samples.get(key)
+        return bool(samples) and samples[-1]["in_queue"] < self.min_queue
+
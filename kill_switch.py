@@ -0,0 +1,121 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import botocore.exceptions
+from botocore.config import Config
+
+# Points the ELBv2 clients at a local stand-in (e.g. a moto server) instead of AWS.
+elbv2_endpoint_url = os.environ.get("ELBV2_ENDPOINT_URL")
+
+client_config = Config(
+    connect_timeout=5, read_timeout=10, retries={"max_attempts": 3, "mode": "standard"}
+)
+
+# One ELBv2 client per region, created once. Creating boto3 clients is not
+# thread safe, the lock keeps it to one at a time.
+lock = threading.Lock()
+clients = {}
+
+
+def get_client(region_name):
+    with lock:
+        if region_name not in clients:
+            clients[region_name] = boto3.client(
+                "elbv2",
+                region_name=region_name,
+                endpoint_url=elbv2_endpoint_url,
+                config=client_config,
+            )
+        return clients[region_name]
+
+
+# Creates the clients of the kill switch regions and reads their rules once, so
+# the credentials and rule ARNs are checked and the connections are open before
+# the kill switch is needed. `targets` is {name: (region, rule_priority_and_arn)}.
+def prepare_kill_switches(targets):
+    for name, (region_name, rule_priority_and_arn) in targets.items():
+        try:
+            get_client(region_name).describe_rules(
+                RuleArns=[rule["RuleArn"] for rule in rule_priority_and_arn]
+            )
+        except Exception as e:
+            logging.critical(f"Kill switch {name} in {region_name} is not usable: {str(e)}")
+            print(f"Kill switch {name} in {region_name} is not usable: {str(e)}")
+
+
+# Whether the rules have the priorities they were set to.
+def verify_rule_priorities(client, rule_priority_and_arn):
+    response = client.describe_rules(
+        RuleArns=[rule["RuleArn"] for rule in rule_priority_and_arn]
+    )
+    priorities = {rule["RuleArn"]: rule["Priority"] for rule in response["Rules"]}
+    return all(
+        priorities.get(rule["RuleArn"]) == str(rule["Priority"])
+        for rule in rule_priority_and_arn
+    )
+
+
+def activate_alb_kill_switch(region_name, rule_priority_and_arn):
+    try:
+        client = get_client(region_name)
+        client.set_rule_priorities(RulePriorities=rule_priority_and_arn)
+
+        if not verify_rule_priorities(client, rule_priority_and_arn):
+            logging.critical(
+                f"Kill switch rule priorities not applied in region_name: {region_name}"
+            )
+            return False
+
+        print(f"Kill Switch activated!! region_name: {region_name}")
+        return True
+
+    except botocore.exceptions.NoCredentialsError:
+        logging.critical(
+            "Error: No AWS credentials found. Please configure them using 'aws configure' or set environment variables."
+        )
+
+    except botocore.exceptions.PartialCredentialsError:
+        logging.critical(
+            "Error: Incomplete AWS credentials detected. Please check your AWS access key and secret key."
+        )
+
+    except botocore.exceptions.ClientError as e:
+        # Handle specific AWS errors
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+        logging.critical(f"AWS ClientError: {error_code} - {error_message}")
+
+    except botocore.exceptions.EndpointConnectionError:
+        logging.critical(
+            "Error: Unable to connect to AWS endpoint. Check your internet connection and region settings."
+        )
+
+    except Exception as e:
+        logging.critical(f"An unexpected error occurred: {str(e)}")
+
+    return False
+
+
+# Activates all the kill switches at the same time. Returns
+# {name: {"activated": bool, "seconds": float}}, activated only once the new
+# priorities were read back.
+def activate_kill_switches(targets):
+    def activate(name, region_name, rule_priority_and_arn):
+        started = time.monotonic()
+        activated = activate_alb_kill_switch(region_name, rule_priority_and_arn)
+        seconds = time.monotonic() - started
+        logging.critical(
+            f"Kill switch {name} in {region_name}: activated={activated} in {seconds:.3f}s"
+        )
+        return {"activated": activated, "seconds": round(seconds, 3)}
+
+    with ThreadPoolExecutor(max_workers=max(len(targets), 1)) as executor:
+        futures = {
+            name: executor.submit(activate, name, region_name, rule_priority_and_arn)
+            for name, (region_name, rule_priority_and_arn) in targets.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,296 @@
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import logging
+import math
+import os
+import random
+import time
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+quantiles = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+# provider -> billing script module. The Cerebrium script name is not a valid
+# module name, so the modules are imported by name.
+billing_modules = {
+    "runpod": "runpod_billing_alert",
+    "cerebrium": "cerebrium-billing-alert",
+}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, math.ceil(q * len(values)) - 1)], 4)
+
+
+def summarize(values):
+    return {name: percentile(values, q) for name, q in quantiles.items()}
+
+
+# Today's cost as the RunPod monitor computes it from one hourly billing row.
+def runpod_cost(module, amount):
+    row = {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "gpuCloudAmount": amount,
+        "serverlessAmount": 0.0,
+    }
+    return module.compute_todays_cost(module.get_todays_bill([row]))
+
+
+# Today's cost as the Cerebrium monitor computes it, the amount split evenly
+# over its apps.
+def cerebrium_cost(module, amount):
+    today = datetime.now().date().isoformat()
+    cents = amount * 100 / len(module.app_dict)
+    data = {"costs": {today: {"total_cost_cents": cents}}}
+    return round(
+        sum(module.get_today_total_cost_dollars(data) for _ in module.app_dict), 2
+    )
+
+
+cost_functions = {"runpod": runpod_cost, "cerebrium": cerebrium_cost}
+
+
+# Creates one rule per kill switch target of the monitor in a local ELBv2 and
+# points the monitor at them. Returns the rules with their initial priorities.
+def create_rules(module, prefix):
+    import boto3
+
+    from kill_switch import get_client
+
+    listeners = {}
+    rules = []
+    for index, (name, (region_name, rule_priority_and_arn)) in enumerate(
+        list(module.kill_switch_targets.items())
+    ):
+        elbv2 = get_client(region_name)
+        if region_name not in listeners:
+            ec2 = boto3.client(
+                "ec2",
+                region_name=region_name,
+                endpoint_url=os.environ.get("ELBV2_ENDPOINT_URL"),
+            )
+            vpc = ec2.create_vpc(CidrBlock="10.0.0.0/16")["Vpc"]["VpcId"]
+            subnets = [
+                ec2.create_subnet(
+                    VpcId=vpc,
+                    CidrBlock=f"10.0.{i}.0/24",
+                    AvailabilityZone=f"{region_name}{zone}",
+                )["Subnet"]["SubnetId"]
+                for i, zone in enumerate("ab")
+            ]
+            load_balancer = elbv2.create_load_balancer(
+                Name=f"{prefix}-{region_name}", Subnets=subnets
+            )["LoadBalancers"][0]["LoadBalancerArn"]
+            target_group = elbv2.create_target_group(
+                Name=f"{prefix}-{region_name}", Protocol="HTTP", Port=80, VpcId=vpc
+            )["TargetGroups"][0]["TargetGroupArn"]
+            listener = elbv2.create_listener(
+                LoadBalancerArn=load_balancer,
+                Protocol="HTTP",
+                Port=80,
+                DefaultActions=[{"Type": "forward", "TargetGroupArn": target_group}],
+            )["Listeners"][0]["ListenerArn"]
+            listeners[region_name] = (listener, target_group)
+
+        listener, target_group = listeners[region_name]
+        stand_in = []
+        for offset, rule in enumerate(rule_priority_and_arn):
+            initial_priority = 1000 + 10 * index + offset
+            rule_arn = elbv2.create_rule(
+                ListenerArn=listener,
+                Priority=initial_priority,
+                Conditions=[{"Field": "path-pattern", "Values": [f"/{index}/{offset}"]}],
+                Actions=[{"Type": "forward", "TargetGroupArn": target_group}],
+            )["Rules"][0]["RuleArn"]
+            stand_in.append({"RuleArn": rule_arn, "Priority": rule["Priority"]})
+            rules.append((region_name, rule_arn, initial_priority))
+        module.kill_switch_targets[name] = (region_name, stand_in)
+
+    return rules
+
+
+def reset_rules(rules):
+    from kill_switch import get_client
+
+    for region_name, rule_arn, priority in rules:
+        get_client(region_name).set_rule_priorities(
+            RulePriorities=[{"RuleArn": rule_arn, "Priority": priority}]
+        )
+
+
+# Polls a linear spend ramp every `poll_interval` simulated seconds, starting at
+# a random phase, until the monitor's budget activates the kill switches.
+# Simulated time stands in for the waits between polls, the cost pipeline and
+# the activation run for real.
+def run_trial(module, cost_of, rate_per_hour, poll_interval, notify, rng):
+    from budget import Budget
+
+    budget = Budget(
+        "Dry run",
+        module.soft_threshold,
+        module.hard_threshold,
+        module.kill_switch_targets,
+        notify,
+        tz=timezone.utc,
+    )
+    breach_at = module.hard_threshold / rate_per_hour * 3600
+    day_start = datetime.now(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    ).timestamp()
+
+    first_poll = max(0.0, breach_at - 10 * poll_interval)
+    t = first_poll - first_poll % poll_interval + rng.uniform(0, poll_interval)
+    while True:
+        started = time.perf_counter()
+        cost = cost_of(module, round(rate_per_hour / 3600 * t, 4))
+        status = budget.check(cost, poll_interval, now=day_start + t)
+
+        if status in ("hard", "predicted"):
+            activation_seconds = time.perf_counter() - started
+            return {
+                "detection_delay": t - breach_at,
+                "activation_seconds": activation_seconds,
+                "breach_to_rule_change": t - breach_at + activation_seconds,
+                "activated": budget.is_kill_switch_activated,
+                "preemptive": status == "predicted",
+            }
+        t += poll_interval
+
+
+def run_provider(provider, args, rng):
+    module = importlib.import_module(billing_modules[provider])
+    # Alerts raised by the cost pipeline are collected instead of posted.
+    alerts = []
+
+    def notify(message, key=None):
+        alerts.append(message)
+
+    module.send_slack_notification = notify
+
+    rules = create_rules(module, provider)
+    rate_per_hour = args.ramp_rate or module.hard_threshold
+
+    trials = []
+    # The kill switch prints every activation, keep the report readable.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.trials):
+            trials.append(
+                run_trial(
+                    module,
+                    cost_functions[provider],
+                    rate_per_hour,
+                    args.poll_interval,
+                    notify,
+                    rng,
+                )
+            )
+            reset_rules(rules)
+
+    report = {
+        "hard_threshold": module.hard_threshold,
+        "ramp_rate_per_hour": rate_per_hour,
+        "trials": len(trials),
+        "activated": sum(t["activated"] for t in trials),
+        "preemptive": sum(t["preemptive"] for t in trials),
+        "alerts": len(alerts),
+    }
+    for metric in ("detection_delay", "activation_seconds", "breach_to_rule_change"):
+        report[metric] = summarize([t[metric] for t in trials])
+    logging.info(f"Kill switch benchmark {provider}: {json.dumps(report)}")
+    return report
+
+
+def run_benchmark(args):
+    started_at = datetime.now(timezone.utc).isoformat()
+    rng = random.Random(args.seed)
+    providers = {
+        provider: run_provider(provider, args, rng) for provider in args.provider
+    }
+    return {
+        "started_at": started_at,
+        "poll_interval": args.poll_interval,
+        "preemptive": args.preemptive,
+        "providers": providers,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Dry run of the billing kill switches against a local ELBv2 stand-in, "
+        "reporting the breach to rule change latency."
+    )
+    parser.add_argument(
+        "--provider",
+        action="append",
+        choices=sorted(billing_modules),
+        help="Only these billing monitors (default: all).",
+    )
+    parser.add_argument("--trials", type=int, default=50)
+    parser.add_argument(
+        "--poll-interval", type=float, default=60, help="Seconds between billing checks."
+    )
+    parser.add_argument(
+        "--ramp-rate",
+        type=float,
+        help="Spend in dollars per hour of the synthetic ramp (default: the hard threshold per hour).",
+    )
+    parser.add_argument(
+        "--no-preemptive",
+        dest="preemptive",
+        action="store_false",
+        help="Only activate once the hard threshold is reached.",
+    )
+    parser.add_argument(
+        "--endpoint-url",
+        help="ELBv2 stand-in to use (e.g. a moto server), default: moto in process.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    args = parser.parse_args()
+    args.provider = args.provider or sorted(billing_modules)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        filename="kill_switch_benchmark.log",
+        filemode="a",
+    )
+
+    # The billing monitors read their configuration when imported. Nothing here
+    # may reach the real AWS account or Slack.
+    load_dotenv()
+    os.environ["ALERT_OUTBOX_PATH"] = ":memory:"
+    os.environ.setdefault("SOFT_THRESHOLD", "50")
+    os.environ.setdefault("HARD_THRESHOLD", "100")
+    for key in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        os.environ[key] = "testing"
+    os.environ.pop("AWS_SESSION_TOKEN", None)
+
+    if not args.preemptive:
+        os.environ["PREEMPTIVE_KILL_SWITCH"] = "false"
+
+    if args.endpoint_url:
+        os.environ["ELBV2_ENDPOINT_URL"] = args.endpoint_url
+        report = run_benchmark(args)
+    else:
+        os.environ.pop("ELBV2_ENDPOINT_URL", None)
+        from moto import mock_aws
+
+        with mock_aws():
+            report = run_benchmark(args)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Report written to {args.output}")
+    else:
+        print(output)
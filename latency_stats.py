@@ -0,0 +1,115 @@
+import math
+
+# Log-bucketed (HDR style) histogram: bucket boundaries grow by `precision`, so
+# every quantile is exact to within that relative error and the memory is a fixed
+# list of counts no matter how many samples are recorded.
+min_latency = 0.001  # 1 ms
+max_latency = 600.0  # 10 min
+precision = 0.05
+
+
+class LatencyHistogram:
+    def __init__(self, half_life=None):
+        self.growth = math.log1p(precision)
+        bucket_count = int(math.log(max_latency / min_latency) / self.growth) + 2
+        self.counts = [0.0] * bucket_count
+        self.total = 0.0
+        # With a half-life (in samples) older samples fade out, so the histogram
+        # follows the current behaviour instead of the whole history.
+        self.decay = 0.5 ** (1 / half_life) if half_life else 1.0
+
+    def bucket(self, value):
+        value = min(max(value, min_latency), max_latency)
+        return int(math.log(value / min_latency) / self.growth)
+
+    def add(self, value):
+        if self.decay != 1.0:
+            self.counts = [count * self.decay for count in self.counts]
+            self.total *= self.decay
+        self.counts[self.bucket(value)] += 1
+        self.total += 1
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+
+    # Samples (decayed) in the buckets above the one of `value`.
+    def count_above(self, value):
+        return sum(self.counts[self.bucket(value) + 1 :])
+
+    def quantile(self, q):
+        if not self.total:
+            return None
+
+        rank = q * self.total
+        seen = 0.0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                # Upper bound of the bucket.
+                return min_latency * math.exp((index + 1) * self.growth)
+        return max_latency
+
+
+class LatencyTracker:
+    def __init__(
+        self,
+        factor,
+        baseline_half_life=288,
+        recent_half_life=6,
+        min_samples=20,
+        confirm_samples=3,
+        tail_samples=2,
+        quantiles=(0.95, 0.99),
+    ):
+        self.factor = factor
+        self.min_samples = min_samples
+        self.confirm_samples = confirm_samples
+        self.tail_samples = tail_samples
+        self.quantiles = quantiles
+        self.baseline = LatencyHistogram(baseline_half_life)
+        self.recent = LatencyHistogram(recent_half_life)
+        self.samples = 0
+        self.regressed_samples = 0
+        self.is_regressed = False
+
+    def add(self, latency):
+        # Keep the outliers out of the baseline, otherwise the baseline catches
+        # up with a regression and hides it.
+        baseline_p99 = self.baseline.quantile(0.99)
+        if self.samples < self.min_samples or latency <= baseline_p99 * self.factor:
+            self.baseline.add(latency)
+        self.recent.add(latency)
+        self.samples += 1
+
+    def summary(self):
+        return {
+            f"p{round(q * 100)}": (self.recent.quantile(q), self.baseline.quantile(q))
+            for q in self.quantiles
+        }
+
+    # A quantile is regressed when its share of the recent samples, and at
+    # least `tail_samples` of them, are past `factor` times its baseline. The
+    # recent histogram only holds a few samples, its p95/p99 alone would be
+    # the slowest one of them.
+    def is_regressed_at(self, q, baseline):
+        slow = self.recent.count_above(baseline * self.factor)
+        return slow >= max(self.tail_samples, (1 - q) * self.recent.total)
+
+    # Returns the regressed quantiles as {"p95": (recent, baseline)} once the
+    # recent latency stayed past `factor` times the baseline for
+    # `confirm_samples` samples in a row, else {}.
+    def regressions(self):
+        if self.samples < self.min_samples:
+            return {}
+
+        regressions = {}
+        for q in self.quantiles:
+            baseline = self.baseline.quantile(q)
+            if self.is_regressed_at(q, baseline):
+                regressions[f"p{round(q * 100)}"] = (self.recent.quantile(q), baseline)
+        self.regressed_samples = self.regressed_samples + 1 if regressions else 0
+
+        if self.regressed_samples < self.confirm_samples and not self.is_regressed:
+            return {}
+        return regressions
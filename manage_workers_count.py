@@ -1,6 +1,8 @@
 import requests
 import json
-import slack
+from endpoint_health import BacklogTracker, fetch_endpoints_health
+from runpod_client import get_client
+from slack_notifier import get_alert_dispatcher
 import os
 from dotenv import load_dotenv
 import logging
@@ -20,17 +22,24 @@ api_key = os.environ.get("API_KEY")
 active_worker_threshold = int(os.environ.get("ACTIVE_WORKER_THRESHOLD"))
 slack_channel = "runpod_mia_alerts"
 slack_runpod_alert_token = os.environ.get("SLACK_RUNPOD_ALERT_TOKEN")
+# The live workers and job queue of every endpoint are read every
+# WORKER_HEALTH_INTERVAL seconds. A backlog is alerted once the queue grew at each
+# of the last BACKLOG_WINDOW reads and holds at least BACKLOG_MIN_QUEUE jobs.
+worker_health_interval = int(os.environ.get("WORKER_HEALTH_INTERVAL", 30))
+backlog_window = int(os.environ.get("BACKLOG_WINDOW", 4))
+backlog_min_queue = int(os.environ.get("BACKLOG_MIN_QUEUE", 5))
 
-client = slack.WebClient(slack_runpod_alert_token)
+send_slack_notification = get_alert_dispatcher(slack_runpod_alert_token, slack_channel).notify
 
-url = f"https://api.runpod.io/graphql?api_key={api_key}"
-headers = {"content-type": "application/json"}
+runpod = get_client(api_key)
 
 query = {
     "query": """
     query Endpoints {
       myself {
         endpoints {
+          id
+          name
           workersMin
         }
       }
@@ -44,33 +53,13 @@ def get_endpoints_data():
     result = {"data": None, "error_message": ""}
 
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(query))
-        response.raise_for_status()
-
-        if response.status_code == 200:
-            result["data"] = response.json()
-
-        return result
-
-    except requests.exceptions.HTTPError as e:
-        logging.critical(f"HTTP Error happend: {str(e)}")
-        result["error_message"] = str(e)
-        return result
-
-    except requests.exceptions.ConnectionError as e:
-        logging.critical(f"HTTP Connection error happend: {str(e)}")
-        result["error_message"] = str(e)
-        return result
-
-    except requests.exceptions.Timeout as e:
-        logging.critical(f"Timeout error happend: {str(e)}")
-        result["error_message"] = str(e)
-        return result
+        result["data"] = runpod.post(query)
 
     except requests.exceptions.RequestException as e:
-        logging.critical(f"Timeout error happend: {str(e)}")
+        logging.critical(f"Runpod request failed: {str(e)}")
         result["error_message"] = str(e)
-        return result
+
+    return result
 
 
 def get_activeworkers_and_endpoints_count(data):
@@ -83,48 +72,68 @@ def get_activeworkers_and_endpoints_count(data):
     return total_endpoints, total_active_workers
 
 
-def send_slack_notification(message):
-    try:
-        client.chat_postMessage(channel=slack_channel, text=message)
-    except slack.errors.SlackApiError as e:
-        if e.response["error"] == "not_in_channel":
-            # Attempt to join the channel first
-            try:
-                client.conversations_join(channel=slack_channel)
-                client.chat_postMessage(channel=slack_channel, text=error_message)
-            except slack.errors.SlackApiError as join_error:
-                print(
-                    f"Failed to join and send message: {join_error.response['error']}"
-                )
-        else:
-            print(f"Slack API Error: {e.response['error']}")
+def check_backlog(tracker, endpoints, backlogged):
+    health = fetch_endpoints_health(endpoints, api_key)
+    now = time.time()
 
+    for endpoint_id, endpoint_health in health.items():
+        name = endpoints[endpoint_id]
+        tracker.add(name, now, endpoint_health)
+        stats = tracker.stats(name)
+        logging.info(f"Endpoint {name} workers and queue: {json.dumps(stats)}")
 
-def start_monitoring(sleep):
-
-    while True:
-        result = get_endpoints_data()
+        if tracker.has_backlog(name):
+            backlogged.add(name)
+            alert_msg = f"`ALERT`: The `{name}` queue grows faster than its workers drain it. Queued jobs: `{stats['in_queue']}` (`{stats['queue_growth_per_minute']:+}`/min), in progress: `{stats['in_progress']}`. Workers: `{stats['running']}` running, `{stats['idle']}` idle, `{stats['throttled']}` throttled."
+            send_slack_notification(alert_msg, f"backlog:{name}")
+            logging.critical(alert_msg)
+            print(alert_msg)
+        elif name in backlogged and tracker.is_drained(name):
+            backlogged.discard(name)
+            alert_msg = f"The `{name}` queue is drained again, queued jobs: `{stats['in_queue']}`."
+            send_slack_notification(alert_msg)
+            logging.critical(alert_msg)
 
-        if result["data"]:
-            total_endpoints, total_active_workers = (
-                get_activeworkers_and_endpoints_count(result['data'])
-            )
 
-            # Check for the threshold
-            if total_active_workers > active_worker_threshold:
-                alert_msg = f" Active worker count is: `{total_active_workers}` which more than the threshold configured i.e. `{active_worker_threshold}`. Total number of endpoints: `{total_endpoints}`"
-                send_slack_notification(alert_msg)
-                logging.critical(alert_msg)
-                print(alert_msg)
-        else:
-            error_message = result["error_message"]
-            send_slack_notification(error_message)
-            logging.critical(error_message)
-            print(error_message)
-
-        # sleep for 5 mins.
-        time.sleep(sleep)
+def start_monitoring(sleep):
 
+    tracker = BacklogTracker(backlog_window, backlog_min_queue)
+    backlogged = set()
+    # endpoint id -> name, refreshed with every worker count check.
+    endpoints = {}
+    next_count_check = time.monotonic()
 
-start_monitoring(300)
+    while True:
+        if time.monotonic() >= next_count_check:
+            next_count_check += sleep
+            result = get_endpoints_data()
 
+            if result["data"]:
+                total_endpoints, total_active_workers = (
+                    get_activeworkers_and_endpoints_count(result['data'])
+                )
+                endpoints = {
+                    endpoint["id"]: endpoint["name"]
+                    for endpoint in result["data"]["data"]["myself"]["endpoints"]
+                }
+
+                # Check for the threshold
+                if total_active_workers > active_worker_threshold:
+                    alert_msg = f" Active worker count is: `{total_active_workers}` which more than the threshold configured i.e. `{active_worker_threshold}`. Total number of endpoints: `{total_endpoints}`"
+                    send_slack_notification(alert_msg, "active_worker_threshold")
+                    logging.critical(alert_msg)
+                    print(alert_msg)
+            else:
+                error_message = result["error_message"]
+                send_slack_notification(error_message)
+                logging.critical(error_message)
+                print(error_message)
+
+        check_backlog(tracker, endpoints, backlogged)
+
+        time.sleep(worker_health_interval)
+
+
+if __name__ == "__main__":
+    # Check the worker count every 5 mins.
+    start_monitoring(300)
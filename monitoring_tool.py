@@ -1,21 +1,16 @@
-import requests
-from requests.auth import HTTPBasicAuth
+import httpx
 import logging
-from var import (
-    summary_input,
-    pickup_intent_input,
-    smart_reply_input,
-    email_smart_reply_input,
-    message_generation_input,
-    message_improvisation_input,
-    email_generation_input,
-    email_improvisation_input,
-)
-import time
-import slack
+from probe_targets import providers, probe_targets, cerebrium_project_api_keys
+from probe_http import create_client, new_timings, timed_post
+from latency_stats import LatencyTracker
+from cold_start import ColdStartTracker, fetch_scaling_settings
+from slack_notifier import get_alert_dispatcher
+import asyncio
 import os
 from dotenv import load_dotenv
 import json
+import time
+from collections import deque
 
 load_dotenv()
 
@@ -28,284 +23,496 @@ logging.basicConfig(
 )
 
 timeout = 120
-# url = "https://mia-staging.livil.co"
-url = "https://us.mia.livil.co"
-slack_channel = "nna_mia_alerts"
-slack_lfmh_alert_token = os.environ.get("SLACK_NNA_ALERT_TOKEN")
-username = os.environ.get("USER_NAME")
-password = os.environ.get("PASSWORD")
 jwt_token = os.environ.get("JWT_TOKEN")
-
-client = slack.WebClient(slack_lfmh_alert_token)
+probe_interval = int(os.environ.get("PROBE_INTERVAL", 300))
+# After a failure the task is probed again every PROBE_CONFIRM_INTERVAL seconds,
+# and only alerted once PROBE_CONFIRM_FAILURES probes in a row failed. While it
+# is down it is probed every PROBE_DOWN_INTERVAL seconds to see the recovery.
+probe_confirm_interval = int(os.environ.get("PROBE_CONFIRM_INTERVAL", 30))
+probe_confirm_failures = int(os.environ.get("PROBE_CONFIRM_FAILURES", 3))
+probe_down_interval = int(os.environ.get("PROBE_DOWN_INTERVAL", 60))
+# Every probe gets `timeout` seconds in total. Once the latency of a task is
+# known each attempt times out at its p99 times PROBE_DEADLINE_FACTOR, and up to
+# PROBE_MAX_ATTEMPTS attempts are made within the budget, the last one getting
+# whatever is left. PROBE_HEDGE sends a second request when the first one is
+# slower than the p95 and keeps the first successful answer. While the worker
+# endpoint may be cold the attempts are timed from its cold start p99, and the
+# whole budget if not known yet, and no hedge is sent.
+probe_max_attempts = int(os.environ.get("PROBE_MAX_ATTEMPTS", 2))
+probe_deadline_factor = float(os.environ.get("PROBE_DEADLINE_FACTOR", 2))
+probe_min_attempt_timeout = float(os.environ.get("PROBE_MIN_ATTEMPT_TIMEOUT", 10))
+probe_hedge = os.environ.get("PROBE_HEDGE", "false").lower() == "true"
+max_in_flight_requests = int(os.environ.get("MAX_IN_FLIGHT_REQUESTS", 4))
+# HTTP/2 needs the optional "h2" package (pip install httpx[http2]).
+use_http2 = os.environ.get("PROBE_HTTP2", "false").lower() == "true"
+keepalive_expiry = int(os.environ.get("PROBE_KEEPALIVE_EXPIRY", 600))
+# Pack every task going to the same endpoint into one request.
+batch_probes = os.environ.get("PROBE_BATCH", "false").lower() == "true"
+# Alert when the recent p95/p99 latency is this many times its baseline.
+latency_alert_factor = float(os.environ.get("LATENCY_ALERT_FACTOR", 3))
+latency_min_samples = int(os.environ.get("LATENCY_MIN_SAMPLES", 20))
+
+# Cold start detection. RUNPOD_TASK_ENDPOINTS maps a task to the Runpod endpoint
+# name serving it, e.g. {"summarization": "mia-jupiter-1"}.
+runpod_api_key = os.environ.get("API_KEY")
+runpod_task_endpoints = json.loads(os.environ.get("RUNPOD_TASK_ENDPOINTS") or "{}")
+cerebrium_api_keys = {
+    project: os.environ.get(env_name)
+    for project, env_name in cerebrium_project_api_keys.items()
+}
+scaling_settings_refresh = int(os.environ.get("SCALING_SETTINGS_REFRESH", 600))
+cold_start_jump_factor = float(os.environ.get("COLD_START_JUMP_FACTOR", 3))
+# Cold probes in a row after which they are checked for latency regressions
+# like the warm ones.
+cold_start_max_streak = int(os.environ.get("COLD_START_MAX_STREAK", 3))
+
+# Recent probe latency and the probes in flight of every worker endpoint,
+# written to PROBE_LATENCY_PATH for the workers autoscaler.
+probe_latency_path = os.environ.get("PROBE_LATENCY_PATH", "probe_latency.json")
+
+# Only probe the given providers, e.g. MONITORED_PROVIDERS=runpod,cerebrium
+monitored_providers = os.environ.get("MONITORED_PROVIDERS", ",".join(providers))
+monitored_providers = [p.strip() for p in monitored_providers.split(",") if p.strip()]
+
+# Latency histograms per (provider, task, model).
+latency_trackers = {}
+cold_start_tracker = ColdStartTracker(cold_start_jump_factor)
+# Consecutive failures per (provider, task, model).
+probe_states = {}
+# (provider, worker endpoint) -> {"samples": [[started, latency], ...],
+# "in_flight", "timestamp"}
+probe_activity = {}
+
+
+def new_result(timings):
+    return {
+        "is_success": False,
+        "error_message": "Default",
+        "timings": timings,
+        "attempt": 1,
+        "hedged": False,
+    }
 
 
-def send_request_to_mia(
-    data,
-    task: str,
+# Sends one request carrying a job per target. All the targets must share the
+# same provider and endpoint. Returns one result per target, in the same order.
+async def send_probe_request(
+    client, targets: list, request_timeout=timeout, log_response=True
 ):
-    endpoint = "/insights_ico"
-    full_url = url + endpoint
-    result = {"is_success": False, "error_message": "Default"}
+    provider = targets[0]["provider"]
+    tasks = ", ".join(target["task"] for target in targets)
+    full_url = providers[provider]["url"] + targets[0]["endpoint"]
+    timings = new_timings()
+    results = [new_result(timings) for _ in targets]
+
+    data = {
+        "req_jobs": [
+            {
+                "id": job_id,
+                "model": target["model"],
+                "task": target["task"],
+                **target["payload"],
+            }
+            for job_id, target in enumerate(targets, start=1)
+        ]
+    }
 
     headers = {
         "Authorization": f"Bearer {jwt_token}",
-        "X-provider": "runpod",
+        "X-provider": provider,
         "Content-Type": "application/json",
     }
 
     try:
-        response = requests.post(full_url, headers=headers, json=data, timeout=timeout)
+        response = await timed_post(
+            client,
+            full_url,
+            timings,
+            headers=headers,
+            json=data,
+            timeout=request_timeout,
+        )
         response.raise_for_status()
         response_dict = response.json()
-        error = response_dict["res_jobs"][0]["error"]
-
-        # When the request is in 'IN_QUEUE' or 'IN_PROGRESS' state on the runpod side for a
-        # very long time then the backend sends HTTP 200 with the error message.
-        # For now to capture such scenario a simple string matching will work.
-        # Once the 'error' key is added to JSON response for all the tasks then
-        # below logic we have to change the below logic.
-        if response.status_code == 200 and not error:
-            logging.info(f"Response: {response_dict}")
-            print(f"Response: {response_dict}")
-            result["is_success"] = True
-            result["error_message"] = ""
-            return result
-        else:
-            logging.info(f"Response: {response_dict}")
-            print(f"Response: {response_dict}")
-            result["is_success"] = False
-            result["error_message"] = error
-            return result
-
-    except requests.exceptions.HTTPError as e:
-        logging.critical(f"HTTP Error happend for {task} and exception {str(e)}")
-        result["is_success"] = False
-        result["error_message"] = str(e)
-        return result
-
-    except requests.exceptions.ConnectionError as e:
+        if log_response:
+            logging.info(f"{provider} {tasks} timings: {format_timings(timings)}")
+            logging.info(f"{provider} Response: {response_dict}")
+            print(f"{provider} Response: {response_dict}")
+
+        # A batch has a single response, so every job of it gets the latency of
+        # the whole request.
+        res_jobs = {job.get("id"): job for job in response_dict["res_jobs"]}
+
+        for job_id, result in enumerate(results, start=1):
+            if job_id not in res_jobs:
+                result["error_message"] = f"No result for job {job_id} in the response"
+                continue
+
+            # When the request is in 'IN_QUEUE' or 'IN_PROGRESS' state on the runpod side for a
+            # very long time then the backend sends HTTP 200 with the error message.
+            # For now to capture such scenario a simple string matching will work.
+            # Once the 'error' key is added to JSON response for all the tasks then
+            # below logic we have to change the below logic.
+            error = res_jobs[job_id].get("error")
+            if response.status_code == 200 and not error:
+                result["is_success"] = True
+                result["error_message"] = ""
+            else:
+                result["is_success"] = False
+                result["error_message"] = error
+
+        return results
+
+    except httpx.HTTPStatusError as e:
         logging.critical(
-            f"HTTP Connection error happend for {task} and exception {str(e)}"
+            f"HTTP Error happend for {provider} {tasks} and exception {str(e)}"
         )
-        result["is_success"] = False
-        result["error_message"] = str(e)
-        return result
-
-    except requests.exceptions.Timeout as e:
-        logging.critical(f"Timeout error happend for {task} and exception {str(e)}")
-        result["is_success"] = False
-        result["error_message"] = str(e)
-        return result
+        error_message = str(e)
 
-    except requests.exceptions.RequestException as e:
-        logging.critical(f"Timeout error happend for {task} and exception {str(e)}")
-        result["is_success"] = False
-        result["error_message"] = str(e)
-        return result
+    except httpx.TimeoutException as e:
+        logging.critical(
+            f"Timeout error happend for {provider} {tasks} after {format_timings(timings)}"
+        )
+        error_message = f"{type(e).__name__} after {timings['total']:.1f}s"
 
+    except httpx.ConnectError as e:
+        logging.critical(
+            f"HTTP Connection error happend for {provider} {tasks} and exception {str(e)}"
+        )
+        error_message = str(e)
 
-def check_summarization(model, task):
-    req_id = 1
-    data = {
-        "req_jobs": [
-            {"id": req_id, "input_text": summary_input, "model": model, "task": task}
-        ]
-    }
+    except httpx.RequestError as e:
+        logging.critical(
+            f"Request error happend for {provider} {tasks} and exception {str(e)}"
+        )
+        error_message = str(e)
 
-    return send_request_to_mia(data, task)
+    except (ValueError, KeyError, TypeError) as e:
+        logging.critical(
+            f"Invalid response for {provider} {tasks} and exception {str(e)}"
+        )
+        error_message = f"Invalid response: {str(e)}"
 
+    for result in results:
+        result["is_success"] = False
+        result["error_message"] = error_message
+    return results
 
-def check_pickup_intent(model, task):
-    req_id = 1
-    data = {
-        "req_jobs": [
-            {
-                "id": req_id,
-                "input_text": pickup_intent_input,
-                "model": model,
-                "task": task,
-            }
-        ]
-    }
 
-    return send_request_to_mia(data, task)
+def format_timings(timings):
+    return ", ".join(f"{phase}={value * 1000:.0f}ms" for phase, value in timings.items())
 
 
-def check_smart_reply(model, task):
-    req_id = 1
-    data = {
-        "req_jobs": [
-            {
-                "id": req_id,
-                "input_text": smart_reply_input,
-                "model": model,
-                "task": task,
-            }
-        ]
-    }
+# The highest baseline latency quantile of the targets, or None while one of
+# them does not have enough samples yet.
+def latency_quantile(targets, q):
+    values = []
+    for target in targets:
+        tracker = latency_trackers.get(
+            (target["provider"], target["task"], target["model"])
+        )
+        if tracker is None or tracker.samples < latency_min_samples:
+            return None
+        values.append(tracker.baseline.quantile(q))
+    return max(values)
+
+
+# A cold start cut short would be sent again as a second job, and only the
+# latency of the second attempt would be recorded.
+def attempt_timeout(targets, may_be_cold):
+    if may_be_cold:
+        endpoints = {worker_endpoint(target) for target in targets}
+        quantiles = [cold_start_tracker.cold_quantile(endpoint, 0.99) for endpoint in endpoints]
+        p99 = None if None in quantiles else max(quantiles)
+    else:
+        p99 = latency_quantile(targets, 0.99)
+    if p99 is None:
+        return timeout
+    return min(timeout, max(probe_min_attempt_timeout, p99 * probe_deadline_factor))
+
+
+async def send_hedged_request(client, targets, request_timeout, may_be_cold=False):
+    hedge_delay = latency_quantile(targets, 0.95) if probe_hedge and not may_be_cold else None
+    if hedge_delay is None or hedge_delay >= request_timeout:
+        return await send_probe_request(client, targets, request_timeout)
+
+    primary = asyncio.create_task(send_probe_request(client, targets, request_timeout))
+    done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+    if done:
+        return primary.result()
+
+    hedge = asyncio.create_task(
+        send_probe_request(client, targets, request_timeout - hedge_delay)
+    )
+    requests_in_flight = {primary, hedge}
+    try:
+        while requests_in_flight:
+            done, requests_in_flight = await asyncio.wait(
+                requests_in_flight, return_when=asyncio.FIRST_COMPLETED
+            )
+            for request in done:
+                results = request.result()
+                for result in results:
+                    result["hedged"] = request is hedge
+                if all(result["is_success"] for result in results):
+                    return results
+        return results
+    finally:
+        for request in requests_in_flight:
+            request.cancel()
+
+
+# Probes the targets within their deadline budget, retrying the failed ones.
+# Every result records the attempt it comes from.
+async def send_probe_with_retries(client, targets):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    may_be_cold = any(
+        cold_start_tracker.may_be_cold(worker_endpoint(target), loop.time()) for target in targets
+    )
+    per_attempt = attempt_timeout(targets, may_be_cold)
+    results = [None] * len(targets)
+    pending = list(range(len(targets)))
+
+    for attempt in range(1, probe_max_attempts + 1):
+        remaining = deadline - loop.time()
+        if not pending or remaining <= 0:
+            break
+
+        request_timeout = min(per_attempt, remaining)
+        if attempt == probe_max_attempts:
+            request_timeout = remaining
+
+        attempt_results = await send_hedged_request(
+            client, [targets[index] for index in pending], request_timeout, may_be_cold
+        )
+        for index, result in zip(pending, attempt_results):
+            result["attempt"] = attempt
+            results[index] = result
 
-    return send_request_to_mia(data, task)
+        pending = [index for index in pending if not results[index]["is_success"]]
 
+    return results
 
-def check_email_smart_reply(model, task):
-    req_id = 1
-    data = {
-        "req_jobs": [
-            {
-                "id": req_id,
-                "input_text": email_smart_reply_input,
-                "model": model,
-                "task": task,
-            }
-        ]
-    }
 
-    return send_request_to_mia(data, task)
+def check_probe_state(target, result):
+    key = (target["provider"], target["task"], target["model"])
+    state = probe_states.setdefault(key, {"failures": 0, "is_down": False})
 
+    if not result["is_success"]:
+        state["failures"] += 1
+        logging.critical(
+            f"{key} failed {state['failures']} time(s) in a row: {result['error_message']}"
+        )
+        if state["failures"] == probe_confirm_failures:
+            state["is_down"] = True
+            return f"{target['name']} is not working after {result['attempt']} attempt(s): {result['error_message']} "
+        return None
+
+    if result["attempt"] > 1:
+        logging.warning(f"{key} only succeeded on attempt {result['attempt']}")
+
+    state["failures"] = 0
+    if state["is_down"]:
+        state["is_down"] = False
+        return f"{target['name']} is working again."
+    return None
+
+
+# Healthy tasks are probed at the slow base rate, a task that just failed is
+# confirmed quickly and a task that is down is watched for its recovery.
+def next_probe_interval(targets, interval):
+    states = [
+        probe_states.get((t["provider"], t["task"], t["model"]), {}) for t in targets
+    ]
+    if any(state.get("is_down") for state in states):
+        return min(interval, probe_down_interval)
+    if any(state.get("failures") for state in states):
+        return min(interval, probe_confirm_interval)
+    return interval
+
+
+def format_latency(seconds):
+    return f"{seconds:.1f}s"
+
+
+def check_latency_regression(target, latency):
+    key = (target["provider"], target["task"], target["model"])
+    if key not in latency_trackers:
+        latency_trackers[key] = LatencyTracker(
+            latency_alert_factor, min_samples=latency_min_samples
+        )
+    tracker = latency_trackers[key]
+    tracker.add(latency)
+
+    regressions = tracker.regressions()
+    logging.info(f"{key} latency (recent, baseline): {tracker.summary()}")
+
+    # Only alert when the state changes, not on every slow probe.
+    if regressions and not tracker.is_regressed:
+        tracker.is_regressed = True
+        details = ", ".join(
+            f"{name} {format_latency(recent)} (baseline {format_latency(baseline)})"
+            for name, (recent, baseline) in regressions.items()
+        )
+        return f"{target['name']} is slow: {details}"
 
-def check_message_generation(model, task):
-    req_id = 1
-    data = {
-        "req_jobs": [
-            {
-                "id": req_id,
-                "input_text": message_generation_input,
-                "model": model,
-                "task": task,
-            }
-        ]
-    }
+    if not regressions and tracker.is_regressed:
+        tracker.is_regressed = False
+        return f"{target['name']} latency is back to normal."
 
-    return send_request_to_mia(data, task)
+    return None
 
 
-def check_message_improvisation(model, task):
-    req_id = 1
-    data = {
-        "req_jobs": [
-            {
-                "id": req_id,
-                "input_text": message_improvisation_input,
-                "model": model,
-                "task": task,
-            }
-        ]
-    }
+# The (provider, name) of the worker endpoint serving the target, probes of
+# different tasks served by the same endpoint keep each other warm.
+def worker_endpoint(target):
+    name = target.get("worker_endpoint") or runpod_task_endpoints.get(target["task"])
+    return (target["provider"], name or target["endpoint"])
 
-    return send_request_to_mia(data, task)
 
+async def refresh_scaling_settings(targets):
+    endpoints = {worker_endpoint(target) for target in targets}
 
-def check_email_generation(model, task):
-    req_id = 1
-    data = {
-        "req_jobs": [
-            {
-                "id": req_id,
-                "input_text": email_generation_input,
-                "model": model,
-                "task": task,
-            }
-        ]
-    }
+    while True:
+        settings = await asyncio.to_thread(
+            fetch_scaling_settings, endpoints, runpod_api_key, cerebrium_api_keys
+        )
+        cold_start_tracker.settings.update(settings)
+        logging.info(f"Scaling settings: {cold_start_tracker.settings}")
+        logging.info(f"Cold start latency: {cold_start_tracker.summary()}")
 
-    return send_request_to_mia(data, task)
+        await asyncio.sleep(scaling_settings_refresh)
 
 
-def check_email_improvisation(model, task):
-    req_id = 1
-    data = {
-        "req_jobs": [
-            {
-                "id": req_id,
-                "input_text": email_improvisation_input,
-                "model": model,
-                "task": task,
-            }
-        ]
-    }
+def endpoint_activity(endpoint):
+    return probe_activity.setdefault(
+        endpoint, {"samples": deque(maxlen=20), "in_flight": 0, "timestamp": None}
+    )
 
-    return send_request_to_mia(data, task)
 
+# Each sample is stamped with the wall time its probe started, so the autoscaler
+# can tell the probes run after a change of workersMin from the earlier ones.
+# Cold starts included, a scaled-to-zero endpoint is slow for its users too.
+def save_probe_activity():
+    snapshot = {}
+    for (provider, name), activity in probe_activity.items():
+        snapshot.setdefault(provider, {})[name] = {
+            "samples": list(activity["samples"]),
+            "in_flight": activity["in_flight"],
+            "timestamp": activity["timestamp"],
+        }
 
-def send_slack_notification(error_message):
+    tmp_path = f"{probe_latency_path}.tmp"
     try:
-        client.chat_postMessage(channel=slack_channel, text=error_message)
-    except slack.errors.SlackApiError as e:
-        if e.response["error"] == "not_in_channel":
-            # Attempt to join the channel first
-            try:
-                client.conversations_join(channel=slack_channel)
-                client.chat_postMessage(channel=slack_channel, text=error_message)
-            except slack.errors.SlackApiError as join_error:
-                print(
-                    f"Failed to join and send message: {join_error.response['error']}"
-                )
-        else:
-            print(f"Slack API Error: {e.response['error']}")
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, probe_latency_path)
+    except OSError as e:
+        logging.critical(f"Failed to save the probe latency {probe_latency_path}: {str(e)}")
 
 
-def start_monitoring(sleep):
-    while True:
-        result = check_summarization("jupiter-1", "summarization")
+def set_probes_in_flight(endpoints, change):
+    for endpoint in endpoints:
+        activity = endpoint_activity(endpoint)
+        activity["in_flight"] += change
+        activity["timestamp"] = time.time()
+    save_probe_activity()
 
-        if not result["is_success"]:
-            message = f"Summarization is not working: {result['error_message']} "
-            send_slack_notification(message)
 
-        time.sleep(sleep)
+def send_slack_notification(provider: str, error_message, key=None):
+    # Only queued here, the dispatcher thread posts it to Slack. Providers
+    # sharing a token and a channel share the Slack client and the dispatcher.
+    token = os.environ.get(providers[provider]["slack_token_env"])
+    slack_channel = providers[provider]["slack_channel"]
+    get_alert_dispatcher(token, slack_channel).notify(error_message, key)
 
-        output = check_smart_reply("jupiter-2", "smart-reply")
-        if not output["is_success"]:
-            message = f"Smart reply is not working: {output['error_message']} "
-            send_slack_notification(message)
 
-        time.sleep(sleep)
+async def run_probe(client, targets, interval, start_delay, semaphore):
+    loop = asyncio.get_running_loop()
+    await asyncio.sleep(start_delay)
 
-        result = check_pickup_intent("jupiter-2", "pickup-intent")
-        if not result["is_success"]:
-            message = f"Pickup-intent is not working: {result['error_message']} "
-            send_slack_notification(message)
+    while True:
+        # The semaphore bounds how many probes are in flight against MIA at
+        # the same time.
+        endpoints = {worker_endpoint(target) for target in targets}
+        async with semaphore:
+            started = loop.time()
+            started_at = time.time()
+            # The autoscaler does not count the probe jobs as traffic.
+            set_probes_in_flight(endpoints, 1)
+            try:
+                results = await send_probe_with_retries(client, targets)
+            finally:
+                set_probes_in_flight(endpoints, -1)
+
+        # The tasks of a batch share one request, so it is classified once per
+        # worker endpoint and every task of it gets that label.
+        starts = {}
+        for target, result in zip(targets, results):
+            messages = [check_probe_state(target, result)]
+
+            if result["is_success"]:
+                latency = result["timings"]["total"]
+                endpoint = worker_endpoint(target)
+                if endpoint not in starts:
+                    starts[endpoint] = cold_start_tracker.classify(endpoint, started, latency)
+                    endpoint_activity(endpoint)["samples"].append([started_at, round(latency, 3)])
+                result["start"] = starts[endpoint]
+                logging.info(
+                    f"{target['provider']} {target['task']} {result['start']} start in {format_latency(latency)}"
+                )
 
-        time.sleep(sleep)
+                # Cold starts are tracked on their own, they are not a
+                # regression, unless every probe comes back cold.
+                if (
+                    result["start"] == "warm"
+                    or cold_start_tracker.cold_streak[endpoint] >= cold_start_max_streak
+                ):
+                    messages.append(check_latency_regression(target, latency))
 
-        result = check_email_smart_reply("jupiter-2", "email-smart-reply")
-        if not result["is_success"]:
-            message = f"Email smart reply is not working: {result['error_message']} "
-            send_slack_notification(message)
+            for message in filter(None, messages):
+                send_slack_notification(target["provider"], message)
 
-        time.sleep(sleep)
+        save_probe_activity()
 
-        result = check_message_generation("jupiter-2", "message-generation")
-        if not result["is_success"]:
-            message = f"Message generation is not working: {result['error_message']} "
-            send_slack_notification(message)
+        # Schedule start-to-start so a slow request does not drift the interval.
+        next_run = started + next_probe_interval(targets, interval)
+        await asyncio.sleep(max(0, next_run - loop.time()))
 
-        time.sleep(sleep)
 
-        result = check_message_improvisation("jupiter-2", "message-improvisation")
-        if not result["is_success"]:
-            message = (
-                f"Message improvisation is not working: {result['error_message']} "
-            )
-            send_slack_notification(message)
+# In batch mode every target sharing a provider and an endpoint is probed with a
+# single request, otherwise each target gets its own request.
+def group_targets(targets, batch):
+    if not batch:
+        return [[target] for target in targets]
 
-        time.sleep(sleep)
+    groups = {}
+    for target in targets:
+        groups.setdefault((target["provider"], target["endpoint"]), []).append(target)
+    return list(groups.values())
 
-        result = check_email_generation("jupiter-2", "email-generation")
-        if not result["is_success"]:
-            message = f"Email generation is not working: {result['error_message']} "
-            send_slack_notification(message)
 
-        time.sleep(sleep)
+async def start_monitoring(targets, max_in_flight, batch=False):
+    semaphore = asyncio.Semaphore(max_in_flight)
+    client = create_client(max_in_flight, use_http2, keepalive_expiry)
+    groups = group_targets(targets, batch)
 
-        result = check_email_improvisation("jupiter-2", "email-improvisation")
-        if not result["is_success"]:
-            message = f"Email improvisation is not working: {result['error_message']} "
-            send_slack_notification(message)
+    # Spread the first run of each probe over its interval instead of firing
+    # every task at once on startup.
+    probes = []
+    for index, group in enumerate(groups):
+        interval = min(target.get("interval", probe_interval) for target in group)
+        start_delay = index * interval / len(groups)
+        probes.append(run_probe(client, group, interval, start_delay, semaphore))
 
-        time.sleep(sleep)
+    async with client:
+        await asyncio.gather(refresh_scaling_settings(targets), *probes)
 
 
-# send_slack_notification("This is a test message")
+# send_slack_notification("runpod", "This is a test message")
 
-start_monitoring(300)
+if __name__ == "__main__":
+    targets = [t for t in probe_targets if t["provider"] in monitored_providers]
+    logging.info(f"Monitoring {len(targets)} targets for {monitored_providers}")
+    asyncio.run(start_monitoring(targets, max_in_flight_requests, batch_probes))
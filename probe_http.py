@@ -0,0 +1,110 @@
+import asyncio
+import contextvars
+import socket
+import time
+
+import httpcore
+import httpx
+
+# Timings dict of the probe currently opening a connection. The network backend
+# is shared by every connection of the pool, so this is how a DNS lookup is
+# attributed to the probe that triggered it.
+current_timings = contextvars.ContextVar("current_timings", default=None)
+
+phases = ("dns", "connect", "tls", "ttfb", "total")
+
+
+# Wraps the default httpcore backend to time the DNS lookup on its own.
+class TimedNetworkBackend(httpcore.AsyncNetworkBackend):
+    def __init__(self, backend):
+        self._backend = backend
+
+    async def connect_tcp(
+        self, host, port, timeout=None, local_address=None, socket_options=None
+    ):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            addresses = await asyncio.wait_for(
+                loop.getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            raise httpcore.ConnectError(f"DNS lookup failed for {host}: {e}")
+        finally:
+            timings = current_timings.get()
+            if timings is not None:
+                timings["dns"] += time.perf_counter() - start
+
+        last_error = None
+        for address in dict.fromkeys(info[4][0] for info in addresses):
+            try:
+                return await self._backend.connect_tcp(
+                    address,
+                    port,
+                    timeout=timeout,
+                    local_address=local_address,
+                    socket_options=socket_options,
+                )
+            except httpcore.ConnectError as e:
+                last_error = e
+        raise last_error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(
+            path, timeout=timeout, socket_options=socket_options
+        )
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+def create_client(max_connections, http2=False, keepalive_expiry=600):
+    # Probes run minutes apart, keep the idle connections around long enough to
+    # be reused by the next probe instead of paying a new TCP and TLS handshake.
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    transport = httpx.AsyncHTTPTransport(http2=http2, limits=limits)
+
+    # httpx does not expose the network backend, wrap the one of its pool.
+    transport._pool._network_backend = TimedNetworkBackend(
+        transport._pool._network_backend
+    )
+    return httpx.AsyncClient(transport=transport)
+
+
+def new_timings():
+    return {phase: 0.0 for phase in phases}
+
+
+# POST with the client and fill timings (in seconds) even if the request fails.
+# "connect" and "tls" stay at 0 when a pooled connection is reused, and "ttfb" is
+# the wait between sending the request and receiving the response headers, so it
+# is mostly the inference time on the worker.
+async def timed_post(client, url, timings, **kwargs):
+    marks = {}
+
+    async def trace(event_name, info):
+        # "connection.connect_tcp.started", "http11.send_request_body.complete"...
+        marks[event_name.split(".", 1)[1]] = time.perf_counter()
+
+    token = current_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        return await client.post(url, extensions={"trace": trace}, **kwargs)
+    finally:
+        timings["total"] = time.perf_counter() - start
+        current_timings.reset(token)
+
+        if "connect_tcp.complete" in marks:
+            connect = marks["connect_tcp.complete"] - marks["connect_tcp.started"]
+            timings["connect"] = max(0.0, connect - timings["dns"])
+        if "start_tls.complete" in marks:
+            timings["tls"] = marks["start_tls.complete"] - marks["start_tls.started"]
+        if "receive_response_headers.complete" in marks:
+            sent = marks.get(
+                "send_request_body.complete", marks.get("send_request_headers.complete")
+            )
+            timings["ttfb"] = marks["receive_response_headers.complete"] - sent
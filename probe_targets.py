@@ -0,0 +1,189 @@
+from var import (
+    summary_input,
+    pickup_intent_input,
+    smart_reply_input,
+    email_smart_reply_input,
+    message_generation_input,
+    message_improvisation_input,
+    email_generation_input,
+    email_improvisation_input,
+    command_interpreter_input,
+    content_importance_input,
+)
+
+# url = "https://mia-staging.livil.co"
+providers = {
+    "runpod": {
+        "url": "https://us.mia.livil.co",
+        "slack_channel": "nna_mia_alerts",
+        "slack_token_env": "SLACK_NNA_ALERT_TOKEN",
+    },
+    "cerebrium": {
+        "url": "https://mia.livil.co",
+        "slack_channel": "cerebrium-monitoring",
+        "slack_token_env": "SLACK_ALERT_TOKEN",
+    },
+}
+
+cerebrium_api_url = "https://rest.cerebrium.ai/v2/projects"
+
+# Cerebrium project -> environment variable holding its API key.
+cerebrium_project_api_keys = {
+    "p-83a7fa9e": "API_KEY_P83A7FA9E",
+    "p-87ef9251": "API_KEY_P87EF9251",
+    "p-de09db61": "API_KEY_PDE09DB61",
+}
+
+
+def cerebrium_project(app):
+    # "p-87ef9251-summarization" -> "p-87ef9251"
+    return "-".join(app.split("-")[:2])
+
+
+def cerebrium_app_url(app):
+    return f"{cerebrium_api_url}/{cerebrium_project(app)}/apps/{app}"
+
+
+insights_endpoint = "/insights_ico"
+content_importance_endpoint = "/content_importance_ico"
+command_interpreter_endpoint = "/command_interpreter_ico"
+
+content_importance_payload = {
+    "input_text": content_importance_input,
+    "subject_line_signals": True,
+    "is_sender_a_known_contact": False,
+    "is_attachment_present": False,
+    "thread_depth": 5,
+    "frequency_of_interaction_with_sender": "low",
+    "user_defined_keywords_or_phrases": "project deadline, milestone",
+    "is_sender_in_priority_contacts": True,
+    "message_type_preference_list": "Legal, Compliance",
+    "language": "en",
+}
+
+# One row per probe. Adding a provider or a task only needs a new row here.
+# "name" is used in the Slack alert, "payload" is merged into the request job and
+# "worker_endpoint" is the Cerebrium app serving the task. The Runpod endpoint
+# names come from the RUNPOD_TASK_ENDPOINTS environment variable.
+probe_targets = [
+    # Runpod
+    {
+        "provider": "runpod",
+        "task": "summarization",
+        "model": "jupiter-1",
+        "endpoint": insights_endpoint,
+        "payload": {"input_text": summary_input},
+        "name": "Summarization",
+    },
+    {
+        "provider": "runpod",
+        "task": "smart-reply",
+        "model": "jupiter-2",
+        "endpoint": insights_endpoint,
+        "payload": {"input_text": smart_reply_input},
+        "name": "Smart reply",
+    },
+    {
+        "provider": "runpod",
+        "task": "pickup-intent",
+        "model": "jupiter-2",
+        "endpoint": insights_endpoint,
+        "payload": {"input_text": pickup_intent_input},
+        "name": "Pickup-intent",
+    },
+    {
+        "provider": "runpod",
+        "task": "email-smart-reply",
+        "model": "jupiter-2",
+        "endpoint": insights_endpoint,
+        "payload": {"input_text": email_smart_reply_input},
+        "name": "Email smart reply",
+    },
+    {
+        "provider": "runpod",
+        "task": "message-generation",
+        "model": "jupiter-2",
+        "endpoint": insights_endpoint,
+        "payload": {"input_text": message_generation_input},
+        "name": "Message generation",
+    },
+    {
+        "provider": "runpod",
+        "task": "message-improvisation",
+        "model": "jupiter-2",
+        "endpoint": insights_endpoint,
+        "payload": {"input_text": message_improvisation_input},
+        "name": "Message improvisation",
+    },
+    {
+        "provider": "runpod",
+        "task": "email-generation",
+        "model": "jupiter-2",
+        "endpoint": insights_endpoint,
+        "payload": {"input_text": email_generation_input},
+        "name": "Email generation",
+    },
+    {
+        "provider": "runpod",
+        "task": "email-improvisation",
+        "model": "jupiter-2",
+        "endpoint": insights_endpoint,
+        "payload": {"input_text": email_improvisation_input},
+        "name": "Email improvisation",
+    },
+    # Cerebrium
+    {
+        "provider": "cerebrium",
+        "task": "command-interpreter",
+        "model": "jupiter-2",
+        "endpoint": command_interpreter_endpoint,
+        "payload": {"input_text": command_interpreter_input},
+        "name": "Command interpreter",
+        "worker_endpoint": "p-83a7fa9e-command-interpreter",
+    },
+    {
+        "provider": "cerebrium",
+        "task": "content-importance",
+        "model": "jupiter-2",
+        "endpoint": content_importance_endpoint,
+        "payload": content_importance_payload,
+        "name": "Content importance",
+        "worker_endpoint": "p-83a7fa9e-content-importance",
+    },
+    {
+        "provider": "cerebrium",
+        "task": "summarization",
+        "model": "jupiter-1",
+        "endpoint": insights_endpoint,
+        "payload": {"input_text": summary_input},
+        "name": "Cerebrium summarization",
+        "worker_endpoint": "p-87ef9251-summarization",
+    },
+    {
+        "provider": "cerebrium",
+        "task": "smart-reply",
+        "model": "jupiter-2",
+        "endpoint": insights_endpoint,
+        "payload": {"input_text": smart_reply_input},
+        "name": "Smart reply",
+        "worker_endpoint": "p-87ef9251-smart-reply",
+    },
+    {
+        "provider": "cerebrium",
+        "task": "message-improvisation",
+        "model": "jupiter-2",
+        "endpoint": insights_endpoint,
+        "payload": {"input_text": message_improvisation_input},
+        "name": "Message improvisation",
+        "worker_endpoint": "p-de09db61-message-improvisation",
+    },
+    {
+        "provider": "cerebrium",
+        "task": "email-improvisation",
+        "model": "jupiter-2",
+        "endpoint": insights_endpoint,
+        "payload": {"input_text": email_improvisation_input},
+        "name": "Email improvisation",
+        "worker_endpoint": "p-de09db61-email-improvisation",
+    },
+]
@@ -1,14 +1,15 @@
-import slack
+from billing_store import BillingStore
+from budget import Budget
+from kill_switch import prepare_kill_switches
+from runpod_client import get_client
+from slack_notifier import get_alert_dispatcher
 import os
 from dotenv import load_dotenv
-import json
 import requests
 from requests.auth import HTTPBasicAuth
 import logging
 import time
-from datetime import datetime
-import boto3
-import botocore.exceptions
+from datetime import datetime, timezone
 
 load_dotenv()
 
@@ -23,8 +24,13 @@ logging.basicConfig(
 api_key = os.environ.get("API_KEY")
 slack_channel = "runpod_mia_alerts"
 slack_runpod_alert_token = os.environ.get("SLACK_RUNPOD_ALERT_TOKEN")
-soft_threshold = float(os.environ.get("SOFT_THRESHOLD"))
-hard_threshold = float(os.environ.get("HARD_THRESHOLD"))
+# RUNPOD_* lets the billing daemon give each provider its own budget.
+soft_threshold = float(
+    os.environ.get("RUNPOD_SOFT_THRESHOLD") or os.environ.get("SOFT_THRESHOLD")
+)
+hard_threshold = float(
+    os.environ.get("RUNPOD_HARD_THRESHOLD") or os.environ.get("HARD_THRESHOLD")
+)
 lfmh_kill_switch_arn = os.environ.get("LFMH_ICO_RUNPOD_ARN")
 nna_kill_switch_arn = os.environ.get("NNA_KILL_SWITCH_ARN")
 
@@ -32,11 +38,20 @@ lfmh_rule_priority_and_arn = [{"RuleArn": lfmh_kill_switch_arn, "Priority": 120}
 
 nna_rule_priority_and_arn = [{"RuleArn": nna_kill_switch_arn, "Priority": 1}]
 
-client = slack.WebClient(slack_runpod_alert_token)
+# Kill switches activated together when the hard threshold is reached.
+kill_switch_targets = {
+    "LFMH/ICO existing feature": ("eu-central-1", lfmh_rule_priority_and_arn),
+    "NNA existing feature": ("us-east-1", nna_rule_priority_and_arn),
+}
+
+send_slack_notification = get_alert_dispatcher(slack_runpod_alert_token, slack_channel).notify
 
-url = f"https://api.runpod.io/graphql?api_key={api_key}"
-headers = {"content-type": "application/json"}
+runpod = get_client(api_key)
 
+# One row per day. UserBillingInput takes no documented time window, an
+# unknown field would fail the whole query, so today's row is picked out by
+# get_todays_bill. The hours and endpoints of the spend come from the endpoint
+# billing, which is requested for today only.
 billing_summary_query = {
     "operationName": "getUserBillingSummary",
     "variables": {"input": {"granularity": "DAILY"}},
@@ -61,45 +76,44 @@ billing_summary_query = {
     """,
 }
 
+# Serverless spend per endpoint and hour.
+endpoint_billing_url = "https://rest.runpod.io/v1/billing/endpoints"
 
-def send_post_request_to_runpod(query):
 
-    result = {"data": None, "error_message": ""}
+# Runpod bills per UTC day.
+billing_timezone = timezone.utc
 
-    try:
-        response = requests.post(url, headers=headers, data=json.dumps(query))
-        response.raise_for_status()
 
-        if response.status_code == 200:
-            result["data"] = response.json()
+def billing_window(now=None):
+    now = now or datetime.now(billing_timezone)
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day_start, now
 
-        return result
 
-    except requests.exceptions.HTTPError as e:
-        logging.critical(f"HTTP Error happend: {str(e)}")
-        result["error_message"] = str(e)
-        return result
+def send_post_request_to_runpod(query):
 
-    except requests.exceptions.ConnectionError as e:
-        logging.critical(f"HTTP Connection error happend: {str(e)}")
-        result["error_message"] = str(e)
-        return result
+    result = {"data": None, "error_message": ""}
 
-    except requests.exceptions.Timeout as e:
-        logging.critical(f"Timeout error happend: {str(e)}")
-        result["error_message"] = str(e)
-        return result
+    # The client retries connection errors, timeouts and 429/5xx answers.
+    try:
+        result["data"] = runpod.post(query)
 
     except requests.exceptions.RequestException as e:
-        logging.critical(f"Timeout error happend: {str(e)}")
+        logging.critical(f"Runpod request failed: {str(e)}")
         result["error_message"] = str(e)
-        return result
+
+    return result
 
 
 def get_billing_summary():
     result = send_post_request_to_runpod(billing_summary_query)
     # print(result)
 
+    # GraphQL errors come back with a 200 and no data.
+    if result["data"] and result["data"].get("errors"):
+        result["error_message"] = str(result["data"]["errors"])
+        result["data"] = None
+
     if result["data"]:
         summary = result["data"]["data"]["myself"]["billing"]["summary"]
         return summary
@@ -114,134 +128,144 @@ def get_billing_summary():
         print(error_message)
 
 
-def get_todays_bill(summary: dict):
-    todays_bill = max(
-        summary, key=lambda x: datetime.fromisoformat(x["time"].replace("Z", "+00:00"))
-    )
-    return todays_bill
+def parse_time(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
 
 
-def compute_todays_cost(todays_bill: dict):
-    total_amount = sum(
-        value for key, value in todays_bill.items() if key.endswith("Amount")
-    )
-    return round(total_amount, 2)
-
+# Today's row of amounts, the rows of earlier days are skipped.
+def get_todays_bill(summary: dict):
+    day_start, _ = billing_window()
+    todays_bill = {}
+    for row in summary:
+        if parse_time(row["time"]) < day_start:
+            continue
+        for key, value in row.items():
+            if key.endswith("Amount") and value:
+                todays_bill[key] = todays_bill.get(key, 0.0) + value
+    return todays_bill
 
-def send_slack_notification(message):
-    try:
-        client.chat_postMessage(channel=slack_channel, text=message)
-    except slack.errors.SlackApiError as e:
-        if e.response["error"] == "not_in_channel":
-            # Attempt to join the channel first
-            try:
-                client.conversations_join(channel=slack_channel)
-                client.chat_postMessage(channel=slack_channel, text=error_message)
-            except slack.errors.SlackApiError as join_error:
-                print(
-                    f"Failed to join and send message: {join_error.response['error']}"
-                )
-        else:
-            print(f"Slack API Error: {e.response['error']}")
 
+# Today's hourly serverless spend records per endpoint, or None if they cannot
+# be read.
+def get_endpoint_billing():
+    day_start, now = billing_window()
+    params = {
+        "bucketSize": "hour",
+        "grouping": "endpointId",
+        "startTime": day_start.isoformat(),
+        "endTime": now.isoformat(),
+    }
 
-def activate_alb_kill_switch(region_name, rule_priority_and_arn):
     try:
-        # Initialize the ELBv2 client
-        client = boto3.client("elbv2", region_name=region_name)
-
-        response = client.set_rule_priorities(RulePriorities=rule_priority_and_arn)
+        records = runpod.get(endpoint_billing_url, params=params)
+    except requests.exceptions.RequestException as e:
+        logging.critical(f"Failed to read the Runpod endpoint billing: {str(e)}")
+        return None
+
+    return [record for record in records if parse_time(record["time"]) >= day_start]
+
+
+def get_endpoint_costs(records):
+    costs = {}
+    for record in records:
+        endpoint = record.get("endpointId")
+        if endpoint:
+            costs[endpoint] = costs.get(endpoint, 0.0) + (record.get("amount") or 0.0)
+    return {endpoint: round(amount, 2) for endpoint, amount in costs.items()}
+
+
+# The most expensive hour of today's serverless spend as (hour, amount).
+def get_peak_hour(records):
+    hours = {}
+    for record in records:
+        hour = parse_time(record["time"])
+        hours[hour] = hours.get(hour, 0.0) + (record.get("amount") or 0.0)
+    return max(
+        ((hour, round(amount, 2)) for hour, amount in hours.items()),
+        key=lambda hour: hour[1],
+        default=None,
+    )
 
-        print(f"Kill Switch activated!! region_name: {region_name}")
-        return True
-        # print(response)
 
-    except botocore.exceptions.NoCredentialsError:
-        logging.critical(
-            "Error: No AWS credentials found. Please configure them using 'aws configure' or set environment variables."
+def describe_breakdown(records, endpoint_costs, top=3):
+    parts = []
+    peak_hour = get_peak_hour(records)
+    if peak_hour:
+        parts.append(f"Peak serverless hour: {peak_hour[0]:%H:00} UTC (${peak_hour[1]})")
+    if endpoint_costs:
+        top_endpoints = sorted(endpoint_costs.items(), key=lambda e: -e[1])[:top]
+        parts.append(
+            "Top endpoints: "
+            + ", ".join(f"{endpoint} (${amount})" for endpoint, amount in top_endpoints)
         )
+    return " " + ". ".join(parts) + "." if parts else ""
 
-    except botocore.exceptions.PartialCredentialsError:
-        logging.critical(
-            "Error: Incomplete AWS credentials detected. Please check your AWS access key and secret key."
-        )
 
-    except botocore.exceptions.ClientError as e:
-        # Handle specific AWS errors
-        error_code = e.response["Error"]["Code"]
-        error_message = e.response["Error"]["Message"]
-        logging.critical(f"AWS ClientError: {error_code} - {error_message}")
+def compute_todays_cost(todays_bill: dict):
+    total_amount = sum(
+        value for key, value in todays_bill.items() if key.endswith("Amount")
+    )
+    return round(total_amount, 2)
 
-    except botocore.exceptions.EndpointConnectionError:
-        logging.critical(
-            "Error: Unable to connect to AWS endpoint. Check your internet connection and region settings."
-        )
 
-    except Exception as e:
-        logging.critical(f"An unexpected error occurred: {str(e)}")
+# Today's total, the amounts to store and a description of where the spend
+# comes from, or None if neither the billing summary nor the endpoint billing
+# could be read.
+def get_todays_spend():
+    result = get_billing_summary()
+    records = get_endpoint_billing()
+    endpoint_costs = get_endpoint_costs(records) if records is not None else None
+
+    # Without the summary the serverless spend of the endpoint billing is used,
+    # a lower bound that still reaches the hard threshold.
+    if result is None:
+        if endpoint_costs is None:
+            return None
+        total_amount = round(sum(endpoint_costs.values()), 2)
+        return {
+            "total": total_amount,
+            "amounts": {"total": total_amount, **endpoint_costs},
+            "partial": " (serverless endpoints only, the billing summary is unavailable)",
+            "breakdown": describe_breakdown(records, endpoint_costs),
+        }
 
-    return False
+    # No rows yet right after midnight is a valid answer.
+    total_amount = compute_todays_cost(get_todays_bill(result))
+    return {
+        "total": total_amount,
+        "amounts": {"total": total_amount, **(endpoint_costs or {})},
+        "partial": "",
+        "breakdown": describe_breakdown(records or [], endpoint_costs),
+    }
 
 
 def start_monitoring(sleep):
 
-    is_kill_switch_activated = False
+    billing_store = BillingStore("runpod")
+    budget = Budget(
+        "Runpod",
+        soft_threshold,
+        hard_threshold,
+        kill_switch_targets,
+        send_slack_notification,
+        tz=billing_timezone,
+    )
+    prepare_kill_switches(kill_switch_targets)
 
     while True:
-        result = get_billing_summary()
-
-        if result:
-            todays_bill = get_todays_bill(result)
-            total_amount = compute_todays_cost(todays_bill)
-
-            if total_amount > hard_threshold:
-                alert_message = f"`URGENT: CODE RED` Hard Threshold for a single day spent reached. Amount spent: {total_amount}. Hard Threshod limit is: {hard_threshold}"
-                send_slack_notification(alert_message)
-                logging.critical(alert_message)
-
-                if not is_kill_switch_activated:
-                    # Activate kill switch for LFMH/ICO.
-                    lfmh_kill_switch_status = activate_alb_kill_switch(
-                        "eu-central-1", lfmh_rule_priority_and_arn
-                    )
-                    if lfmh_kill_switch_status:
-                        alert_message = (
-                            f"Runpod LFMH/ICO existing feature kill switch activated."
-                        )
-                        send_slack_notification(alert_message)
-                        logging.critical(alert_message)
-                    else:
-                        alert_message = f"Runpod UNABLE to ACTIVATE LFMH/ICO existing feature kill switch."
-                        send_slack_notification(alert_message)
-                        logging.critical(alert_message)
-
-                    # Activate kill switch for NNA
-                    nna_kill_switch_status = activate_alb_kill_switch(
-                        "us-east-1", nna_rule_priority_and_arn
-                    )
-                    if nna_kill_switch_status:
-                        alert_message = (
-                            f"Runpod NNA existing feature kill switch activated."
-                        )
-                        send_slack_notification(alert_message)
-                        logging.critical(alert_message)
-                    else:
-                        alert_message = f"Runpod UNABLE to ACTIVATE NNA existing feature kill switch."
-                        send_slack_notification(alert_message)
-                        logging.critical(alert_message)
-
-                    if lfmh_kill_switch_status and nna_kill_switch_status:
-                        is_kill_switch_activated = True
-
-            elif total_amount > soft_threshold:
-                alert_message = f"`ALERT`: Soft threshold reached. Current Amount spent: `${total_amount}`. Soft threshold is set to: `${soft_threshold}`"
-                send_slack_notification(alert_message)
-                logging.critical(alert_message)
-            else:
-                pass
+        spend = get_todays_spend()
+
+        if spend is not None:
+            billing_store.add(time.time(), "runpod", spend["amounts"])
+            budget.check(
+                spend["total"],
+                sleep,
+                partial=spend["partial"],
+                breakdown=spend["breakdown"],
+            )
 
         else:
-            error_message = f"Error occured: {result}"
+            error_message = f"Error occured: {spend}"
             send_slack_notification(error_message)
             logging.critical(error_message)
             print(error_message)
@@ -250,4 +274,5 @@ def start_monitoring(sleep):
         time.sleep(sleep)
 
 
-start_monitoring(60)
+if __name__ == "__main__":
+    start_monitoring(60)
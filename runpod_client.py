@@ -0,0 +1,161 @@
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+graphql_url = "https://api.runpod.io/graphql"
+# (connect, read) seconds.
+timeout = (5, 30)
+max_attempts = 3
+retry_base_delay = 0.5
+retry_max_delay = 10
+retry_status_codes = {429, 500, 502, 503, 504}
+# Seconds the endpoint metadata is reused before it is read again.
+endpoint_cache_ttl = int(os.environ.get("RUNPOD_ENDPOINT_CACHE_TTL", 300))
+
+endpoint_fields = (
+    "gpuIds",
+    "gpuCount",
+    "allowedCudaVersions",
+    "id",
+    "idleTimeout",
+    "locations",
+    "name",
+    "networkVolumeId",
+    "scalerType",
+    "scalerValue",
+    "templateId",
+    "workersMax",
+    "workersMin",
+    "executionTimeoutMs",
+)
+
+
+# Raised when the Runpod API could not be reached, kept failing or answered with
+# GraphQL errors only. A RequestException, so existing handlers catch it.
+class RunpodError(requests.exceptions.RequestException):
+    pass
+
+
+def endpoints_query(fields):
+    return {
+        "query": """
+        query Endpoints {
+          myself {
+            endpoints {
+              %s
+            }
+          }
+        }
+        """
+        % "\n              ".join(fields)
+    }
+
+
+# Runpod GraphQL and REST client over one pooled session. The API key goes in
+# the Authorization header, never in the URL. Failed requests are retried with
+# a jittered exponential backoff.
+class RunpodClient:
+    def __init__(self, api_key, ttl=None):
+        self.session = requests.Session()
+        self.session.headers.update(
+            {"content-type": "application/json", "Authorization": f"Bearer {api_key}"}
+        )
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self.ttl = endpoint_cache_ttl if ttl is None else ttl
+
+        self.lock = threading.Lock()
+        self.endpoints_by_id = {}
+        self.endpoints_by_name = {}
+        self.endpoints_fetched_at = None
+
+    def request(self, method, url, **kwargs):
+        for attempt in range(max_attempts):
+            retry_after = None
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+                if response.status_code not in retry_status_codes:
+                    response.raise_for_status()
+                    return response.json()
+                error = f"HTTP {response.status_code}"
+                retry_after = response.headers.get("Retry-After")
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = str(e)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                raise RunpodError(f"{method} {url} failed: {str(e)}") from e
+
+            if attempt == max_attempts - 1:
+                break
+            delay = random.uniform(0, min(retry_max_delay, retry_base_delay * 2**attempt))
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            logging.warning(f"Runpod {method} {url} failed ({error}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+        raise RunpodError(f"{method} {url} failed after {max_attempts} attempts: {error}")
+
+    # Posts a GraphQL {"query", "variables", "operationName"} and returns the
+    # response body.
+    def post(self, query):
+        body = self.request("POST", graphql_url, json=query)
+        if body.get("errors") and not body.get("data"):
+            raise RunpodError(f"Runpod GraphQL errors: {body['errors']}")
+        return body
+
+    def get(self, url, params=None):
+        return self.request("GET", url, params=params)
+
+    # The current value of only these endpoint fields, not cached.
+    def query_endpoints(self, fields):
+        return self.post(endpoints_query(fields))["data"]["myself"]["endpoints"]
+
+    # Metadata of all the endpoints, read again once older than the TTL.
+    def endpoints(self, max_age=None):
+        max_age = self.ttl if max_age is None else max_age
+        with self.lock:
+            fetched_at = self.endpoints_fetched_at
+            if fetched_at is not None and time.monotonic() - fetched_at <= max_age:
+                return list(self.endpoints_by_id.values())
+
+        endpoints = self.query_endpoints(endpoint_fields)
+        with self.lock:
+            self.endpoints_by_id = {endpoint["id"]: endpoint for endpoint in endpoints}
+            self.endpoints_by_name = {endpoint["name"]: endpoint for endpoint in endpoints}
+            self.endpoints_fetched_at = time.monotonic()
+        return endpoints
+
+    # Metadata of one endpoint by name or id, None if there is no such endpoint.
+    def endpoint(self, name_or_id, max_age=None):
+        self.endpoints(max_age)
+        with self.lock:
+            return self.endpoints_by_id.get(name_or_id) or self.endpoints_by_name.get(
+                name_or_id
+            )
+
+    # Keeps the cache in line with an endpoint returned by a mutation.
+    def update_endpoint(self, endpoint):
+        with self.lock:
+            if not endpoint or endpoint.get("id") not in self.endpoints_by_id:
+                return
+            cached = self.endpoints_by_id[endpoint["id"]]
+            cached.update({k: v for k, v in endpoint.items() if k in endpoint_fields})
+            self.endpoints_by_name = {e["name"]: e for e in self.endpoints_by_id.values()}
+
+    def invalidate_endpoints(self):
+        with self.lock:
+            self.endpoints_fetched_at = None
+
+
+lock = threading.Lock()
+clients = {}
+
+
+def get_client(api_key):
+    with lock:
+        if api_key not in clients:
+            clients[api_key] = RunpodClient(api_key)
+        return clients[api_key]
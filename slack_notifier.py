@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+
+import slack
+
+from alert_dispatcher import AlertDispatcher, PermanentAlertError
+from alert_outbox import AlertOutbox
+
+# Slack accepts up to 50 blocks per message and 3000 characters per section.
+max_blocks = 50
+max_section_length = 3000
+max_retries = 3
+
+lock = threading.Lock()
+# One WebClient per token, one dispatcher per (token, channel) and the channels
+# each token already joined.
+clients = {}
+dispatchers = {}
+joined_channels = set()
+
+
+def get_client(token):
+    with lock:
+        if token not in clients:
+            clients[token] = slack.WebClient(token)
+        return clients[token]
+
+
+def get_alert_dispatcher(token, channel):
+    with lock:
+        if (token, channel) not in dispatchers:
+            dispatchers[(token, channel)] = AlertDispatcher(
+                lambda messages: post_messages(token, channel, messages),
+                name=channel,
+                outbox=AlertOutbox(outbox_sender(token, channel)),
+                batch_size=max_blocks,
+            )
+        return dispatchers[(token, channel)]
+
+
+# The outbox rows of a script, token and channel are only replayed by the same
+# script with the same token. The token itself is not stored.
+def outbox_sender(token, channel):
+    script = os.path.basename(sys.argv[0]) or "python"
+    token_hash = hashlib.sha256((token or "").encode()).hexdigest()[:12]
+    return f"{script}/{token_hash}/{channel}"
+
+
+def join_channel(token, channel):
+    if (token, channel) in joined_channels:
+        return True
+
+    try:
+        get_client(token).conversations_join(channel=channel)
+    except slack.errors.SlackApiError as e:
+        logging.critical(f"Failed to join {channel}: {e.response['error']}")
+        print(f"Failed to join {channel}: {e.response['error']}")
+        return False
+
+    joined_channels.add((token, channel))
+    return True
+
+
+# Errors the same message to the same channel gets every time. Auth errors are
+# not among them, the alerts are kept until the token is fixed.
+permanent_slack_errors = {
+    "channel_not_found",
+    "is_archived",
+    "invalid_blocks",
+    "invalid_blocks_format",
+    "msg_too_long",
+    "no_text",
+    "too_many_attachments",
+    "invalid_arguments",
+}
+
+
+# Several alerts raised at the same time go out as one block-formatted message.
+def format_message(messages):
+    if len(messages) == 1:
+        return {"text": messages[0]}
+
+    return {
+        "text": "\n".join(messages),
+        "blocks": [
+            {
+                "type": "section",
+                "text": {"type": "mrkdwn", "text": message[:max_section_length]},
+            }
+            for message in messages
+        ],
+    }
+
+
+# Raises when a message could not be posted, so the caller can keep it.
+def post_messages(token, channel, messages):
+    client = get_client(token)
+
+    for start in range(0, len(messages), max_blocks):
+        message = format_message(messages[start : start + max_blocks])
+
+        for attempt in range(max_retries):
+            try:
+                client.chat_postMessage(channel=channel, **message)
+                break
+            except slack.errors.SlackApiError as e:
+                error = e.response["error"]
+                can_retry = attempt < max_retries - 1
+
+                if error == "ratelimited" and can_retry:
+                    retry_after = int(e.response.headers.get("Retry-After", 1))
+                    logging.warning(f"Slack rate limited, retrying in {retry_after}s")
+                    time.sleep(retry_after)
+                    continue
+
+                # The membership is cached, only join again if we were removed
+                # from the channel since.
+                if error == "not_in_channel" and can_retry:
+                    joined_channels.discard((token, channel))
+                    if join_channel(token, channel):
+                        continue
+
+                logging.critical(f"Slack API Error: {error}")
+                print(f"Slack API Error: {error}")
+                if error in permanent_slack_errors:
+                    raise PermanentAlertError(error) from e
+                raise
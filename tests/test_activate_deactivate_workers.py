@@ -0,0 +1,120 @@
+import logging
+import unittest
+from unittest import mock
+
+import requests
+
+import alert_outbox
+
+# The scripts set up logging to a file in the working directory and their
+# alert dispatcher when imported.
+logging.basicConfig(handlers=[logging.NullHandler()])
+alert_outbox.alert_outbox_path = ":memory:"
+
+import activate_deactivate_workers as workers
+
+
+class FakeRunpod:
+    def __init__(self, endpoints):
+        self.endpoints_by_name = {
+            name: {"id": f"id-{name}", "name": name, "workersMin": value}
+            for name, value in endpoints.items()
+        }
+        self.queries = []
+        self.saved = {}
+        self.errors = []
+        self.failure = None
+
+    def endpoints(self, max_age=None):
+        return [dict(endpoint) for endpoint in self.endpoints_by_name.values()]
+
+    def query_endpoints(self, fields):
+        return self.endpoints(0)
+
+    # Saves every input except the ones of the aliases in `errors`.
+    def post(self, query):
+        self.queries.append(query)
+        if self.failure:
+            raise self.failure
+
+        data = {}
+        for alias, endpoint_input in query["variables"].items():
+            if alias in self.errors:
+                data[alias] = None
+                continue
+            endpoint = self.endpoints_by_name[endpoint_input["name"]]
+            endpoint["workersMin"] = endpoint_input["workersMin"]
+            data[alias] = dict(endpoint)
+        errors = [{"message": "quota exceeded", "path": [alias]} for alias in self.errors]
+        return {"data": data, "errors": errors}
+
+    def update_endpoint(self, endpoint):
+        self.saved[endpoint["name"]] = endpoint["workersMin"]
+
+
+class UpdateWorkersTest(unittest.TestCase):
+    def setUp(self):
+        self.alerts = []
+        self.runpod = FakeRunpod({"a": 0, "b": 0, "c": 1})
+        for name, value in (
+            ("runpod", self.runpod),
+            ("send_slack_notification", self.alerts.append),
+        ):
+            patcher = mock.patch.object(workers, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_changes_are_saved_in_one_request(self):
+        results = workers.update_workers("activate", 1, ["a", "b", "c", "d"])
+
+        self.assertEqual(len(self.runpod.queries), 1)
+        query = self.runpod.queries[0]
+        self.assertEqual(
+            {alias: value["name"] for alias, value in query["variables"].items()},
+            {"endpoint0": "a", "endpoint1": "b"},
+        )
+        self.assertIn("endpoint1: saveEndpoint(input: $endpoint1)", query["query"])
+        self.assertEqual(
+            {name: result["status"] for name, result in results.items()},
+            {"a": "updated", "b": "updated", "c": "unchanged", "d": "missing"},
+        )
+        self.assertEqual(self.runpod.saved, {"a": 1, "b": 1})
+
+    def test_errors_are_mapped_to_their_endpoint(self):
+        self.runpod.errors = ["endpoint1"]
+        results = workers.update_workers("activate", {"a": 1, "b": 2})
+
+        self.assertEqual(results["a"]["status"], "updated")
+        self.assertEqual(results["b"]["status"], "failed")
+        self.assertEqual(results["b"]["error"], "quota exceeded")
+        self.assertEqual(results["b"]["workersMin"], 0)
+        self.assertEqual(len(self.alerts), 2)
+        self.assertIn("`b`: quota exceeded", self.alerts[1])
+
+    def test_failed_request_fails_every_endpoint(self):
+        self.runpod.failure = requests.exceptions.ConnectionError("unreachable")
+        results = workers.update_workers("deactivate", 1, ["a", "b"])
+
+        for name in ("a", "b"):
+            self.assertEqual(results[name]["status"], "failed")
+            self.assertEqual(results[name]["error"], "unreachable")
+
+    def test_value_not_read_back_is_a_failure(self):
+        self.runpod.query_endpoints = lambda fields: [
+            {"id": "id-a", "name": "a", "workersMin": 0}
+        ]
+        results = workers.update_workers("activate", 1, ["a"])
+
+        self.assertEqual(results["a"]["status"], "failed")
+        self.assertEqual(results["a"]["error"], "read back `0`")
+
+    def test_unreadable_endpoints(self):
+        self.runpod.endpoints = mock.Mock(
+            side_effect=requests.exceptions.ConnectionError("unreachable")
+        )
+        self.assertIsNone(workers.update_workers("activate", 1, ["a"]))
+        self.assertEqual(len(self.alerts), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
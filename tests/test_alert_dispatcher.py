@@ -0,0 +1,108 @@
+import atexit
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from alert_dispatcher import AlertDispatcher, PermanentAlertError
+from alert_outbox import AlertOutbox
+
+
+class AlertDispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+        self.dispatcher = AlertDispatcher(
+            self.batches.append, repeat_interval=1800, batch_window=0.2
+        )
+        self.addCleanup(self.dispatcher.close)
+
+    def test_repeats_are_coalesced_into_periodic_updates(self):
+        dispatch = self.dispatcher.dispatch
+        self.assertEqual(dispatch("down", "endpoint down", 0), "endpoint down")
+        self.assertIsNone(dispatch("down", "endpoint down", 60))
+        self.assertIsNone(dispatch("down", "endpoint down", 1200))
+        self.assertEqual(
+            dispatch("down", "endpoint down", 1800),
+            "endpoint down (still failing, 4 times)",
+        )
+        self.assertIsNone(dispatch("down", "endpoint down", 1900))
+
+    def test_keys_are_deduplicated_separately(self):
+        dispatch = self.dispatcher.dispatch
+        self.assertEqual(dispatch("a", "a is slow", 0), "a is slow")
+        self.assertEqual(dispatch("b", "b is slow", 10), "b is slow")
+        self.assertIsNone(dispatch("a", "a is slow", 20))
+
+    def test_alert_not_seen_for_the_interval_is_forgotten(self):
+        dispatch = self.dispatcher.dispatch
+        self.assertEqual(dispatch("down", "endpoint down", 0), "endpoint down")
+        self.assertEqual(dispatch("down", "endpoint down", 1801), "endpoint down")
+        self.assertEqual(self.dispatcher.alerts["down"]["count"], 1)
+
+    def test_alerts_of_the_batch_window_are_sent_together(self):
+        self.dispatcher.notify("endpoint down", "down")
+        self.dispatcher.notify("endpoint down again", "down")
+        self.dispatcher.notify("queue is growing", "queue")
+        self.dispatcher.close()
+
+        self.assertEqual(self.batches, [["endpoint down", "queue is growing"]])
+
+
+class AlertOutboxTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "outbox.db")
+        self.sent = []
+
+    def send(self, messages):
+        for message in messages:
+            if "bad" in message:
+                raise PermanentAlertError("invalid_blocks")
+        self.sent.extend(messages)
+
+    def dispatcher(self, **kwargs):
+        dispatcher = AlertDispatcher(
+            self.send, outbox=AlertOutbox("test", self.path), **kwargs
+        )
+        self.addCleanup(dispatcher.close)
+        return dispatcher
+
+    def test_notify_stores_the_alert_before_it_is_queued(self):
+        # The batch window never ends before the "crash".
+        blocked = threading.Event()
+        crashed = AlertDispatcher(
+            lambda messages: blocked.wait(),
+            outbox=AlertOutbox("test", self.path),
+            batch_window=60,
+        )
+        atexit.unregister(crashed.close)
+        self.addCleanup(blocked.set)
+        crashed.notify("kill switch activated")
+
+        rows = AlertOutbox("test", self.path).raised()
+        self.assertEqual([row[2] for row in rows], ["kill switch activated"])
+
+        # The next run sends it.
+        self.dispatcher().close()
+        self.assertEqual(self.sent, ["kill switch activated"])
+        self.assertEqual(AlertOutbox("test", self.path).raised(), [])
+        self.assertEqual(AlertOutbox("test", self.path).pending(10), [])
+
+    def test_permanent_error_moves_only_the_failing_alert(self):
+        dispatcher = self.dispatcher(batch_window=0.2)
+        for message in ("first", "bad", "second"):
+            dispatcher.notify(message)
+        dispatcher.close()
+
+        self.assertEqual(self.sent, ["first", "second"])
+        connection = sqlite3.connect(self.path)
+        self.addCleanup(connection.close)
+        rows = connection.execute("SELECT message, error FROM dead_letter").fetchall()
+        self.assertEqual(rows, [("bad", "invalid_blocks")])
+        self.assertEqual(AlertOutbox("test", self.path).pending(10), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+
+from autoscaler import WorkersAutoscaler
+
+
+def health(in_progress=0, in_queue=0):
+    return {"jobs": {"inProgress": in_progress, "inQueue": in_queue}}
+
+
+class WorkersAutoscalerTest(unittest.TestCase):
+    def setUp(self):
+        self.autoscaler = WorkersAutoscaler(
+            {"endpoint": (0, 5)}, target_utilization=0.5, scale_down_delay=900
+        )
+
+    def desired(self, timestamp, current, in_progress=0, in_queue=0, probes=None):
+        self.autoscaler.add("endpoint", timestamp, health(in_progress, in_queue), probes)
+        return self.autoscaler.desired("endpoint", current)
+
+    def test_one_job_asks_for_one_worker(self):
+        self.assertEqual(self.desired(0, 0, in_progress=1), 1)
+
+    def test_queue_is_served_at_the_target_utilization(self):
+        self.assertEqual(self.desired(0, 0, in_progress=1, in_queue=1), 3)
+
+    def test_steady_job_asks_for_one_worker(self):
+        for t in range(0, 600, 60):
+            self.assertEqual(self.desired(t, 1, in_progress=1), 1)
+
+    def test_sparse_requests_keep_a_worker_warm(self):
+        # One job seen every five health reads.
+        self.assertEqual(self.desired(0, 0, in_progress=1), 1)
+        for t in range(60, 600, 60):
+            busy = 1 if t % 300 == 0 else 0
+            self.assertEqual(self.desired(t, 1, in_progress=busy), 1)
+        self.assertGreater(self.autoscaler.stats("endpoint")["load"], 0)
+
+    def test_bounds(self):
+        self.assertEqual(self.desired(0, 0, in_progress=10), 5)
+        autoscaler = WorkersAutoscaler({"endpoint": (1, 5)})
+        autoscaler.add("endpoint", 0, health())
+        self.assertEqual(autoscaler.desired("endpoint", 0), 1)
+
+    def test_probes_are_not_demand(self):
+        probes = {"samples": [], "in_flight": 2}
+        self.assertEqual(self.desired(0, 0, in_progress=1, in_queue=1, probes=probes), 0)
+        self.assertFalse(self.autoscaler.has_traffic("endpoint"))
+
+    def test_scale_down_after_the_delay_one_worker_at_a_time(self):
+        self.assertEqual(self.desired(0, 0, in_progress=3), 3)
+        self.assertEqual(self.desired(60, 3), 3)
+        self.assertEqual(self.desired(899, 3), 3)
+        self.assertEqual(self.desired(960, 3), 2)
+        self.assertEqual(self.desired(1020, 2), 2)
+        self.assertEqual(self.desired(1860, 2), 1)
+
+    def test_demand_back_resets_the_delay(self):
+        self.assertEqual(self.desired(0, 2), 2)
+        self.assertEqual(self.desired(600, 2, in_progress=2), 2)
+        self.assertEqual(self.desired(1200, 2), 2)
+        self.assertEqual(self.desired(2099, 2), 2)
+        self.assertEqual(self.desired(2100, 2), 1)
+
+
+class LatencyRuleTest(unittest.TestCase):
+    def setUp(self):
+        self.autoscaler = WorkersAutoscaler(
+            {"endpoint": (0, 5)},
+            target_utilization=0.5,
+            latency_target=2.0,
+            latency_settle=300,
+            latency_min_samples=3,
+        )
+
+    def desired(self, timestamp, current, samples, in_progress=1):
+        probes = {"samples": samples, "in_flight": 0}
+        self.autoscaler.add("endpoint", timestamp, health(in_progress), probes)
+        return self.autoscaler.desired("endpoint", current)
+
+    def test_slow_probes_add_a_worker(self):
+        slow = [[t, 5.0] for t in (10, 20, 30)]
+        self.assertEqual(self.desired(60, 1, slow), 2)
+
+    def test_too_few_samples(self):
+        self.assertEqual(self.desired(60, 1, [[10, 5.0], [20, 5.0]]), 1)
+
+    def test_no_ratchet_on_samples_before_the_change(self):
+        slow = [[t, 5.0] for t in (10, 20, 30)]
+        self.assertEqual(self.desired(60, 1, slow), 2)
+        # The same slow probes ran before the change, they do not count again.
+        self.assertEqual(self.desired(120, 2, slow), 2)
+        self.assertIsNone(self.autoscaler.probe_latency("endpoint"))
+
+        # The added worker made the probes faster, one more is added.
+        settled = slow + [[t, 3.0] for t in (400, 410, 420)]
+        self.assertEqual(self.desired(480, 2, settled), 3)
+
+    def test_no_more_workers_when_one_did_not_help(self):
+        slow = [[t, 5.0] for t in (10, 20, 30)]
+        self.assertEqual(self.desired(60, 1, slow), 2)
+
+        settled = slow + [[t, 4.8] for t in (400, 410, 420)]
+        self.assertEqual(self.desired(480, 2, settled), 2)
+        self.assertEqual(self.desired(1200, 2, settled + [[900, 4.9]]), 2)
+
+        # Back under the target, and scaled down once the demand stayed lower,
+        # a later slowdown may add workers again.
+        fast = [[t, 1.0] for t in (1300, 1310, 1320)]
+        self.assertEqual(self.desired(1400, 2, fast), 1)
+        slow_again = [[t, 5.0] for t in (1800, 1810, 1820)]
+        self.assertEqual(self.desired(1900, 1, slow_again), 2)
+
+    def test_no_latency_rule_without_traffic(self):
+        slow = [[t, 5.0] for t in (10, 20, 30)]
+        self.assertEqual(self.desired(60, 0, slow, in_progress=0), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
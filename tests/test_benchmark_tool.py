@@ -0,0 +1,42 @@
+import logging
+import random
+import unittest
+
+# The scripts set up logging to a file in the working directory when imported,
+# unless it is already set up.
+logging.basicConfig(handlers=[logging.NullHandler()])
+
+from benchmark_tool import is_saturated, step_throughput
+
+
+def ramp(rate, duration, latency):
+    return [(i / rate, latency(i / rate)) for i in range(int(rate * duration))]
+
+
+class StepThroughputTest(unittest.TestCase):
+    def test_constant_latency(self):
+        served = ramp(5, 60, lambda started: 20.0)
+        self.assertEqual(step_throughput(served, 60), 5.0)
+
+    def test_latency_spread_is_not_saturation(self):
+        rng = random.Random(0)
+        served = ramp(5, 60, lambda started: rng.uniform(2, 20))
+        self.assertGreater(step_throughput(served, 60), 0.9 * 5)
+
+    def test_growing_latency_is_saturation(self):
+        # The queue grows by one second of latency every second.
+        served = ramp(5, 60, lambda started: 1 + started)
+        self.assertLess(step_throughput(served, 60), 0.6 * 5)
+
+    def test_no_job_served(self):
+        self.assertEqual(step_throughput([], 60), 0.0)
+
+    def test_is_saturated(self):
+        report = {"error_rate": 0.0, "throughput_rps": 4.6, "offered_jobs_rps": 5.0}
+        self.assertFalse(is_saturated(report, 0.05, 0.9))
+        self.assertTrue(is_saturated({**report, "throughput_rps": 4.0}, 0.05, 0.9))
+        self.assertTrue(is_saturated({**report, "error_rate": 0.1}, 0.05, 0.9))
+
+
+if __name__ == "__main__":
+    unittest.main()
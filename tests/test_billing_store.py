@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from billing_store import BillingStore, record
+
+
+class BillingStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = BillingStore("test", self.tmp.name)
+
+    def test_samples_are_read_back_by_a_new_store(self):
+        self.store.add(100, "runpod", {"total": 1.0, "endpoint-a": 0.5})
+        self.store.add(200, "runpod", {"total": 2.0, "endpoint-a": 0.75})
+
+        store = BillingStore("test", self.tmp.name)
+        self.assertEqual(
+            list(store.samples(0, 1000)),
+            [
+                (100, "runpod", "total", 1.0),
+                (100, "runpod", "endpoint-a", 0.5),
+                (200, "runpod", "total", 2.0),
+                (200, "runpod", "endpoint-a", 0.75),
+            ],
+        )
+        self.assertEqual(list(store.samples(150, 1000))[0][0], 200)
+
+    def test_spend_per_app(self):
+        for t, amount in ((0, 1.0), (3600, 3.0), (7200, 6.0), (10800, 10.0)):
+            self.store.add(t, "cerebrium", {"app": amount})
+
+        # The sample before the range is the baseline of the first increment.
+        self.assertEqual(self.store.spend(3600, 10800), {("cerebrium", "app"): 9.0})
+        self.assertEqual(self.store.spend(7200, 7200), {("cerebrium", "app"): 3.0})
+
+    def test_spend_across_a_new_billing_day(self):
+        for t, amount in ((0, 8.0), (60, 9.0), (120, 0.5), (180, 1.5)):
+            self.store.add(t, "runpod", {"total": amount})
+        # 8 -> 9, then 0.5 spent since midnight and 1 more.
+        self.assertEqual(self.store.spend(60, 180), {("runpod", "total"): 2.5})
+
+    def test_spend_per_bucket(self):
+        for t, amount in ((0, 0.0), (1800, 1.0), (3600, 3.0), (5400, 4.0)):
+            self.store.add(t, "runpod", {"total": amount})
+        self.assertEqual(
+            self.store.spend(1, 5400, bucket=3600),
+            {(0, "runpod", "total"): 1.0, (3600, "runpod", "total"): 3.0},
+        )
+
+    def test_out_of_order_sample_is_dropped(self):
+        self.store.add(200, "runpod", {"total": 2.0})
+        self.store.add(100, "runpod", {"total": 1.0})
+        self.assertEqual(len(list(self.store.samples(0, 1000))), 1)
+
+    def test_partial_record_is_read_on_the_next_refresh(self):
+        self.store.add(100, "runpod", {"total": 1.0})
+        data = record.pack(200, 0, 1, 2.0)
+        with open(self.store.path, "ab") as f:
+            f.write(data[:5])
+
+        reader = BillingStore("test", self.tmp.name)
+        self.assertEqual(len(list(reader.samples(0, 1000))), 1)
+
+        with open(self.store.path, "ab") as f:
+            f.write(data[5:])
+        self.assertEqual(len(list(reader.samples(0, 1000))), 2)
+        self.assertEqual(os.path.getsize(self.store.path), 2 * record.size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import types
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+import budget
+
+morning = datetime(2024, 1, 1, 10, tzinfo=timezone.utc).timestamp()
+
+
+class BudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.activations = []
+        patcher = mock.patch.object(budget, "activate_kill_switches", self.activate)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.alerts = []
+        self.budget = budget.Budget(
+            "Test", 50, 100, {"rule": None}, self.notify, tz=timezone.utc
+        )
+
+    def activate(self, targets):
+        self.activations.append(targets)
+        return {name: {"activated": True, "seconds": 0.1} for name in targets}
+
+    def notify(self, message, key=None):
+        self.alerts.append(key)
+
+    def check(self, totals, interval=60):
+        with self.assertLogs(level="CRITICAL"):
+            return [
+                self.budget.check(total, interval, now=morning + i * interval)
+                for i, total in enumerate(totals)
+            ]
+
+    def test_soft_and_hard_threshold(self):
+        self.assertEqual(self.check([10, 51, 101]), [None, "soft", "hard"])
+        self.assertEqual(len(self.activations), 1)
+        self.assertTrue(self.budget.is_kill_switch_activated)
+
+        # The kill switch is only activated once.
+        self.check([102])
+        self.assertEqual(len(self.activations), 1)
+
+    def test_constant_ramp_activates_the_kill_switch_before_the_threshold(self):
+        # $1100/h polled every minute, the threshold is crossed after 91.67.
+        totals = [round(1100 / 60 * i, 2) for i in range(6)]
+        statuses = self.check(totals)
+        self.assertEqual(statuses[-1], "predicted")
+        self.assertNotIn("predicted", statuses[:-1])
+        self.assertEqual(len(self.activations), 1)
+
+    def test_single_spike_only_warns(self):
+        statuses = self.check([10, 11, 12, 60, 61, 62])
+        self.assertNotIn("predicted", statuses)
+        self.assertEqual(self.activations, [])
+        self.assertIn("Test/hard_threshold_spike", self.alerts)
+
+    def test_partial_total_is_not_a_sample(self):
+        self.budget.check(10, 60, now=morning)
+        self.budget.check(11, 60, now=morning + 60)
+        with self.assertLogs(level="CRITICAL"):
+            self.budget.check(5, 60, partial=" (partial)", now=morning + 120)
+        self.assertEqual(self.budget.burn_rate.last, (morning + 60, 11))
+
+
+class CombinedBudgetTest(unittest.TestCase):
+    def setUp(self):
+        import billing_daemon
+
+        self.billing_daemon = billing_daemon
+        patcher = mock.patch.object(billing_daemon, "combined_hard_threshold", "100")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def plugin(self, tz):
+        return types.SimpleNamespace(
+            billing_timezone=tz,
+            kill_switch_targets={"rule": ("eu-central-1", [])},
+            send_slack_notification=None,
+        )
+
+    def test_one_billing_day(self):
+        plugins = {
+            "runpod": ("Runpod", self.plugin(timezone.utc)),
+            "cerebrium": ("Cerebrium", self.plugin(timezone.utc)),
+        }
+        combined = self.billing_daemon.combined_budget(plugins)
+        self.assertEqual(combined.burn_rate.tz, timezone.utc)
+        self.assertEqual(
+            set(combined.kill_switch_targets), {"Runpod rule", "Cerebrium rule"}
+        )
+
+    def test_different_billing_days_are_refused(self):
+        from zoneinfo import ZoneInfo
+
+        plugins = {
+            "runpod": ("Runpod", self.plugin(timezone.utc)),
+            "cerebrium": ("Cerebrium", self.plugin(ZoneInfo("Asia/Tokyo"))),
+        }
+        with self.assertRaises(ValueError):
+            self.billing_daemon.combined_budget(plugins)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from datetime import datetime, timezone
+
+from burn_rate import BurnRateForecaster
+
+# 2024-01-01 10:00 UTC
+day_start = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+morning = day_start + 10 * 3600
+
+
+class BurnRateForecasterTest(unittest.TestCase):
+    def test_no_forecast_before_two_samples(self):
+        forecaster = BurnRateForecaster(tz=timezone.utc)
+        self.assertIsNone(forecaster.forecast(60))
+        forecaster.add(morning, 10)
+        self.assertIsNone(forecaster.forecast(60))
+
+    def test_steady_rate(self):
+        forecaster = BurnRateForecaster(tz=timezone.utc)
+        for i in range(10):
+            forecaster.add(morning + i * 60, 10 + i)
+
+        forecast = forecaster.forecast(60)
+        self.assertEqual(forecast["amount"], 19)
+        self.assertEqual(forecast["rate_per_hour"], 60.0)
+        self.assertEqual(forecast["next_interval"], 20.0)
+        self.assertEqual(forecast["next_interval_smoothed"], 20.0)
+        # 19 + $60/h over the 13h51m left in the day.
+        self.assertAlmostEqual(forecast["end_of_day"], 19 + 60 * (14 * 3600 - 540) / 3600, 1)
+
+    def test_next_interval_follows_the_last_rate(self):
+        forecaster = BurnRateForecaster(tz=timezone.utc)
+        for i in range(10):
+            forecaster.add(morning + i * 60, 10 + i)
+        forecaster.add(morning + 600, 50)
+
+        forecast = forecaster.forecast(60)
+        self.assertEqual(forecast["next_interval"], 50 + 31)
+        # The smoothed rate only moves part of the way.
+        self.assertLess(forecast["rate_per_hour"], 31 * 60)
+        self.assertLess(forecast["next_interval_smoothed"], 50 + 6)
+
+    def test_new_day_resets(self):
+        forecaster = BurnRateForecaster(tz=timezone.utc)
+        forecaster.add(day_start - 120, 90)
+        forecaster.add(day_start - 60, 95)
+        self.assertIsNotNone(forecaster.forecast(60))
+
+        forecaster.add(day_start + 60, 1)
+        self.assertIsNone(forecaster.forecast(60))
+
+    def test_drop_of_the_total_resets(self):
+        forecaster = BurnRateForecaster(tz=timezone.utc)
+        forecaster.add(morning, 10)
+        forecaster.add(morning + 60, 12)
+        forecaster.add(morning + 120, 0)
+        self.assertIsNone(forecaster.forecast(60))
+
+
+if __name__ == "__main__":
+    unittest.main()
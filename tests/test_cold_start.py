@@ -0,0 +1,71 @@
+import unittest
+
+from cold_start import ColdStartTracker
+
+key = ("runpod", "endpoint")
+
+
+class ColdStartTrackerTest(unittest.TestCase):
+    def probe(self, tracker, latencies, interval=300, start=0):
+        return [
+            tracker.classify(key, start + i * interval, latency)
+            for i, latency in enumerate(latencies)
+        ]
+
+    def test_slowdown_without_settings_is_warm(self):
+        tracker = ColdStartTracker(jump_factor=3)
+        labels = self.probe(tracker, [2.0] * 30 + [10.0] * 30)
+        self.assertEqual(set(labels), {"warm"})
+
+    def test_always_up_endpoint_is_warm(self):
+        tracker = ColdStartTracker(jump_factor=3)
+        tracker.settings[key] = {"min_workers": 1, "idle_timeout": 5}
+        self.assertEqual(set(self.probe(tracker, [2.0] * 10 + [30.0])), {"warm"})
+
+    def test_scale_to_zero_after_the_idle_timeout(self):
+        tracker = ColdStartTracker(jump_factor=3)
+        tracker.settings[key] = {"min_workers": 0, "idle_timeout": 60}
+
+        # Probes 10 seconds apart keep the worker up.
+        labels = self.probe(tracker, [30.0] + [2.0] * 10, interval=10)
+        self.assertEqual(labels[1:], ["warm"] * 10)
+
+        # Idle past the timeout, a slow probe is a cold start and a fast one
+        # found a worker kept up by other traffic.
+        self.assertEqual(tracker.classify(key, 1000, 30.0), "cold")
+        self.assertEqual(tracker.classify(key, 2000, 2.0), "warm")
+        self.assertLess(tracker.summary()[key]["cold_start_cost"], 30)
+
+    def test_cold_streak(self):
+        tracker = ColdStartTracker(jump_factor=3)
+        tracker.settings[key] = {"min_workers": 0, "idle_timeout": 60}
+        self.probe(tracker, [30.0] * 4)
+        self.assertEqual(tracker.cold_streak[key], 4)
+        tracker.classify(key, 10_000, 30.0)
+        tracker.classify(key, 10_040, 2.0)
+        self.assertEqual(tracker.cold_streak[key], 0)
+
+    def test_may_be_cold(self):
+        tracker = ColdStartTracker()
+        # Unknown settings.
+        self.assertTrue(tracker.may_be_cold(key, 0))
+
+        tracker.settings[key] = {"min_workers": 1, "idle_timeout": 5}
+        self.assertFalse(tracker.may_be_cold(key, 0))
+
+        tracker.settings[key] = {"min_workers": 0, "idle_timeout": 60}
+        tracker.classify(key, 0, 2.0)
+        self.assertFalse(tracker.may_be_cold(key, 30))
+        self.assertTrue(tracker.may_be_cold(key, 100))
+
+    def test_cold_quantile_needs_samples(self):
+        tracker = ColdStartTracker()
+        tracker.settings[key] = {"min_workers": 0, "idle_timeout": 60}
+        self.probe(tracker, [30.0] * 4)
+        self.assertIsNone(tracker.cold_quantile(key, 0.99))
+        self.probe(tracker, [30.0] * 2, start=10_000)
+        self.assertGreaterEqual(tracker.cold_quantile(key, 0.99), 30.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from cost_cache import CostCache
+
+today = date(2024, 1, 10)
+
+
+class CostCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "cost_cache.json")
+
+    def test_empty_cache_asks_for_today(self):
+        cache = CostCache(self.path)
+        self.assertEqual(
+            cache.request_params("app", today),
+            {"startDate": "2024-01-10", "endDate": "2024-01-10"},
+        )
+        self.assertEqual(cache.request_headers("app"), {})
+
+    def test_update_stores_the_open_days_and_closes_yesterday(self):
+        cache = CostCache(self.path)
+        cache.update(
+            "app",
+            {"2024-01-09": {"total_cost_cents": 5}, "2024-01-10": {"total_cost_cents": 7}},
+            {"ETag": '"abc"', "Last-Modified": "Wed, 10 Jan 2024 10:00:00 GMT"},
+            today,
+        )
+
+        # Only today was open.
+        self.assertEqual(cache.costs("app"), {"costs": {"2024-01-10": {"total_cost_cents": 7}}})
+        self.assertEqual(
+            cache.request_headers("app"),
+            {"If-None-Match": '"abc"', "If-Modified-Since": "Wed, 10 Jan 2024 10:00:00 GMT"},
+        )
+
+        # The next day the day before is still open, as it was last fetched on it.
+        tomorrow = date(2024, 1, 11)
+        self.assertEqual(cache.request_params("app", tomorrow)["startDate"], "2024-01-10")
+        cache.update("app", {"2024-01-10": {"total_cost_cents": 9}}, None, tomorrow)
+        self.assertEqual(cache.costs("app")["costs"]["2024-01-10"], {"total_cost_cents": 9})
+        self.assertEqual(cache.request_params("app", tomorrow)["startDate"], "2024-01-11")
+        self.assertEqual(cache.request_headers("app"), {})
+
+    def test_save_and_reload(self):
+        cache = CostCache(self.path)
+        cache.save()
+        self.assertFalse(os.path.exists(self.path))
+
+        cache.update("app", {"2024-01-10": {"total_cost_cents": 7}}, None, today)
+        cache.save()
+        reloaded = CostCache(self.path)
+        self.assertEqual(reloaded.costs("app"), cache.costs("app"))
+        self.assertEqual(reloaded.request_params("app", today)["startDate"], "2024-01-10")
+
+    def test_unreadable_cache_is_ignored(self):
+        with open(self.path, "w") as f:
+            f.write("{not json")
+        with self.assertLogs(level="CRITICAL"):
+            cache = CostCache(self.path)
+        self.assertEqual(cache.costs("app"), {"costs": {}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import threading
+import unittest
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+import kill_switch
+
+region_name = "eu-central-1"
+
+
+@unittest.skipIf(mock_aws is None, "moto is not installed")
+class KillSwitchTest(unittest.TestCase):
+    def setUp(self):
+        for key in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+            os.environ[key] = "testing"
+        os.environ.pop("AWS_SESSION_TOKEN", None)
+
+        mock = mock_aws()
+        mock.start()
+        self.addCleanup(mock.stop)
+        kill_switch.clients.clear()
+        self.addCleanup(kill_switch.clients.clear)
+
+        self.elbv2 = kill_switch.get_client(region_name)
+        self.listener = self.create_listener()
+
+    def create_listener(self):
+        ec2 = boto3.client("ec2", region_name=region_name)
+        vpc = ec2.create_vpc(CidrBlock="10.0.0.0/16")["Vpc"]["VpcId"]
+        subnets = [
+            ec2.create_subnet(
+                VpcId=vpc, CidrBlock=f"10.0.{i}.0/24", AvailabilityZone=f"{region_name}{zone}"
+            )["Subnet"]["SubnetId"]
+            for i, zone in enumerate("ab")
+        ]
+        load_balancer = self.elbv2.create_load_balancer(Name="test", Subnets=subnets)[
+            "LoadBalancers"
+        ][0]["LoadBalancerArn"]
+        self.target_group = self.elbv2.create_target_group(
+            Name="test", Protocol="HTTP", Port=80, VpcId=vpc
+        )["TargetGroups"][0]["TargetGroupArn"]
+        return self.elbv2.create_listener(
+            LoadBalancerArn=load_balancer,
+            Protocol="HTTP",
+            Port=80,
+            DefaultActions=[{"Type": "forward", "TargetGroupArn": self.target_group}],
+        )["Listeners"][0]["ListenerArn"]
+
+    def create_rule(self, priority):
+        return self.elbv2.create_rule(
+            ListenerArn=self.listener,
+            Priority=priority,
+            Conditions=[{"Field": "path-pattern", "Values": [f"/{priority}"]}],
+            Actions=[{"Type": "forward", "TargetGroupArn": self.target_group}],
+        )["Rules"][0]["RuleArn"]
+
+    def priorities(self, rule_arns):
+        rules = self.elbv2.describe_rules(RuleArns=rule_arns)["Rules"]
+        return {rule["RuleArn"]: rule["Priority"] for rule in rules}
+
+    def test_rules_are_flipped_in_parallel_and_read_back(self):
+        first, second = self.create_rule(500), self.create_rule(501)
+        targets = {
+            "first": (region_name, [{"RuleArn": first, "Priority": 1}]),
+            "second": (region_name, [{"RuleArn": second, "Priority": 2}]),
+        }
+
+        # Each activation waits for the other one to start.
+        barrier = threading.Barrier(2, timeout=5)
+        activate = kill_switch.activate_alb_kill_switch
+
+        def activate_together(*args):
+            barrier.wait()
+            return activate(*args)
+
+        kill_switch.activate_alb_kill_switch = activate_together
+        self.addCleanup(setattr, kill_switch, "activate_alb_kill_switch", activate)
+
+        statuses = kill_switch.activate_kill_switches(targets)
+
+        self.assertEqual(
+            {name: status["activated"] for name, status in statuses.items()},
+            {"first": True, "second": True},
+        )
+        self.assertEqual(self.priorities([first, second]), {first: "1", second: "2"})
+
+    def test_bad_rule_arn_is_reported(self):
+        good = self.create_rule(500)
+        bad = good.rsplit("/", 1)[0] + "/0123456789abcdef"
+        targets = {
+            "good": (region_name, [{"RuleArn": good, "Priority": 1}]),
+            "bad": (region_name, [{"RuleArn": bad, "Priority": 2}]),
+        }
+
+        with self.assertLogs(level="CRITICAL") as logs:
+            kill_switch.prepare_kill_switches(targets)
+        self.assertTrue(any("Kill switch bad" in line for line in logs.output))
+
+        statuses = kill_switch.activate_kill_switches(targets)
+        self.assertTrue(statuses["good"]["activated"])
+        self.assertFalse(statuses["bad"]["activated"])
+        self.assertEqual(self.priorities([good]), {good: "1"})
+
+
+if __name__ == "__main__":
+    unittest.main()
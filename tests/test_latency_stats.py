@@ -0,0 +1,98 @@
+import unittest
+
+from latency_stats import LatencyHistogram, LatencyTracker, precision
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_empty(self):
+        self.assertIsNone(LatencyHistogram().quantile(0.5))
+
+    def test_quantiles_within_precision(self):
+        histogram = LatencyHistogram()
+        for i in range(1, 1001):
+            histogram.add(i / 100)
+
+        for q, expected in ((0.5, 5.0), (0.95, 9.5), (0.99, 9.9)):
+            value = histogram.quantile(q)
+            self.assertGreaterEqual(value, expected)
+            self.assertLessEqual(value, expected * (1 + precision) ** 2)
+
+    def test_out_of_range_values_are_clamped(self):
+        histogram = LatencyHistogram()
+        histogram.add(0)
+        histogram.add(10_000)
+        self.assertLess(histogram.quantile(0.1), 0.01)
+        self.assertGreaterEqual(histogram.quantile(1.0), 600.0)
+
+    def test_merge(self):
+        fast, slow = LatencyHistogram(), LatencyHistogram()
+        for _ in range(50):
+            fast.add(0.1)
+            slow.add(1.0)
+        fast.merge(slow)
+        self.assertEqual(fast.total, 100)
+        self.assertLess(fast.quantile(0.25), 0.2)
+        self.assertGreater(fast.quantile(0.75), 0.9)
+
+    def test_half_life_follows_recent_samples(self):
+        histogram = LatencyHistogram(half_life=5)
+        for _ in range(100):
+            histogram.add(0.1)
+        for _ in range(30):
+            histogram.add(2.0)
+        self.assertGreater(histogram.quantile(0.5), 1.9)
+
+
+class LatencyTrackerTest(unittest.TestCase):
+    def test_regression_needs_confirmation(self):
+        tracker = LatencyTracker(factor=2, min_samples=20, confirm_samples=3)
+        for _ in range(100):
+            tracker.add(0.1)
+            self.assertEqual(tracker.regressions(), {})
+
+        results = []
+        for _ in range(10):
+            tracker.add(1.0)
+            results.append(tracker.regressions())
+
+        first = next(i for i, r in enumerate(results) if r)
+        self.assertTrue(all(not r for r in results[:first]))
+        self.assertIn("p95", results[-1])
+        recent, baseline = results[-1]["p95"]
+        self.assertGreater(recent, baseline * 2)
+
+    def test_single_outlier_is_not_a_regression(self):
+        tracker = LatencyTracker(factor=3)
+        for _ in range(40):
+            tracker.add(2.0)
+            tracker.regressions()
+        tracker.add(30.0)
+        self.assertEqual(tracker.regressions(), {})
+        for _ in range(30):
+            tracker.add(2.0)
+            self.assertEqual(tracker.regressions(), {})
+
+    def test_slowdown_is_a_regression(self):
+        tracker = LatencyTracker(factor=3)
+        for _ in range(30):
+            tracker.add(2.0)
+            tracker.regressions()
+
+        results = []
+        for _ in range(30):
+            tracker.add(10.0)
+            results.append(tracker.regressions())
+        self.assertTrue(all(results[5:]))
+        self.assertEqual(set(results[-1]), {"p95", "p99"})
+
+    def test_outliers_stay_out_of_the_baseline(self):
+        tracker = LatencyTracker(factor=2, min_samples=20)
+        for _ in range(50):
+            tracker.add(0.1)
+        for _ in range(50):
+            tracker.add(5.0)
+        self.assertLess(tracker.baseline.quantile(0.99), 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import logging
+import unittest
+
+import httpx
+
+# The scripts set up logging to a file in the working directory when imported,
+# unless it is already set up.
+logging.basicConfig(handlers=[logging.NullHandler()])
+
+from monitoring_tool import group_targets, send_probe_request
+
+
+def target(task, endpoint="/insights", provider="runpod"):
+    return {
+        "provider": provider,
+        "task": task,
+        "model": "jupiter-1",
+        "endpoint": endpoint,
+        "payload": {"text": task},
+    }
+
+
+class SendProbeRequestTest(unittest.TestCase):
+    def probe(self, targets, respond):
+        self.requests = []
+
+        def handler(request):
+            self.requests.append(json.loads(request.content))
+            return respond(self.requests[-1])
+
+        async def send():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await send_probe_request(client, targets, log_response=False)
+
+        return asyncio.run(send())
+
+    def test_results_are_mapped_by_job_id(self):
+        targets = [target("summarization"), target("smart-reply"), target("topics")]
+
+        # Answered out of order, the second job failed.
+        results = self.probe(
+            targets,
+            lambda body: httpx.Response(
+                200,
+                json={
+                    "res_jobs": [
+                        {"id": 3, "result": "topics"},
+                        {"id": 2, "error": "IN_QUEUE for too long"},
+                        {"id": 1, "result": "summary"},
+                    ]
+                },
+            ),
+        )
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(
+            [(job["id"], job["task"]) for job in self.requests[0]["req_jobs"]],
+            [(1, "summarization"), (2, "smart-reply"), (3, "topics")],
+        )
+        self.assertEqual(
+            [(result["is_success"], result["error_message"]) for result in results],
+            [(True, ""), (False, "IN_QUEUE for too long"), (True, "")],
+        )
+        # Every job of the batch gets the latency of the whole request.
+        self.assertIs(results[0]["timings"], results[2]["timings"])
+
+    def test_missing_job_fails_only_that_target(self):
+        results = self.probe(
+            [target("summarization"), target("smart-reply")],
+            lambda body: httpx.Response(200, json={"res_jobs": [{"id": 1}]}),
+        )
+
+        self.assertTrue(results[0]["is_success"])
+        self.assertFalse(results[1]["is_success"])
+        self.assertEqual(results[1]["error_message"], "No result for job 2 in the response")
+
+    def test_invalid_response_fails_every_target(self):
+        results = self.probe(
+            [target("summarization"), target("smart-reply")],
+            lambda body: httpx.Response(200, json={"jobs": []}),
+        )
+
+        for result in results:
+            self.assertFalse(result["is_success"])
+            self.assertTrue(result["error_message"].startswith("Invalid response"))
+
+    def test_http_error_fails_every_target(self):
+        results = self.probe(
+            [target("summarization"), target("smart-reply")],
+            lambda body: httpx.Response(502),
+        )
+
+        self.assertEqual([result["is_success"] for result in results], [False, False])
+        self.assertIn("502", results[0]["error_message"])
+
+
+class GroupTargetsTest(unittest.TestCase):
+    def test_batch_groups_by_provider_and_endpoint(self):
+        targets = [
+            target("summarization"),
+            target("smart-reply", "/reply"),
+            target("topics"),
+            target("summarization", provider="cerebrium"),
+        ]
+
+        self.assertEqual(
+            [[t["task"] for t in group] for group in group_targets(targets, True)],
+            [["summarization", "topics"], ["smart-reply"], ["summarization"]],
+        )
+        self.assertEqual(len(group_targets(targets, False)), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
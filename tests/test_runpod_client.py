@@ -0,0 +1,82 @@
+import json
+import unittest
+from unittest import mock
+
+import requests
+
+import runpod_client
+from runpod_client import RunpodClient, RunpodError
+
+
+def response(status_code, body=None, headers=None):
+    result = requests.Response()
+    result.status_code = status_code
+    result._content = json.dumps(body or {}).encode()
+    result.headers.update(headers or {})
+    result.url = runpod_client.graphql_url
+    return result
+
+
+class RunpodClientTest(unittest.TestCase):
+    def setUp(self):
+        self.client = RunpodClient("key")
+        self.sleeps = []
+        patcher = mock.patch.object(runpod_client.time, "sleep", self.sleeps.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def answer(self, *responses):
+        self.client.session.request = mock.Mock(side_effect=responses)
+        return self.client.session.request
+
+    def test_transient_errors_are_retried(self):
+        request = self.answer(
+            requests.exceptions.ConnectionError("reset"),
+            response(503),
+            response(200, {"data": {"ok": True}}),
+        )
+
+        self.assertEqual(self.client.post({"query": "{}"}), {"data": {"ok": True}})
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(len(self.sleeps), 2)
+        # Jittered, at most the exponential delay of the attempt.
+        for attempt, delay in enumerate(self.sleeps):
+            self.assertLessEqual(delay, runpod_client.retry_base_delay * 2**attempt)
+
+    def test_gives_up_after_the_last_attempt(self):
+        request = self.answer(*(requests.exceptions.Timeout("slow"),) * 3)
+
+        with self.assertRaises(RunpodError) as raised:
+            self.client.post({"query": "{}"})
+        self.assertIn("after 3 attempts", str(raised.exception))
+        self.assertEqual(request.call_count, runpod_client.max_attempts)
+        self.assertEqual(len(self.sleeps), runpod_client.max_attempts - 1)
+        # Still a RequestException for the existing handlers.
+        self.assertIsInstance(raised.exception, requests.exceptions.RequestException)
+
+    def test_retry_after_is_respected(self):
+        self.answer(response(429, headers={"Retry-After": "7"}), response(200, {"data": {}}))
+
+        self.client.get("https://rest.runpod.io/v1/endpoints")
+        self.assertEqual(self.sleeps, [7])
+
+    def test_client_errors_are_not_retried(self):
+        request = self.answer(response(401))
+
+        with self.assertRaises(RunpodError):
+            self.client.post({"query": "{}"})
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual(self.sleeps, [])
+
+    def test_graphql_errors_without_data(self):
+        self.answer(response(200, {"errors": [{"message": "bad query"}]}))
+
+        with self.assertRaises(RunpodError):
+            self.client.post({"query": "{}"})
+
+    def test_key_is_sent_in_the_header(self):
+        self.assertEqual(self.client.session.headers["Authorization"], "Bearer key")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from datetime import datetime, timezone
+
+from weekly_schedule import WeeklySchedule, parse_days
+
+
+class ParseDaysTest(unittest.TestCase):
+    def test_ranges_and_lists(self):
+        self.assertEqual(parse_days("mon-fri,sun"), {0, 1, 2, 3, 4, 6})
+        self.assertEqual(parse_days(["Saturday", "sun"]), {5, 6})
+
+    def test_range_wrapping_the_week(self):
+        self.assertEqual(parse_days("fri-mon"), {4, 5, 6, 0})
+
+
+class WeeklyScheduleTest(unittest.TestCase):
+    def test_window_and_default(self):
+        schedule = WeeklySchedule(
+            [{"days": "mon-fri", "start": "09:00", "end": "18:00", "value": 2}], default=0
+        )
+        # 2024-01-01 is a Monday.
+        self.assertEqual(schedule.value_at(datetime(2024, 1, 1, 8, 59, tzinfo=timezone.utc)), 0)
+        self.assertEqual(schedule.value_at(datetime(2024, 1, 1, 9, 0, tzinfo=timezone.utc)), 2)
+        self.assertEqual(schedule.value_at(datetime(2024, 1, 1, 18, 0, tzinfo=timezone.utc)), 0)
+        self.assertEqual(schedule.value_at(datetime(2024, 1, 6, 12, 0, tzinfo=timezone.utc)), 0)
+
+    def test_window_past_midnight(self):
+        schedule = WeeklySchedule([{"days": "fri", "start": "22:00", "end": "02:00", "value": 1}])
+        self.assertEqual(schedule.value_at(datetime(2024, 1, 5, 23, 0, tzinfo=timezone.utc)), 1)
+        self.assertEqual(schedule.value_at(datetime(2024, 1, 6, 1, 0, tzinfo=timezone.utc)), 1)
+        self.assertEqual(schedule.value_at(datetime(2024, 1, 6, 2, 0, tzinfo=timezone.utc)), 0)
+        self.assertEqual(schedule.value_at(datetime(2024, 1, 5, 1, 0, tzinfo=timezone.utc)), 0)
+
+    def test_overlapping_windows_take_the_highest_value(self):
+        schedule = WeeklySchedule(
+            [
+                {"start": "08:00", "end": "20:00", "value": 1},
+                {"start": "12:00", "end": "14:00", "value": 3},
+            ]
+        )
+        self.assertEqual(schedule.value_at(datetime(2024, 1, 1, 13, 0, tzinfo=timezone.utc)), 3)
+        self.assertEqual(schedule.value_at(datetime(2024, 1, 1, 15, 0, tzinfo=timezone.utc)), 1)
+
+    def test_local_time_across_daylight_saving(self):
+        schedule = WeeklySchedule.from_config(
+            {
+                "timezone": "Europe/Berlin",
+                "windows": [{"start": "15:00", "end": "16:00", "value": 1}],
+            }
+        )
+        # 15:00 in Berlin is 14:00 UTC in winter and 13:00 UTC in summer.
+        self.assertEqual(schedule.value_at(datetime(2024, 1, 15, 14, 30, tzinfo=timezone.utc)), 1)
+        self.assertEqual(schedule.value_at(datetime(2024, 7, 15, 13, 30, tzinfo=timezone.utc)), 1)
+        self.assertEqual(schedule.value_at(datetime(2024, 7, 15, 14, 30, tzinfo=timezone.utc)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
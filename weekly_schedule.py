@@ -0,0 +1,67 @@
+from datetime import time
+from zoneinfo import ZoneInfo
+
+weekdays = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+# "mon-fri,sun" or ["mon-fri", "sun"] -> {0, 1, 2, 3, 4, 6}
+def parse_days(days):
+    if isinstance(days, str):
+        days = days.split(",")
+
+    result = set()
+    for part in days:
+        first, _, last = part.strip().lower().partition("-")
+        start = weekdays.index(first[:3])
+        end = weekdays.index((last or first)[:3])
+        result.update((start + i) % 7 for i in range((end - start) % 7 + 1))
+    return result
+
+
+def parse_time(value):
+    hour, minute = value.split(":")
+    return time(int(hour), int(minute))
+
+
+# Weekly schedule of a value, e.g. the workersMin of an endpoint, in its own
+# timezone. A window covers `days` from `start` to `end` local time, and one
+# ending before it starts runs past midnight into the next day. Where windows
+# overlap the highest value wins, outside of them the value is `default`.
+class WeeklySchedule:
+    def __init__(self, windows, default=0, tz="UTC"):
+        self.tz = ZoneInfo(tz)
+        self.default = default
+        self.windows = [
+            {
+                "days": parse_days(window.get("days", "mon-sun")),
+                "start": parse_time(window["start"]),
+                "end": parse_time(window["end"]),
+                "value": window["value"],
+            }
+            for window in windows
+        ]
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["windows"], config.get("default", 0), config.get("timezone", "UTC"))
+
+    # The value at an aware datetime. Local wall time is compared, so a 15:00
+    # window stays at 15:00 across daylight saving changes.
+    def value_at(self, moment):
+        local = moment.astimezone(self.tz)
+        day = local.weekday()
+        now = local.time()
+
+        values = []
+        for window in self.windows:
+            start, end = window["start"], window["end"]
+            if start < end:
+                active = day in window["days"] and start <= now < end
+            else:
+                active = (day in window["days"] and now >= start) or (
+                    (day - 1) % 7 in window["days"] and now < end
+                )
+            if active:
+                values.append(window["value"])
+
+        return max(values) if values else self.default
@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    filename="worker_scheduler.log",
+    filemode="a",
+)
+
+from activate_deactivate_workers import runpod, update_workers
+from cold_start import ActivationTimes
+from endpoint_health import wait_until_ready
+from weekly_schedule import WeeklySchedule
+
+api_key = os.environ.get("API_KEY")
+# {"runpod": {endpoint name: schedule}, "cerebrium_cooldown": schedule}, where a
+# schedule is {"timezone", "default", "windows": [{"days", "start", "end", "value"}]}.
+worker_schedule_path = os.environ.get("WORKER_SCHEDULE_PATH", "worker_schedule.json")
+worker_schedule_tick = int(os.environ.get("WORKER_SCHEDULE_TICK", 30))
+# Workers are started ahead of a window by the slowest recent activation of the
+# endpoint plus PREWARM_MARGIN, or by PREWARM_DEFAULT until one was measured.
+prewarm_margin = int(os.environ.get("PREWARM_MARGIN", 60))
+prewarm_default = int(os.environ.get("PREWARM_DEFAULT", 300))
+activation_times_path = os.environ.get("ACTIVATION_TIMES_PATH", "activation_times.json")
+activation_timeout = int(os.environ.get("ACTIVATION_TIMEOUT", 1800))
+# Seconds before a failed update is tried again.
+schedule_retry_interval = int(os.environ.get("SCHEDULE_RETRY_INTERVAL", 300))
+
+activation_times = ActivationTimes(activation_times_path)
+measuring = set()
+
+
+def load_schedules(path):
+    with open(path) as f:
+        config = json.load(f)
+
+    runpod_schedules = {
+        name: WeeklySchedule.from_config(schedule)
+        for name, schedule in config.get("runpod", {}).items()
+    }
+    cooldown = config.get("cerebrium_cooldown")
+    return runpod_schedules, WeeklySchedule.from_config(cooldown) if cooldown else None
+
+
+def prewarm_lead(name):
+    return activation_times.lead(name, prewarm_default) + prewarm_margin
+
+
+# The workersMin of every endpoint at `now`. A window is applied `prewarm_lead`
+# ahead of its start, and ends on time.
+def desired_workers(schedules, now):
+    return {
+        name: max(
+            schedule.value_at(now),
+            schedule.value_at(now + timedelta(seconds=prewarm_lead(name))),
+        )
+        for name, schedule in schedules.items()
+    }
+
+
+def measure_activation(name, workers):
+    seconds = None
+    try:
+        endpoint = runpod.endpoint(name)
+        if endpoint:
+            seconds = wait_until_ready(endpoint["id"], api_key, workers, activation_timeout)
+    except requests.exceptions.RequestException as e:
+        logging.critical(f"Failed to measure the activation of {name}: {str(e)}")
+    finally:
+        measuring.discard(name)
+
+    if seconds:
+        activation_times.add(name, seconds)
+        activation_times.save()
+        logging.info(
+            f"Endpoint {name} had {workers} workers up {seconds}s after the activation, pre-warm lead {prewarm_lead(name)}s"
+        )
+
+
+def apply_workers(changes, applied, retry_at):
+    results = update_workers("schedule", changes)
+    if results is None:
+        for name in changes:
+            retry_at[name] = time.monotonic() + schedule_retry_interval
+        return
+
+    for name, result in results.items():
+        if result["status"] in ("failed", "missing"):
+            retry_at[name] = time.monotonic() + schedule_retry_interval
+            continue
+
+        applied[name] = changes[name]
+        retry_at.pop(name, None)
+        # Each activation measures how long the endpoint takes to warm up.
+        if result["status"] == "updated" and changes[name] > 0 and name not in measuring:
+            measuring.add(name)
+            threading.Thread(
+                target=measure_activation, args=(name, changes[name]), daemon=True
+            ).start()
+
+
+def start_scheduler(tick):
+    runpod_schedules, cooldown_schedule = load_schedules(worker_schedule_path)
+    if cooldown_schedule:
+        # Only imported when used, it exits without its Cerebrium settings.
+        from cerebrium_update_cooldown_period import min_cooldown_period, update_cooldown_period
+
+        # Also catches a missing "default", which would be 0.
+        values = [cooldown_schedule.default] + [w["value"] for w in cooldown_schedule.windows]
+        if min(values) < min_cooldown_period:
+            raise ValueError(
+                f"Cerebrium cooldown periods must be at least {min_cooldown_period} seconds, got {min(values)}"
+            )
+
+    # The values applied so far. Everything is applied once on start, so a
+    # window missed while the scheduler was down is caught up.
+    applied = {}
+    retry_at = {}
+    applied_cooldown = None
+    cooldown_retry_at = 0
+
+    next_run = time.monotonic()
+    while True:
+        now = datetime.now(timezone.utc)
+
+        changes = {
+            name: workers
+            for name, workers in desired_workers(runpod_schedules, now).items()
+            if applied.get(name) != workers and retry_at.get(name, 0) <= time.monotonic()
+        }
+        if changes:
+            logging.info(f"Scheduled workersMin: {changes}")
+            apply_workers(changes, applied, retry_at)
+
+        if cooldown_schedule:
+            cooldown = cooldown_schedule.value_at(now)
+            if cooldown != applied_cooldown and cooldown_retry_at <= time.monotonic():
+                logging.info(f"Scheduled Cerebrium cooldown period: {cooldown}s")
+                if update_cooldown_period(cooldown):
+                    applied_cooldown = cooldown
+                else:
+                    cooldown_retry_at = time.monotonic() + schedule_retry_interval
+
+        next_run += tick
+        time.sleep(max(0, next_run - time.monotonic()))
+
+
+if __name__ == "__main__":
+    start_scheduler(worker_schedule_tick)